@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""Benchmark: calendar write throughput, one call per write vs batched flush.
+
+Starts a local fake Calendar server (events list/insert/get/patch/update/delete
+and the multipart batch endpoint) that adds ``--latency`` ms to every HTTP call
+to stand in for the round trip to Google, and rate limits writes to
+``--quota`` per second with 403 rateLimitExceeded, like the per-user quota.
+The real googleapiclient talks to it, built from the bundled discovery
+document with its root URL pointed at the fake.
+
+Each scenario journals ``--events`` writes the way a run does and then
+sends them: sequentially through ``journal.execute`` (one call each, as
+before), or deferred and sent by ``journal.flush`` (batched). The update
+scenario changes half of the events and leaves the other half as they are.
+
+    uv run benchmarks/bench_calendar_writes.py
+    uv run benchmarks/bench_calendar_writes.py --events 500 --latency 80 --quota 50
+"""
+
+import argparse
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import urllib.parse
+from email.message import Message
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import httplib2
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+from calendar_sync import calendar, db, journal
+from calendar_sync.models import Action, EventDetails
+
+CALENDAR_ID = "bench@example.com"
+EVENT_PATH = re.compile(r"^/calendar/v3/calendars/[^/]+/events(?:/([^/?]+))?")
+
+
+class FakeCalendar:
+    """Event store and request dispatch shared by direct and batched calls."""
+
+    def __init__(self, quota: float):
+        self.events: dict[str, dict] = {}
+        self.quota = quota
+        self.tokens = quota
+        self.refilled = time.monotonic()
+        self.requests = 0
+        # HTTP requests; a batch is one round trip for all its requests
+        self.round_trips = 0
+        self.throttled = 0
+        self.lock = threading.Lock()
+
+    def _allow_write(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.quota, self.tokens + (now - self.refilled) * self.quota)
+        self.refilled = now
+        if self.tokens < 1:
+            self.throttled += 1
+            return False
+        self.tokens -= 1
+        return True
+
+    def _list(self, query: dict) -> dict:
+        """events.list: live events starting in [timeMin, timeMax], matching q."""
+        start, end = query.get("timeMin", [""])[0], query.get("timeMax", ["~"])[0]
+        words = query.get("q", [""])[0].lower()
+        items = []
+        for event in self.events.values():
+            when = event.get("start", {})
+            day = (when.get("dateTime") or when.get("date") or "")[:10]
+            text = " ".join(
+                str(event.get(k) or "") for k in ("summary", "description", "location")
+            ).lower()
+            if (
+                event.get("status") != "cancelled"
+                and start[:10] <= day <= end[:10]
+                and words in text
+            ):
+                items.append(event)
+        items.sort(key=lambda e: e["start"].get("dateTime") or e["start"].get("date"))
+        return {"kind": "calendar#events", "items": items}
+
+    def handle(self, method: str, path: str, body: bytes) -> tuple[int, dict | None]:
+        match = EVENT_PATH.match(path)
+        if not match:
+            return 404, {"error": {"code": 404, "message": "Not Found"}}
+        event_id = match.group(1)
+        with self.lock:
+            self.requests += 1
+            if method == "GET" and event_id is None:
+                query = urllib.parse.parse_qs(urllib.parse.urlsplit(path).query)
+                return 200, self._list(query)
+            if method != "GET" and not self._allow_write():
+                return 403, {
+                    "error": {
+                        "code": 403,
+                        "message": "Rate Limit Exceeded",
+                        "errors": [{"reason": "rateLimitExceeded"}],
+                    }
+                }
+            current = self.events.get(event_id) if event_id else None
+            if method == "GET":
+                return (200, current) if current else (404, {"error": {"code": 404}})
+            if method == "DELETE":
+                if current is None:
+                    return 404, {"error": {"code": 404}}
+                if current.get("status") == "cancelled":
+                    return 410, {"error": {"code": 410}}
+                current["status"] = "cancelled"
+                return 204, None
+            data = json.loads(body or b"{}")
+            if method == "POST":
+                if data.get("id") in self.events:
+                    return 409, {"error": {"code": 409}}
+                event = {"status": "confirmed", **data}
+                self.events[event["id"]] = event
+                return 200, event
+            if current is None:
+                return 404, {"error": {"code": 404}}
+            if method == "PUT":
+                current.clear()
+                current.update({"id": event_id, "status": "confirmed", **data})
+            else:  # PATCH
+                for key, value in data.items():
+                    if isinstance(value, dict) and isinstance(current.get(key), dict):
+                        current[key].update(value)
+                    else:
+                        current[key] = value
+                for part in ("start", "end"):
+                    current[part] = {
+                        k: v for k, v in current.get(part, {}).items() if v is not None
+                    }
+            return 200, current
+
+
+def make_server(fake: FakeCalendar, latency: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _respond(self):
+            with fake.lock:
+                fake.round_trips += 1
+            time.sleep(latency)
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if self.path.startswith("/batch/"):
+                content_type, payload = self._batch(body)
+                self._send(200, content_type, payload)
+                return
+            status, data = fake.handle(self.command, self.path, body)
+            payload = json.dumps(data).encode() if data is not None else b""
+            self._send(status, "application/json", payload)
+
+        def _batch(self, body: bytes) -> tuple[str, bytes]:
+            message = BytesParser().parsebytes(
+                f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body
+            )
+            boundary = "batch_response"
+            out = []
+            for part in message.get_payload():
+                assert isinstance(part, Message)
+                raw = str(part.get_payload(decode=False)).encode()
+                head, _, part_body = raw.replace(b"\r\n", b"\n").partition(b"\n\n")
+                method, path, _ = head.split(b"\n", 1)[0].decode().split(" ", 2)
+                status, data = fake.handle(method, path, part_body)
+                payload = json.dumps(data) if data is not None else ""
+                out.append(
+                    f"--{boundary}\r\n"
+                    "Content-Type: application/http\r\n"
+                    f"Content-ID: <response-{part['Content-ID'][1:-1]}>\r\n\r\n"
+                    f"HTTP/1.1 {status} X\r\n"
+                    "Content-Type: application/json\r\n\r\n"
+                    f"{payload}\r\n"
+                )
+            out.append(f"--{boundary}--\r\n")
+            return f"multipart/mixed; boundary={boundary}", "".join(out).encode()
+
+        def _send(self, status: int, content_type: str, body: bytes) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_GET = do_POST = do_PATCH = do_PUT = do_DELETE = _respond
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+
+
+def build_service(port: int):
+    doc = json.loads(get_static_doc("calendar", "v3"))
+    doc["rootUrl"] = f"http://127.0.0.1:{port}/"
+    doc["baseUrl"] = f"http://127.0.0.1:{port}/calendar/v3/"
+    return build_from_document(doc, http=httplib2.Http())
+
+
+def workload(prefix: str, count: int, action: Action, changed: float) -> list[tuple]:
+    """(event id, details, record) per write, like handle_submit_decision builds."""
+    writes = []
+    for i in range(count):
+        title = f"Group ride {i}" + (" (moved)" if i < count * changed else "")
+        event = EventDetails(title=title, date="2026-07-04", time="18:00")
+        guid = f"https://example.com/p/{prefix}{i}"
+        event_id = calendar.event_id_for(f"bench-{i}", event)
+        record = db.ProcessedRecord(post_guid=guid, decision=action, event=event)
+        writes.append((event_id, event, record))
+    return writes
+
+
+def run(mode: str, writes: list[tuple], action: Action, parallel: int) -> tuple:
+    """Send ``writes``; returns (seconds, writes left pending)."""
+    pending = 0
+    start = time.perf_counter()
+    if mode == "sequential":
+        for event_id, event, record in writes:
+            for attempt in range(8):
+                try:
+                    journal.execute(action, event_id, event, record)
+                    break
+                except Exception as e:
+                    # The old path had no backoff; sleep like a naive retry
+                    if getattr(getattr(e, "resp", None), "status", None) != 403:
+                        raise
+                    time.sleep(0.1 * 2**attempt)
+    else:
+        for event_id, event, record in writes:
+            journal.defer(action, event_id, event, record)
+        result = journal.flush(max_parallel=parallel, http_factory=httplib2.Http)
+        pending = result.failed
+    return time.perf_counter() - start, pending
+
+
+def main():
+    parser = argparse.ArgumentParser(description=(__doc__ or "").partition("\n")[0])
+    parser.add_argument("--events", type=int, default=200, help="writes per scenario")
+    parser.add_argument("--latency", type=float, default=50.0, help="ms per HTTP call")
+    parser.add_argument("--quota", type=float, default=100.0, help="writes/s allowed")
+    parser.add_argument("--parallel", type=int, default=4, help="batches in flight")
+    args = parser.parse_args()
+
+    print(
+        f"{args.events} writes per scenario, {args.latency:g}ms per call, "
+        f"quota {args.quota:g} writes/s\n"
+    )
+    print(
+        f"{'scenario':<22} {'seconds':>8} {'events/s':>9} {'calls':>6} "
+        f"{'403s':>5} {'pending':>7}"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["CALENDAR_ID"] = CALENDAR_ID
+        for mode in ("sequential", "batched"):
+            fake = FakeCalendar(args.quota)
+            server = make_server(fake, args.latency / 1000)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            os.environ["CALSYNC_DB_PATH"] = str(Path(tmp) / f"{mode}.db")
+            db.init_db()
+            calendar._service = build_service(server.server_port)
+
+            for action, changed in ((Action.CREATE, 1.0), (Action.UPDATE, 0.5)):
+                writes = workload(mode, args.events, action, changed)
+                fake.requests = fake.throttled = 0
+                seconds, pending = run(mode, writes, action, args.parallel)
+                written = len(writes) - pending
+                name = f"{mode} {action.value}"
+                print(
+                    f"{name:<22} {seconds:>8.2f} {written / seconds:>9.1f} "
+                    f"{fake.requests:>6} {fake.throttled:>5} {pending:>7}"
+                )
+            server.shutdown()
+            server.server_close()
+            db.close()
+
+
+if __name__ == "__main__":
+    main()
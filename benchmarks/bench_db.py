@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Benchmark: SQLite insert and lookup throughput for processed_posts.
+
+Measures inserts/sec for autocommit vs batched ``db.transaction()`` writes
+and lookups/sec for ``is_processed``/``get_processed`` at several history
+sizes.
+
+    uv run benchmarks/bench_db.py --sizes 10000 100000 1000000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from calendar_sync import db
+from calendar_sync.models import Action
+
+CONTENT = "<p>Group ride this Saturday!</p>" * 40
+
+
+def fill(rows: int, batch: int = 10_000) -> list[str]:
+    """Insert ``rows`` history rows in large transactions."""
+    guids = [f"https://www.instagram.com/p/{i:08x}/" for i in range(rows)]
+    for start in range(0, rows, batch):
+        with db.transaction():
+            for guid in guids[start : start + batch]:
+                db.record_processed(guid, Action.IGNORE, post_content=CONTENT)
+    return guids
+
+
+def rate(n: int, fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return n / (time.perf_counter() - start)
+
+
+def bench_size(rows: int, inserts: int, lookups: int) -> dict[str, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["CALSYNC_DB_PATH"] = str(Path(tmp) / "calendar_sync.db")
+        db.init_db()
+        guids = fill(rows)
+
+        def autocommit():
+            for i in range(inserts):
+                db.record_processed(f"auto-{i}", Action.IGNORE, post_content=CONTENT)
+
+        def batched():
+            with db.transaction():
+                for i in range(inserts):
+                    db.record_processed(
+                        f"batch-{i}", Action.IGNORE, post_content=CONTENT
+                    )
+
+        sample = random.sample(guids, min(lookups, len(guids)))
+        result = {
+            "insert_autocommit": rate(inserts, autocommit),
+            "insert_batched": rate(inserts, batched),
+            "is_processed": rate(
+                len(sample), lambda: [db.is_processed(g) for g in sample]
+            ),
+            "get_processed": rate(
+                len(sample), lambda: [db.get_processed(g) for g in sample]
+            ),
+        }
+        db.close()
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=(__doc__ or "").partition("\n")[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--inserts", type=int, default=2_000)
+    parser.add_argument("--lookups", type=int, default=5_000)
+    args = parser.parse_args()
+
+    print(
+        f"{'rows':>10} {'insert/s (auto)':>16} {'insert/s (txn)':>15} "
+        f"{'is_processed/s':>15} {'get_processed/s':>16}"
+    )
+    for rows in args.sizes:
+        r = bench_size(rows, args.inserts, args.lookups)
+        print(
+            f"{rows:>10,} {r['insert_autocommit']:>16,.0f} {r['insert_batched']:>15,.0f} "
+            f"{r['is_processed']:>15,.0f} {r['get_processed']:>16,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Benchmark: which feed guids are already processed?
+
+Compares the per-post ``is_processed`` lookup (one connection per guid) with
+the bulk ``get_processed_guids`` query against a database with a large
+history.
+
+    uv run benchmarks/bench_processed_lookup.py --rows 100000 --feed-size 500
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+
+def populate(rows: int) -> list[str]:
+    """Fill the history with ``rows`` synthetic processed posts."""
+    from calendar_sync import db
+    from calendar_sync.models import Action
+
+    db.init_db()
+    guids = [f"https://www.instagram.com/p/{i:08x}/" for i in range(rows)]
+    with db.transaction():
+        for guid in guids:
+            db.record_processed(guid, Action.IGNORE, post_content="x" * 2000)
+    return guids
+
+
+def timed(fn, repeat: int) -> float:
+    """Return the best wall-clock time of ``repeat`` calls, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=(__doc__ or "").partition("\n")[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--feed-size", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "calendar_sync.db"
+        os.environ["CALSYNC_DB_PATH"] = str(path)
+        from calendar_sync import db
+
+        print(f"Populating {args.rows:,} history rows...")
+        history = populate(args.rows)
+
+        # A typical feed: mostly already-processed posts plus a few new ones
+        feed = random.sample(history, args.feed_size - 20) + [
+            f"https://www.instagram.com/p/new-{i}/" for i in range(20)
+        ]
+
+        per_post = timed(lambda: [g for g in feed if db.is_processed(g)], args.repeat)
+        bulk = timed(lambda: db.get_processed_guids(feed), args.repeat)
+
+    print(f"\n{args.feed_size} feed guids vs {args.rows:,} history rows")
+    print(f"  is_processed per post:       {per_post * 1000:9.2f} ms")
+    print(f"  get_processed_guids (bulk):  {bulk * 1000:9.2f} ms")
+    print(f"  speedup (per-post → bulk):   {per_post / bulk:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""Benchmark: the whole `calsync process` pipeline, replayed offline.
+
+Runs the real CLI in a subprocess against local fakes of everything it
+talks to, each adding its own latency:
+
+- a feed and image CDN server serving the posts in fixtures/replay.json
+  (``--image-latency`` ms per image);
+- a fake Anthropic API (``ANTHROPIC_BASE_URL``) that answers the
+  pre-filter and plays back each post's recorded tool calls, per model, with
+  token counts estimated from the request like the real API would bill
+  them (``--model-latency`` ms per call);
+- the fake Calendar from bench_calendar_writes.py, seeded with the
+  fixture's events (``--calendar-latency`` ms per call), reached through
+  ``CALSYNC_CALENDAR_URL``.
+
+Each scenario runs the same fixture with different `process` options and
+reports posts/minute, model turns, tokens, cost and API calls per post.
+The numbers are compared with baselines/replay.json; ``--check`` exits
+non-zero when a scenario regressed, and ``--update-baseline`` records the
+current numbers.
+
+    uv run benchmarks/bench_replay.py
+    uv run benchmarks/bench_replay.py --model-latency 800 --scenario routed
+    uv run benchmarks/bench_replay.py --check
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from bench_calendar_writes import FakeCalendar, make_server as make_calendar_server
+
+from calendar_sync import claude
+
+HERE = Path(__file__).parent
+FIXTURE = HERE / "fixtures" / "replay.json"
+BASELINE = HERE / "baselines" / "replay.json"
+ROOT = HERE.parent
+
+SCENARIOS = {
+    "routed": [],
+    "strong-only": ["--no-route"],
+    "unbatched": ["--no-batch-writes"],
+}
+
+# Allowed change before --check calls it a regression. Counts are
+# deterministic; throughput depends on the machine.
+TOLERANCE = {"posts_per_min": 0.30}
+DEFAULT_TOLERANCE = 0.05
+HIGHER_IS_BETTER = {"posts_per_min"}
+
+# Billed per image by the real API, whatever its base64 size
+IMAGE_TOKENS = 1600
+IMAGE_BYTES = b"\xff\xd8\xff\xe0" + bytes(40_000)
+
+
+def load_fixture(cdn: str) -> dict:
+    """The fixture with ``{cdn}`` and ``{day+N}`` filled in."""
+    today = date.today()
+    text = FIXTURE.read_text().replace("{cdn}", cdn)
+    text = re.sub(
+        r"\{day\+(\d+)\}",
+        lambda m: (today + timedelta(days=int(m.group(1)))).isoformat(),
+        text,
+    )
+    return json.loads(text)
+
+
+def rss(posts: list[dict], cdn: str) -> bytes:
+    now = datetime.now(timezone.utc)
+    items = []
+    for post in posts:
+        published = now - timedelta(hours=post["hours_ago"])
+        items.append(
+            f"<item><guid>{post['guid']}</guid>"
+            f"<title>{escape(post['title'])}</title>"
+            f"<link>{cdn}/p/{post['guid']}</link>"
+            f"<author>{post['author']}</author>"
+            f"<pubDate>{format_datetime(published)}</pubDate>"
+            f"<description>{escape(post['content'])}</description></item>"
+        )
+    return (
+        '<?xml version="1.0"?><rss version="2.0"><channel><title>Replay</title>'
+        + "".join(reversed(items))
+        + "</channel></rss>"
+    ).encode()
+
+
+class Counter:
+    """Thread-safe counts for one fake server."""
+
+    def __init__(self):
+        self.counts: dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def add(self, key: str, n: int = 1) -> None:
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + n
+
+
+def serve(handler) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_cdn(feed: list[bytes], latency: float, counter: Counter):
+    """Serves /feed.xml (``feed[0]``) and any /img/ path as a JPEG."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith("/img/"):
+                counter.add("image_requests")
+                time.sleep(latency)
+                body, content_type = IMAGE_BYTES, "image/jpeg"
+            elif self.path == "/feed.xml":
+                counter.add("feed_requests")
+                body, content_type = feed[0], "application/rss+xml"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return serve(Handler)
+
+
+def count_tokens(body: dict) -> int:
+    """Input tokens of a request: ~4 characters each, a flat rate per image."""
+    images = 0
+
+    def strip(value):
+        nonlocal images
+        if isinstance(value, dict):
+            if value.get("type") == "image":
+                images += 1
+                return None
+            return {k: strip(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [strip(v) for v in value]
+        return value
+
+    text = json.dumps(strip({k: body.get(k) for k in ("system", "tools", "messages")}))
+    return len(text) // 4 + images * IMAGE_TOKENS
+
+
+class FakeAnthropic:
+    """Plays back the fixture's model turns for ``POST /v1/messages``."""
+
+    def __init__(self, posts: list[dict], latency: float):
+        self.posts = {f"/p/{p['guid']}": p for p in posts}
+        self.latency = latency
+        self.counter = Counter()
+
+    def _post_for(self, body: dict) -> dict:
+        first = body["messages"][0]["content"]
+        text = first if isinstance(first, str) else first[0]["text"]
+        link = re.search(r"Link: \S+?(/p/\S+)", text)
+        assert link, "no post link in the request"
+        return self.posts[link.group(1)]
+
+    def reply(self, body: dict) -> dict:
+        model = body["model"]
+        post = self._post_for(body)
+        input_tokens = count_tokens(body)
+        if not body.get("tools"):
+            self.counter.add("prefilter_calls")
+            content = [{"type": "text", "text": post["prefilter"]}]
+            stop_reason = "end_turn"
+        else:
+            self.counter.add("turns")
+            role = "fast" if model == claude.FAST_MODEL else "strong"
+            turns = post["turns"].get(role) or next(iter(post["turns"].values()))
+            index = sum(m["role"] == "assistant" for m in body["messages"])
+            if index < len(turns):
+                content = [
+                    {
+                        "type": "tool_use",
+                        "id": f"toolu_{post['guid']}_{index}_{j}",
+                        "name": call["tool"],
+                        "input": call["input"],
+                    }
+                    for j, call in enumerate(turns[index])
+                ]
+                stop_reason = "tool_use"
+            else:
+                content = [{"type": "text", "text": "Done."}]
+                stop_reason = "end_turn"
+        output_tokens = len(json.dumps(content)) // 4
+        self.counter.add(f"input_tokens:{model}", input_tokens)
+        self.counter.add(f"output_tokens:{model}", output_tokens)
+        return {
+            "id": f"msg_{time.monotonic_ns()}",
+            "type": "message",
+            "role": "assistant",
+            "model": model,
+            "content": content,
+            "stop_reason": stop_reason,
+            "stop_sequence": None,
+            "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+        }
+
+    def server(self) -> ThreadingHTTPServer:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                time.sleep(fake.latency)
+                payload = json.dumps(fake.reply(body)).encode()
+                reset = datetime.now(timezone.utc) + timedelta(seconds=60)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                # A generous quota, so pacing doesn't dominate the numbers
+                self.send_header("anthropic-ratelimit-requests-remaining", "1000")
+                self.send_header(
+                    "anthropic-ratelimit-requests-reset", reset.isoformat()
+                )
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return serve(Handler)
+
+
+def run_scenario(name: str, options: list[str], args) -> dict:
+    """Run `calsync process` once against fresh fakes; returns its metrics."""
+    cdn_counter = Counter()
+    feed = [b""]
+    cdn = make_cdn(feed, args.image_latency / 1000, cdn_counter)
+    cdn_url = f"http://127.0.0.1:{cdn.server_port}"
+    fixture = load_fixture(cdn_url)
+    feed[0] = rss(fixture["posts"], cdn_url)
+
+    anthropic = FakeAnthropic(fixture["posts"], args.model_latency / 1000)
+    anthropic_server = anthropic.server()
+    calendar = FakeCalendar(quota=1000)
+    for event in fixture["calendar"]:
+        calendar.events[event["id"]] = {"status": "confirmed", **event}
+    calendar_server = make_calendar_server(calendar, args.calendar_latency / 1000)
+    threading.Thread(target=calendar_server.serve_forever, daemon=True).start()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            "PYTHONPATH": str(ROOT),
+            "ANTHROPIC_API_KEY": "replay",
+            "ANTHROPIC_BASE_URL": f"http://127.0.0.1:{anthropic_server.server_port}",
+            "CALSYNC_CALENDAR_URL": f"http://127.0.0.1:{calendar_server.server_port}",
+            "CALENDAR_ID": "replay@example.com",
+            "CALSYNC_DB_PATH": str(Path(tmp) / "calendar_sync.db"),
+            "CALSYNC_LOGS_DIR": str(Path(tmp) / "logs"),
+        }
+        env.pop("CALSYNC_CHECKPOINT_COMMAND", None)
+        command = [sys.executable, "-m", "calendar_sync.cli", "process"]
+        start = time.perf_counter()
+        completed = subprocess.run(
+            [*command, "--feed", f"{cdn_url}/feed.xml", *options],
+            env=env,
+            cwd=tmp,
+            capture_output=True,
+            text=True,
+        )
+        seconds = time.perf_counter() - start
+        if completed.returncode != 0 or args.verbose:
+            print(completed.stdout[-4000:] + completed.stderr[-4000:])
+        conn = sqlite3.connect(env["CALSYNC_DB_PATH"])
+        posts = conn.execute("SELECT COUNT(*) FROM posts").fetchone()[0]
+        conn.close()
+
+    for server in (cdn, anthropic_server, calendar_server):
+        server.shutdown()
+        server.server_close()
+
+    counts = anthropic.counter.counts
+    tokens = sum(v for k, v in counts.items() if "_tokens:" in k)
+    cost = sum(
+        claude.PRICING[model].cost(
+            counts.get(f"input_tokens:{model}", 0),
+            counts.get(f"output_tokens:{model}", 0),
+        )
+        for model in {k.split(":", 1)[1] for k in counts if ":" in k}
+    )
+    model_calls = counts.get("prefilter_calls", 0) + counts.get("turns", 0)
+    api_calls = (
+        model_calls + calendar.round_trips + cdn_counter.counts.get("image_requests", 0)
+    )
+    per_post = max(posts, 1)
+    return {
+        "posts": posts,
+        "posts_per_min": round(posts / seconds * 60, 1),
+        "turns_per_post": round(counts.get("turns", 0) / per_post, 2),
+        "tokens_per_post": round(tokens / per_post),
+        "usd_per_post": round(cost / per_post, 5),
+        "api_calls_per_post": round(api_calls / per_post, 2),
+    }
+
+
+def regressions(current: dict, baseline: dict) -> list[str]:
+    found = []
+    for metric, value in current.items():
+        base = baseline.get(metric)
+        if not base or metric == "posts":
+            continue
+        change = (value - base) / base
+        if metric in HIGHER_IS_BETTER:
+            change = -change
+        if change > TOLERANCE.get(metric, DEFAULT_TOLERANCE):
+            found.append(f"{metric} {base:g} -> {value:g}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=(__doc__ or "").partition("\n")[0])
+    parser.add_argument("--model-latency", type=float, default=200.0, help="ms")
+    parser.add_argument("--calendar-latency", type=float, default=30.0, help="ms")
+    parser.add_argument("--image-latency", type=float, default=50.0, help="ms")
+    parser.add_argument(
+        "--scenario", action="append", choices=sorted(SCENARIOS), help="repeatable"
+    )
+    parser.add_argument("--check", action="store_true", help="fail on regressions")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--verbose", "-v", action="store_true", help="show CLI output")
+    args = parser.parse_args()
+
+    baselines = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    names = args.scenario or list(SCENARIOS)
+    print(
+        f"Replaying {FIXTURE.name}: model {args.model_latency:g}ms, "
+        f"calendar {args.calendar_latency:g}ms, images {args.image_latency:g}ms\n"
+    )
+    print(
+        f"{'scenario':<12} {'posts':>5} {'posts/min':>10} {'turns':>6} "
+        f"{'tokens':>7} {'$/post':>8} {'calls':>6}  vs baseline"
+    )
+    failed = []
+    for name in names:
+        metrics = run_scenario(name, SCENARIOS[name], args)
+        baseline = baselines.get(name, {})
+        found = regressions(metrics, baseline)
+        failed += [f"{name}: {r}" for r in found]
+        note = "no baseline" if not baseline else ("; ".join(found) or "ok")
+        print(
+            f"{name:<12} {metrics['posts']:>5} {metrics['posts_per_min']:>10.1f} "
+            f"{metrics['turns_per_post']:>6.2f} {metrics['tokens_per_post']:>7} "
+            f"{metrics['usd_per_post']:>8.4f} {metrics['api_calls_per_post']:>6.2f}"
+            f"  {note}"
+        )
+        if args.update_baseline:
+            baselines[name] = metrics
+
+    if args.update_baseline:
+        BASELINE.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+        print(f"\nWrote {BASELINE.relative_to(ROOT)}")
+    if args.check and failed:
+        print("\nRegressions:\n  " + "\n  ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Benchmark: CLI startup, as import time per subcommand.
+
+Runs each subcommand below in a fresh interpreter under ``python -X importtime``
+against an empty temporary database, without CALENDAR_ID or credentials,
+and reports the total import time, wall time, and which heavy SDKs were
+loaded. The commands are the ones that work offline; ``process``, ``serve``
+and friends need their SDKs anyway, so only reaching them (``--help``) is
+timed.
+
+    uv run benchmarks/bench_startup.py
+    uv run benchmarks/bench_startup.py --save startup.json
+    uv run benchmarks/bench_startup.py --compare startup.json
+
+Exits non-zero if a command loads a module listed in FORBIDDEN, or with
+``--compare``, if a command got more than ``--tolerance`` slower.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+COMMANDS = {
+    "--help": ["--help"],
+    "history": ["history"],
+    "details": ["details", "no-such-post"],
+    "report": ["report", "--output", "{tmp}/report.html"],
+    "merge": ["merge", "{tmp}/missing.json.gz"],
+    "db stats": ["db", "stats"],
+    "db explain": ["db", "explain"],
+    "process --help": ["process", "--help"],
+}
+
+# SDKs that none of the commands above should need
+FORBIDDEN = ("anthropic", "googleapiclient", "google.oauth2")
+# Reported (not enforced) so unexpected imports stand out
+WATCHED = FORBIDDEN + ("feedparser", "httpx", "boto3")
+
+
+def run(args: list[str], env: dict) -> tuple[float, float, set[str]]:
+    """Run ``calsync args``; return (import ms, wall ms, top-level packages loaded)."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "calendar_sync.cli", *args],
+        env=env,
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    import_us = 0
+    modules = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        if not self_us.strip().isdigit():
+            continue  # header line
+        import_us += int(self_us)
+        modules.add(name.strip())
+    loaded = {w for w in WATCHED if w in modules}
+    return import_us / 1000, wall_ms, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=(__doc__ or "").partition("\n")[0])
+    parser.add_argument("--runs", type=int, default=5, help="best of N runs")
+    parser.add_argument("--save", type=Path, help="write results as JSON")
+    parser.add_argument("--compare", type=Path, help="compare with saved results")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.25, help="allowed slowdown vs --compare"
+    )
+    args = parser.parse_args()
+
+    baseline = json.loads(args.compare.read_text()) if args.compare else {}
+    results = {}
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {k: v for k, v in os.environ.items() if k != "CALENDAR_ID"}
+        env["CALSYNC_DB_PATH"] = str(Path(tmp) / "calendar_sync.db")
+        env["PYTHONPATH"] = str(ROOT)
+        # Keep a stray .env from supplying CALENDAR_ID
+        env["PYTHON_DOTENV_DISABLED"] = "1"
+        # Create the database once so every command starts from the same state
+        run(["db", "migrate"], env)
+
+        print(f"{'command':<16} {'import (ms)':>11} {'wall (ms)':>10}  heavy modules")
+        for name, argv in COMMANDS.items():
+            argv = [a.format(tmp=tmp) for a in argv]
+            runs = [run(argv, env) for _ in range(args.runs)]
+            import_ms = min(r[0] for r in runs)
+            wall_ms = min(r[1] for r in runs)
+            loaded = sorted(set().union(*(r[2] for r in runs)))
+            results[name] = {
+                "import_ms": round(import_ms, 1),
+                "wall_ms": round(wall_ms, 1),
+            }
+
+            note = ""
+            if name in baseline:
+                before = baseline[name]["import_ms"]
+                note = f" (was {before:.0f})"
+                if import_ms > before * (1 + args.tolerance):
+                    failures.append(
+                        f"{name}: import {import_ms:.0f}ms, was {before:.0f}ms"
+                    )
+            forbidden = [m for m in loaded if m in FORBIDDEN]
+            if forbidden:
+                failures.append(f"{name}: loads {', '.join(forbidden)}")
+            print(
+                f"{name:<16} {import_ms:>11.0f} {wall_ms:>10.0f}  "
+                f"{', '.join(loaded) or '-'}{note}"
+            )
+
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2) + "\n")
+    if failures:
+        print("\nRegressions:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""Benchmark: per-post latency (p50/p95/p99) with and without hedging and deadlines.
+
+Simulates the calls one post makes (a pre-filter call, three model turns,
+two calendar searches and up to three image downloads) with latencies drawn
+from a heavy-tailed distribution: most calls take about ``--base`` ms,
+but ``--stall`` of them take 20-60x longer, like a stuck connection or an
+overloaded backend. The same seeded draws are replayed for each scenario:
+
+- ``baseline``: every call waits as long as it takes (the old behaviour);
+- ``hedged``: read-only calls (pre-filter, searches, images) go through
+  ``latency.Hedger``, which sends a second copy after the p95 delay;
+- ``hedged+deadline``: also a per-call timeout on model turns (a stalled
+  turn is retried after ``--call-timeout`` ms) and a ``--post-timeout`` ms
+  budget per post, after which the post is left for the next run.
+
+    uv run benchmarks/bench_tail_latency.py
+    uv run benchmarks/bench_tail_latency.py --posts 400 --stall 0.05
+"""
+
+import argparse
+import random
+import time
+
+from calendar_sync import latency
+
+READ_ONLY = ("prefilter", "search", "search", "image", "image", "image")
+MODEL_TURNS = 3
+
+
+def draw(rng: random.Random, base: float, stall: float) -> float:
+    """Seconds one call takes."""
+    seconds = base * rng.lognormvariate(0, 0.3)
+    if rng.random() < stall:
+        seconds *= rng.uniform(20, 60)
+    return seconds
+
+
+class Call:
+    """A call whose copies each take the next pre-drawn latency."""
+
+    def __init__(self, latencies: list[float]):
+        self.latencies = latencies
+
+    def __call__(self) -> None:
+        time.sleep(self.latencies.pop(0) if self.latencies else 0.0)
+
+
+def run(scenario: str, posts: list[dict], args) -> tuple[list[float], int]:
+    """Per-post seconds, and how many posts ran out of time."""
+    # Scaled to the simulated latencies; the CLI starts at 2s
+    hedgers = {
+        name: latency.Hedger(name, initial_delay=3 * args.base / 1000)
+        for name in set(READ_ONLY)
+    }
+    call_timeout = args.call_timeout / 1000
+    seconds, gave_up = [], 0
+    for post in posts:
+        deadline = latency.Deadline(
+            args.post_timeout / 1000 if scenario == "hedged+deadline" else None
+        )
+        try:
+            for name, draws in post["read_only"]:
+                call = Call(list(draws))
+                if scenario == "baseline":
+                    call()
+                else:
+                    hedgers[name].call(call)
+            for draws in post["turns"]:
+                deadline.check()
+                first, retry = draws
+                if scenario == "hedged+deadline" and first > call_timeout:
+                    # Timed out; the retry usually gets a normal response
+                    time.sleep(call_timeout)
+                    time.sleep(retry)
+                else:
+                    time.sleep(first)
+        except latency.DeadlineExceeded:
+            gave_up += 1
+        seconds.append(deadline.elapsed())
+    return seconds, gave_up
+
+
+def main():
+    parser = argparse.ArgumentParser(description=(__doc__ or "").partition("\n")[0])
+    parser.add_argument("--posts", type=int, default=200)
+    parser.add_argument("--base", type=float, default=5.0, help="typical call, ms")
+    parser.add_argument("--stall", type=float, default=0.03, help="share of slow calls")
+    parser.add_argument("--call-timeout", type=float, default=50.0, help="ms")
+    parser.add_argument("--post-timeout", type=float, default=250.0, help="ms")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    base = args.base / 1000
+    posts = []
+    for _ in range(args.posts):
+        posts.append(
+            {
+                # Two draws per read-only call: the original and a hedge
+                "read_only": [
+                    (name, [draw(rng, base, args.stall) for _ in range(2)])
+                    for name in READ_ONLY
+                ],
+                # A model turn takes a few calls' worth of time
+                "turns": [
+                    (4 * draw(rng, base, args.stall), 4 * draw(rng, base, 0))
+                    for _ in range(MODEL_TURNS)
+                ],
+            }
+        )
+
+    print(
+        f"{args.posts} posts, {args.base:g}ms typical call, "
+        f"{args.stall:.0%} stalled calls\n"
+    )
+    print(
+        f"{'scenario':<18} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+        f"{'total s':>8} {'gave up':>8}"
+    )
+    for scenario in ("baseline", "hedged", "hedged+deadline"):
+        seconds, gave_up = run(scenario, posts, args)
+        p50, p95, p99 = (latency.percentile(seconds, q) * 1000 for q in (50, 95, 99))
+        print(
+            f"{scenario:<18} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f} "
+            f"{sum(seconds):>8.2f} {gave_up:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Benchmark: base snapshot transfer, raw vs gzip-compressed and checksummed.
+
+Grows a database to ``--mb`` megabytes (today's hot DB is ~2 MB, so the
+default is ~10x that), then pushes and pulls it through dbsync against an
+in-process moto S3 and compares with the old whole-file put/get. Local moto
+time mostly measures CPU (compression, hashing, quick_check), so the bytes
+are also converted to an estimated wire time at ``--mbps``.
+
+    uv run benchmarks/bench_transfer.py --mb 20 --mbps 50
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import boto3
+from moto import mock_aws
+
+from calendar_sync import db, dbsync
+from calendar_sync.models import Action
+
+BUCKET = "bench"
+
+WORDS = (
+    "group ride saturday sunday morning meet coffee gravel loop miles pace "
+    "no-drop social bring lights helmet route trail lake river bridge park "
+    "minneapolis st paul northeast uptown fixie cargo bike kidical mass "
+    "critical repair clinic potluck after party tacos beer rsvp link bio"
+).split()
+
+
+def caption(rng: random.Random) -> str:
+    words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(30, 120)))
+    tag = rng.getrandbits(64)
+    return (
+        f'<p>{words}</p><img src="https://scontent.cdninstagram.com/v/{tag:016x}.jpg">'
+    )
+
+
+def grow(target_bytes: int) -> int:
+    """Insert posts until the database file reaches ``target_bytes``."""
+    rng = random.Random(0)
+    path = db.get_db_path()
+    posts = 0
+    while not path.exists() or path.stat().st_size < target_bytes:
+        with db.transaction():
+            for _ in range(1_000):
+                db.record_processed(
+                    f"https://www.instagram.com/p/{posts:08x}/",
+                    rng.choice([Action.IGNORE, Action.CREATE]),
+                    post_content=caption(rng),
+                    reasoning=" ".join(rng.choice(WORDS) for _ in range(40)),
+                    post_title=f"Post {posts}",
+                )
+                posts += 1
+        db.connect().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return posts
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=(__doc__ or "").partition("\n")[0])
+    parser.add_argument("--mb", type=float, default=20.0, help="database size to test")
+    parser.add_argument("--mbps", type=float, default=50.0, help="assumed link speed")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, mock_aws():
+        s3 = boto3.client("s3", region_name="us-east-1")
+        s3.create_bucket(Bucket=BUCKET)
+
+        os.environ["CALSYNC_DB_PATH"] = str(Path(tmp) / "ci" / "calendar_sync.db")
+        db.init_db()
+        posts = grow(int(args.mb * 1024 * 1024))
+        path = db.get_db_path()
+        raw_bytes = path.stat().st_size
+
+        raw_up = timed(
+            lambda: s3.put_object(Bucket=BUCKET, Key="raw.db", Body=path.read_bytes())
+        )
+        raw_down = timed(
+            lambda: s3.get_object(Bucket=BUCKET, Key="raw.db")["Body"].read()
+        )
+
+        push_store = dbsync.RemoteStore(s3, BUCKET, "db/")
+        gz_up = timed(lambda: dbsync.push(push_store, snapshot=True))
+        db.close()
+
+        os.environ["CALSYNC_DB_PATH"] = str(Path(tmp) / "laptop" / "calendar_sync.db")
+        pull_store = dbsync.RemoteStore(s3, BUCKET, "db/")
+        gz_down = timed(lambda: dbsync.pull(pull_store))
+        db.close()
+
+    gz_bytes = pull_store.bytes_down
+
+    def wire(n: int) -> float:
+        return n * 8 / (args.mbps * 1_000_000)
+
+    print(f"{posts:,} posts, {raw_bytes / 1e6:.1f} MB database")
+    print(
+        f"{'':<12} {'bytes':>14} {'push (s)':>9} {'pull (s)':>9} {'wire @ link (s)':>16}"
+    )
+    print(
+        f"{'raw':<12} {raw_bytes:>14,} {raw_up:>9.2f} {raw_down:>9.2f} "
+        f"{wire(raw_bytes):>16.2f}"
+    )
+    print(
+        f"{'gzip+sha256':<12} {gz_bytes:>14,} {gz_up:>9.2f} {gz_down:>9.2f} "
+        f"{wire(gz_bytes):>16.2f}"
+    )
+    print(
+        f"Saved {raw_bytes - gz_bytes:,} bytes per base transfer "
+        f"({1 - gz_bytes / raw_bytes:.0%})"
+    )
+
+
+if __name__ == "__main__":
+    main()
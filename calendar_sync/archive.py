@@ -0,0 +1,142 @@
+"""Move old processing history out of the live database into archive files.
+
+Archived posts are written as gzip-compressed JSON lines, one file per month
+of their latest decision, under ``data/archive/``. Files are immutable and
+their names unique across machines (month, time and a random suffix): CI
+archives from a fresh checkout that has none of the earlier files, so a
+later run covering the same month must never reuse a name already uploaded.
+
+The live database keeps a row per archived guid in ``archived_posts`` so
+duplicate detection and cumulative cost still work, and ``db.get_processed``
+reads the archive file back when asked about an archived post.
+"""
+
+import gzip
+import json
+import os
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from . import db
+
+
+def get_archive_dir() -> Path:
+    """Archive files live next to the database file."""
+    return db.get_db_path().parent / "archive"
+
+
+class ArchiveResult:
+    """Result of an archive run."""
+
+    def __init__(self, files: list[str], posts: int, decisions: int):
+        self.files = files
+        self.posts = posts
+        self.decisions = decisions
+
+
+def _next_archive_name(month: str) -> str:
+    """Return a new file name for ``month``, unique across machines and runs."""
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    return f"{month}.{stamp}-{uuid.uuid4().hex[:8]}.jsonl.gz"
+
+
+def _write_archive(name: str, rows: list[dict]) -> None:
+    """Write rows to a new archive file atomically and durably."""
+    archive_dir = get_archive_dir()
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = archive_dir / f".{name}.tmp"
+    # mtime=0 keeps the bytes deterministic for the same rows
+    with open(tmp_path, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as gz:
+            for row in rows:
+                gz.write((json.dumps(row, sort_keys=True) + "\n").encode("utf-8"))
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp_path, archive_dir / name)
+
+
+def select_archivable(cutoff: datetime) -> dict[str, list[dict]]:
+    """Return decision rows to archive, grouped by post guid.
+
+    A post is archivable when its latest decision is older than ``cutoff``.
+    Posts that created or updated a calendar event stay hot: fetch-events
+    still joins live (and long-running recurring) events to their post for
+    images and source metadata.
+    """
+    rows = db.connect().execute(
+        """
+        SELECT pp.* FROM processed_posts pp
+        WHERE pp.post_guid IN (
+            SELECT p.post_guid
+            FROM posts p JOIN decisions d ON d.post_id = p.id
+            GROUP BY p.id
+            HAVING MAX(d.processed_at) < ?
+               AND SUM(d.calendar_event_id IS NOT NULL
+                       AND d.decision IN ('create', 'update')) = 0
+        )
+        ORDER BY pp.id
+        """,
+        (cutoff.isoformat(),),
+    )
+    by_guid: dict[str, list[dict]] = defaultdict(list)
+    for row in rows:
+        by_guid[row["post_guid"]].append(dict(row))
+    return dict(by_guid)
+
+
+def archive_older_than(days: int, dry_run: bool = False) -> ArchiveResult:
+    """Move posts whose latest decision is older than ``days`` into archive files."""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    by_guid = select_archivable(cutoff)
+
+    # Group posts by the month of their latest decision
+    by_month: dict[str, list[str]] = defaultdict(list)
+    for guid, rows in by_guid.items():
+        by_month[max(r["processed_at"] for r in rows)[:7]].append(guid)
+
+    decisions = sum(len(rows) for rows in by_guid.values())
+    if dry_run or not by_guid:
+        return ArchiveResult(sorted(by_month), len(by_guid), decisions)
+
+    files = []
+    file_by_guid: dict[str, str] = {}
+    for month in sorted(by_month):
+        name = _next_archive_name(month)
+        _write_archive(name, [row for guid in by_month[month] for row in by_guid[guid]])
+        files.append(name)
+        for guid in by_month[month]:
+            file_by_guid[guid] = name
+
+    # Files are durable on disk before anything leaves the database
+    db.mark_archived(
+        [
+            (
+                guid,
+                file_by_guid[guid],
+                len(rows),
+                sum(r["cost_usd"] or 0 for r in rows),
+            )
+            for guid, rows in by_guid.items()
+        ]
+    )
+
+    return ArchiveResult(files, len(by_guid), decisions)
+
+
+def read_archive(name: str) -> list[dict]:
+    """Read every row from an archive file."""
+    path = get_archive_dir() / name
+    if not path.exists():
+        raise FileNotFoundError(
+            f"Archive file {name} is not present locally; "
+            "fetch it with `uv run scripts/pull_db.py --archives`"
+        )
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def read_archived_post(name: str, post_guid: str) -> list[dict]:
+    """Read the decision rows for one post from an archive file."""
+    return [row for row in read_archive(name) if row["post_guid"] == post_guid]
@@ -0,0 +1,96 @@
+"""Send many Calendar API requests through the batch endpoint.
+
+One HTTP round trip per request makes a run's writes as slow as its
+latency, and firing them back to back runs into the per-user write quota.
+``execute_all`` packs requests into batch calls of up to ``batch_size``, sends
+at most ``max_parallel`` batches at once, and retries the parts that were
+rate limited (429, or 403 with a rate-limit reason) or failed transiently,
+with exponential backoff (see ratelimit.py). Anything else is returned to
+the caller.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from . import ratelimit
+
+# Calendar accepts up to 50 requests per batch call
+MAX_BATCH_SIZE = 50
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether sending the request again later may succeed."""
+    return ratelimit.classify(error) is not None
+
+
+def execute_all(
+    service,
+    requests: dict[str, object],
+    http_factory: Callable[[], object],
+    max_parallel: int = 4,
+    batch_size: int = MAX_BATCH_SIZE,
+    max_attempts: int = 6,
+    sleep: Callable[[float], None] = time.sleep,
+    limiter: ratelimit.Upstream | None = None,
+) -> dict[str, tuple[object, Exception | None]]:
+    """Execute ``requests`` (id -> unexecuted API request) in batches.
+
+    Returns ``(response, error)`` per id; exactly one of them is None. Each
+    worker thread gets its own connection from ``http_factory``, since
+    httplib2 connections can't be shared between threads. Batch calls are
+    paced by ``limiter`` (the shared Google Calendar one by default), which
+    also learns from throttled parts.
+    """
+    limiter = limiter or ratelimit.upstream("google_calendar")
+    local = threading.local()
+
+    def http():
+        if not hasattr(local, "http"):
+            local.http = http_factory()
+        return local.http
+
+    def send(chunk: list[str]) -> dict[str, tuple[object, Exception | None]]:
+        out: dict[str, tuple[object, Exception | None]] = {}
+
+        def callback(request_id, response, exception):
+            out[request_id] = (response, exception)
+
+        batch = service.new_batch_http_request(callback=callback)
+        for request_id in chunk:
+            batch.add(pending[request_id], request_id=request_id)
+        try:
+            with limiter.slot(cost=len(chunk)):
+                batch.execute(http=http())
+        except Exception as e:
+            # The batch call itself failed; retry (or report) every part
+            out = {request_id: (None, e) for request_id in chunk}
+        kinds = {ratelimit.classify(error) for _, error in out.values() if error}
+        if "throttle" in kinds:
+            limiter.record_failure("throttle")
+        elif "transient" in kinds:
+            limiter.record_failure("transient")
+        else:
+            limiter.record_success()
+        return out
+
+    results: dict[str, tuple[object, Exception | None]] = {}
+    pending = dict(requests)
+    with ThreadPoolExecutor(max_workers=max_parallel) as pool:
+        for attempt in range(max_attempts):
+            ids = list(pending)
+            chunks = [ids[i : i + batch_size] for i in range(0, len(ids), batch_size)]
+            retry: dict[str, object] = {}
+            for out in pool.map(send, chunks):
+                for request_id, (response, error) in out.items():
+                    if error is not None and is_retryable(error):
+                        retry[request_id] = pending[request_id]
+                        limiter.observe(ratelimit.headers_of(error))
+                    results[request_id] = (response, error)
+            if not retry or attempt == max_attempts - 1:
+                break
+            # Retry-After hints pause the limiter itself
+            sleep(ratelimit.backoff_delay(attempt))
+            pending = retry
+    return results
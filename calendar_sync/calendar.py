@@ -1,22 +1,36 @@
 """Google Calendar API wrapper."""
 
+import base64
+import hashlib
 import os
+import threading
 from datetime import datetime, timedelta
 from pathlib import Path
 from zoneinfo import ZoneInfo
 
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+from . import ratelimit
+from .models import Action, CalendarEvent, EventDetails
 
-from .models import CalendarEvent, EventDetails
+# The Google client libraries are imported on first use (see
+# _build_calendar_service): they take longer to import than most commands
+# take to run, and commands like `calsync history` never talk to the API.
 
-# Default calendar ID - can be overridden
-CALENDAR_ID = os.getenv("CALENDAR_ID")
+SCOPES = ["https://www.googleapis.com/auth/calendar"]
 
-if not CALENDAR_ID:
-    raise ValueError("CALENDAR_ID environment variable is not set")
+# Socket timeout for Calendar connections opened from now on (None: no limit)
+http_timeout: float | None = 60.0
 
-SCOPES = ["https://www.googleapis.com/auth/calendar"]
+
+def get_calendar_id() -> str:
+    """The calendar to read and write, from the CALENDAR_ID environment variable.
+
+    Checked on first use rather than at import, so commands that never touch
+    the calendar work without it.
+    """
+    calendar_id = os.getenv("CALENDAR_ID")
+    if not calendar_id:
+        raise ValueError("CALENDAR_ID environment variable is not set")
+    return calendar_id
 
 
 def get_credentials_path() -> Path:
@@ -28,15 +42,100 @@ def get_credentials_path() -> Path:
 
 
 def get_calendar_service():
-    """Build and return the Google Calendar service."""
+    """Return the Google Calendar service, built once per process.
+
+    Building it loads the discovery document and credentials; reusing it also
+    keeps its HTTP connection open between calls. Like the underlying
+    httplib2 transport, it is not thread-safe.
+    """
+    global _service
+    if _service is None:
+        _service = _build_calendar_service()
+    return _service
+
+
+_service = None
+_credentials = None
+
+
+def new_http():
+    """A separate authorized HTTP connection, for API calls from another thread."""
+    get_calendar_service()
+    return _authorized_http()
+
+
+def _authorized_http():
+    import google_auth_httplib2
+    from googleapiclient.http import build_http
+
+    http = build_http()
+    http.timeout = http_timeout
+    if _credentials is None:
+        # A local stand-in for the API (CALSYNC_CALENDAR_URL)
+        return http
+    return google_auth_httplib2.AuthorizedHttp(_credentials, http=http)
+
+
+def _build_calendar_service():
+    global _credentials
+    from google.oauth2 import service_account
+    from googleapiclient.discovery import build
+
+    if url := os.getenv("CALSYNC_CALENDAR_URL"):
+        return _build_local_service(url.rstrip("/"))
+
     creds_path = get_credentials_path()
     if not creds_path.exists():
         raise FileNotFoundError(f"Credentials not found at {creds_path}")
 
-    credentials = service_account.Credentials.from_service_account_file(
+    _credentials = service_account.Credentials.from_service_account_file(
         str(creds_path), scopes=SCOPES
     )
-    return build("calendar", "v3", credentials=credentials)
+    return build("calendar", "v3", http=_authorized_http())
+
+
+def _build_local_service(url: str):
+    """A service that talks to a fake Calendar at ``url``, without credentials.
+
+    Used by benchmarks/bench_replay.py. The batch endpoint is derived from the
+    discovery document's root URL, so that is replaced along with the base.
+    """
+    import json
+
+    from googleapiclient.discovery import build_from_document
+    from googleapiclient.discovery_cache import get_static_doc
+
+    doc = json.loads(get_static_doc("calendar", "v3") or "{}")
+    doc["rootUrl"] = f"{url}/"
+    doc["baseUrl"] = f"{url}/calendar/v3/"
+    return build_from_document(doc, http=_authorized_http())
+
+
+# Connections of threads that call the API with ``on_own_connection``
+_local = threading.local()
+
+
+def on_own_connection(fn, *args, **kwargs):
+    """Call ``fn`` with this thread's API requests sent over its own connection.
+
+    For calls made from worker threads (e.g. hedged searches), since the
+    shared service's connection can't be used by two threads at once.
+    """
+    if getattr(_local, "http", None) is None:
+        _local.http = new_http()
+    _local.active = True
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _local.active = False
+
+
+def execute(request):
+    """Execute an API request under the shared Calendar limits (ratelimit.py)."""
+    limiter = ratelimit.upstream("google_calendar")
+    if getattr(_local, "active", False):
+        return limiter.call(request.execute, http=_local.http)
+    return limiter.call(request.execute)
 
 
 def search_events_by_date(
@@ -58,16 +157,14 @@ def search_events_by_date(
     time_min = f"{start_date}T00:00:00Z"
     time_max = f"{end_date}T23:59:59Z"
 
-    events_result = (
-        service.events()
-        .list(
-            calendarId=CALENDAR_ID,
+    events_result = execute(
+        service.events().list(
+            calendarId=get_calendar_id(),
             timeMin=time_min,
             timeMax=time_max,
             singleEvents=True,
             orderBy="startTime",
         )
-        .execute()
     )
 
     return [_parse_event(e) for e in events_result.get("items", [])]
@@ -99,17 +196,15 @@ def search_events_by_keyword(
     all_events: list[CalendarEvent] = []
 
     for keyword in normalized:
-        events_result = (
-            service.events()
-            .list(
-                calendarId=CALENDAR_ID,
+        events_result = execute(
+            service.events().list(
+                calendarId=get_calendar_id(),
                 timeMin=time_min,
                 timeMax=time_max,
                 q=keyword,
                 singleEvents=True,
                 orderBy="startTime",
             )
-            .execute()
         )
 
         for e in events_result.get("items", []):
@@ -130,40 +225,176 @@ def search_events_by_keyword(
     return all_events[:5]
 
 
+def event_id_for(post_guid: str, event: EventDetails) -> str:
+    """Deterministic calendar event ID for an event created from a post.
+
+    Google accepts client-chosen IDs of 5-1024 base32hex characters. Deriving
+    the ID from the post (and the event's date/time, since one post can
+    announce several events) makes creating it again a no-op instead of a
+    duplicate, e.g. on a retry or when shards overlap.
+    """
+    key = f"{post_guid}|{event.date}|{event.time or ''}".encode("utf-8")
+    digest = hashlib.sha256(key).digest()
+    return base64.b32hexencode(digest).decode("ascii").rstrip("=").lower()
+
+
 def create_event(
     event: EventDetails,
+    event_id: str | None = None,
 ) -> str:
     """Create a new calendar event.
 
+    With ``event_id``, creating an event that already exists (or was deleted)
+    overwrites and restores it rather than failing.
+
     Returns: The created event's ID
     """
     service = get_calendar_service()
 
     # Build event body
     body = _build_event_body(event)
-
-    result = service.events().insert(calendarId=CALENDAR_ID, body=body).execute()
+    if event_id:
+        body["id"] = event_id
+
+    from googleapiclient.errors import HttpError
+
+    calendar_id = get_calendar_id()
+    try:
+        result = execute(service.events().insert(calendarId=calendar_id, body=body))
+    except HttpError as e:
+        if not event_id or e.resp.status != 409:
+            raise
+        # Deleted events keep their ID; "confirmed" brings one back
+        result = execute(
+            service.events().update(
+                calendarId=calendar_id,
+                eventId=event_id,
+                body={**body, "status": "confirmed"},
+            )
+        )
+    write_stats.created += 1
     return result["id"]
 
 
+class WriteStats:
+    """Calendar writes sent (or skipped) by this process, for run summaries."""
+
+    def __init__(self):
+        self.created = 0
+        self.patched = 0
+        self.unchanged = 0
+        self.deleted = 0
+
+    @property
+    def sent(self) -> int:
+        return self.created + self.patched + self.deleted
+
+    def record(self, kind: str) -> None:
+        """Count one sent write: "created", "patched" or "deleted"."""
+        setattr(self, kind, getattr(self, kind) + 1)
+
+    def copy(self) -> "WriteStats":
+        other = WriteStats()
+        vars(other).update(vars(self))
+        return other
+
+
+write_stats = WriteStats()
+
+
 def update_event(
     event_id: str,
     event: EventDetails,
 ) -> str:
-    """Update an existing calendar event.
+    """Update an existing calendar event, sending only what changed.
+
+    The current event is fetched and compared with the desired one. If nothing
+    differs, no write is made (so its etag, events.json and the site stay
+    unchanged); otherwise only the changed fields are sent with
+    ``events.patch``, leaving anything edited by hand in the calendar UI
+    alone.
 
     Returns: The updated event's ID
     """
-    service = get_calendar_service()
+    planned = write_request(Action.UPDATE, event_id, event, get_event(event_id))
+    if planned is None:
+        write_stats.unchanged += 1
+        return event_id
+    kind, request = planned
+    result = execute(request)
+    write_stats.record(kind)
+    return result["id"]
 
-    body = _build_event_body(event)
 
-    result = (
-        service.events()
-        .update(calendarId=CALENDAR_ID, eventId=event_id, body=body)
-        .execute()
+def write_request(
+    action: Action,
+    event_id: str,
+    event: EventDetails | None,
+    current: dict | None,
+):
+    """Plan the API call that applies ``action`` to the event ``event_id``.
+
+    ``current`` is the event as the API returns it now, or None if it doesn't
+    exist. Returns ``(kind, request)`` with an unexecuted request and the
+    ``WriteStats`` counter it belongs to, or None if nothing needs sending.
+    """
+    events = get_calendar_service().events()
+    calendar_id = get_calendar_id()
+    if action == Action.CANCEL:
+        if current is None or current.get("status") == "cancelled":
+            return None
+        return "deleted", events.delete(calendarId=calendar_id, eventId=event_id)
+
+    assert event is not None
+    body = _build_event_body(event)
+    if current is None:
+        if action == Action.CREATE:
+            body = {**body, "id": event_id}
+            return "created", events.insert(calendarId=calendar_id, body=body)
+        # Let the API report the missing event, as a full update always did
+        request = events.update(calendarId=calendar_id, eventId=event_id, body=body)
+        return "patched", request
+
+    changes = event_changes(current, body)
+    if action == Action.CREATE and current.get("status") == "cancelled":
+        # Deleted events keep their ID; "confirmed" brings one back
+        changes["status"] = "confirmed"
+    if not changes:
+        return None
+    request = events.patch(calendarId=calendar_id, eventId=event_id, body=changes)
+    return "patched", request
+
+
+def _same_time(current: dict, desired: dict) -> bool:
+    if "date" in desired:
+        return "dateTime" not in current and current.get("date") == desired["date"]
+    if not current.get("dateTime"):
+        return False
+    # The API may render the same instant with a different offset
+    current_dt = datetime.fromisoformat(current["dateTime"].replace("Z", "+00:00"))
+    desired_dt = datetime.fromisoformat(desired["dateTime"])
+    return current_dt == desired_dt and (
+        current.get("timeZone", desired["timeZone"]) == desired["timeZone"]
     )
-    return result["id"]
+
+
+def event_changes(current: dict, desired: dict) -> dict:
+    """Patch body turning ``current`` (an API event resource) into ``desired``.
+
+    Empty when the event already matches. Text fields missing from
+    ``desired`` are cleared, as a full update would.
+    """
+    changes = {}
+    for key in ("summary", "location", "description"):
+        want = desired.get(key) or ""
+        if (current.get(key) or "") != want:
+            changes[key] = want
+    for key in ("start", "end"):
+        if not _same_time(current.get(key) or {}, desired[key]):
+            # Patch merges nested objects; null out the other form when
+            # switching between all-day and timed
+            changes[key] = {"date": None, "dateTime": None, **desired[key]}
+    return changes
 
 
 def delete_event(
@@ -171,7 +402,31 @@ def delete_event(
 ) -> None:
     """Delete a calendar event."""
     service = get_calendar_service()
-    service.events().delete(calendarId=CALENDAR_ID, eventId=event_id).execute()
+    execute(service.events().delete(calendarId=get_calendar_id(), eventId=event_id))
+    write_stats.deleted += 1
+
+
+def get_event(event_id: str) -> dict | None:
+    """Fetch an event's raw API resource, or None if it doesn't exist.
+
+    Deleted events are still returned, with status "cancelled".
+    """
+    from googleapiclient.errors import HttpError
+
+    service = get_calendar_service()
+    try:
+        return execute(
+            service.events().get(calendarId=get_calendar_id(), eventId=event_id)
+        )
+    except HttpError as e:
+        if e.resp.status in (404, 410):
+            return None
+        raise
+
+
+def preview_event(event_id: str, event: EventDetails) -> CalendarEvent:
+    """The event as it will read once written, for writes not sent yet."""
+    return _parse_event({**_build_event_body(event), "id": event_id})
 
 
 def _parse_event(event_data: dict) -> CalendarEvent:
@@ -0,0 +1,76 @@
+"""Periodic checkpoints of a `process` run's progress.
+
+A CI job that is killed mid-run loses everything it decided unless the
+database was pushed. With a checkpoint command (e.g.
+``uv run scripts/push_db.py``), `process` pushes every ``every_posts`` posts
+or ``every_seconds`` seconds, whichever comes first. Before each push it:
+
+- flushes queued calendar writes, so every pushed decision's event exists
+  and no write is left only in the local ``calendar_journal``;
+- closes the database, folding the WAL into the main file and letting the
+  push replace the file if it has to merge another run's snapshot.
+
+A restarted run pulls the database as usual and skips every post decided
+before the last checkpoint, so those model calls aren't paid for twice.
+"""
+
+import shlex
+import subprocess
+import time
+from typing import Callable
+
+from . import db
+
+# A checkpoint push that takes longer than this is abandoned for this round
+COMMAND_TIMEOUT = 300
+
+
+class Checkpointer:
+    """Decides when a run checkpoints, and runs the push command."""
+
+    def __init__(
+        self,
+        command: str,
+        every_posts: int | None = None,
+        every_seconds: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.command = command
+        self.every_posts = every_posts
+        self.every_seconds = every_seconds
+        self.clock = clock
+        self.posts_since = 0
+        self.last_at = clock()
+        self.pushes = 0
+        self.failures = 0
+
+    def post_done(self) -> bool:
+        """Count a decided post; True if a checkpoint is due."""
+        self.posts_since += 1
+        if self.every_posts and self.posts_since >= self.every_posts:
+            return True
+        return bool(
+            self.every_seconds and self.clock() - self.last_at >= self.every_seconds
+        )
+
+    def push(self) -> str | None:
+        """Run the checkpoint command; returns an error message if it failed."""
+        self.posts_since = 0
+        self.last_at = self.clock()
+        db.close()
+        try:
+            completed = subprocess.run(
+                shlex.split(self.command),
+                capture_output=True,
+                text=True,
+                timeout=COMMAND_TIMEOUT,
+            )
+        except (OSError, subprocess.TimeoutExpired) as e:
+            self.failures += 1
+            return str(e)
+        if completed.returncode != 0:
+            self.failures += 1
+            output = (completed.stdout + completed.stderr).strip().splitlines()
+            return f"exit {completed.returncode}: " + (output[-1] if output else "")
+        self.pushes += 1
+        return None
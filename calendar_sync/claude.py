@@ -2,24 +2,67 @@
 
 import base64
 import json
+import os
+import re
+import time
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any, cast
 from zoneinfo import ZoneInfo
 
 import httpx
-from anthropic import Anthropic
 from pydantic import ValidationError
 
-from . import calendar, db
+from . import calendar, db, journal, latency, ratelimit, responsecache, tracing
 from .models import Action, ClaudeDecision, EventDetails, RssPost
 
-# Pricing per million tokens (Claude 4.6 Sonnet)
-INPUT_COST_PER_M = 3.00
-OUTPUT_COST_PER_M = 15.00
-CACHE_WRITE_COST_PER_M = 3.75  # 25% surcharge over input price
-CACHE_READ_COST_PER_M = 0.30  # 10% of input price
-MODEL_NAME = "claude-sonnet-4-6"
+if TYPE_CHECKING:
+    # The SDK is imported on first use in get_client(); it is slow to import
+    # and most commands only need this module's helpers and constants.
+    from anthropic import Anthropic
+    from anthropic.types import Message, ToolUseBlock
+
+
+class ModelPricing:
+    """Dollars per million tokens for one model.
+
+    Cache writes cost 25% more than input tokens and cache reads 10% of them.
+    """
+
+    def __init__(self, input_per_m: float, output_per_m: float):
+        self.input_per_m = input_per_m
+        self.output_per_m = output_per_m
+        self.cache_write_per_m = input_per_m * 1.25
+        self.cache_read_per_m = input_per_m * 0.10
+
+    def cost(
+        self,
+        input_tokens: int,
+        output_tokens: int,
+        cache_creation_tokens: int = 0,
+        cache_read_tokens: int = 0,
+    ) -> float:
+        return (
+            input_tokens * self.input_per_m
+            + output_tokens * self.output_per_m
+            + cache_creation_tokens * self.cache_write_per_m
+            + cache_read_tokens * self.cache_read_per_m
+        ) / 1_000_000
+
+
+PRICING = {
+    "claude-sonnet-4-6": ModelPricing(3.00, 15.00),
+    "claude-haiku-4-5": ModelPricing(1.00, 5.00),
+}
+
+# Routing (see analyze_post): posts go to the fast model first, and its
+# decision only stands if it is confident, didn't need the images and
+# doesn't change an existing event
+FAST_MODEL = "claude-haiku-4-5"
+STRONG_MODEL = "claude-sonnet-4-6"
+ESCALATION_CONFIDENCE = 0.8
+ESCALATION_ACTIONS = {Action.UPDATE, Action.CANCEL}
+
 TIME_ZONE = "America/Chicago"
 
 
@@ -50,7 +93,9 @@ def local_time_str(dt: datetime | str | None) -> str:
 
 
 def get_logs_dir() -> Path:
-    """Get the logs directory path."""
+    """Get the logs directory path (``CALSYNC_LOGS_DIR`` overrides it)."""
+    if path := os.getenv("CALSYNC_LOGS_DIR"):
+        return Path(path)
     return Path(__file__).parent.parent / "logs"
 
 
@@ -62,8 +107,8 @@ class SessionLogger:
         logs_dir.mkdir(parents=True, exist_ok=True)
 
         timestamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
-        # Use first 8 chars of guid for filename
-        short_guid = post_guid[:8] if len(post_guid) >= 8 else post_guid
+        # Use last 8 chars of guid for filename: URL guids share their start
+        short_guid = re.sub(r"[^\w-]", "_", post_guid[-8:])
         self.log_path = logs_dir / f"{timestamp}-{short_guid}.log"
         self.turn = 0
 
@@ -89,6 +134,7 @@ class SessionLogger:
         self.turn += 1
         with open(self.log_path, "a") as f:
             f.write(f"=== TURN {self.turn} ===\n")
+            f.write(f"Model: {getattr(response, 'model', '-')}\n")
             f.write(f"Stop reason: {response.stop_reason}\n")
             cache_create = (
                 getattr(response.usage, "cache_creation_input_tokens", 0) or 0
@@ -147,6 +193,8 @@ class SessionLogger:
                 )
             f.write("\n")
             f.write(f"Cost: ${ctx.cost_usd:.4f}\n")
+            if ctx.escalation:
+                f.write(f"Escalated to {STRONG_MODEL}: {ctx.escalation}\n")
             f.write(f"Decisions: {len(ctx.decisions)}\n")
             for i, (decision, cal_id) in enumerate(
                 zip(ctx.decisions, ctx.calendar_event_ids)
@@ -160,13 +208,63 @@ class SessionLogger:
                 if cal_id:
                     f.write(f"Calendar event ID: {cal_id}\n")
 
+    def log_escalation(self, reason: str) -> None:
+        """Log that the fast model's attempt is discarded for the strong model."""
+        with open(self.log_path, "a") as f:
+            f.write(f"=== ESCALATING TO {STRONG_MODEL}: {reason} ===\n\n")
+
     def log_error(self, error: str) -> None:
         """Log an error."""
         with open(self.log_path, "a") as f:
             f.write(f"\n!!! ERROR !!!\n{error}\n")
 
 
-SYSTEM_PROMPT = f"""You are analyzing RSS posts to determine if they announce events that should be added to a calendar.
+def get_client() -> "Anthropic":
+    """Shared Anthropic client, so its HTTP connection pool stays warm."""
+    global _client
+    if _client is None:
+        from anthropic import Anthropic
+
+        # Retries are left to ratelimit.py, which paces them across calls
+        _client = Anthropic(max_retries=0)
+    return _client
+
+
+_client: "Anthropic | None" = None
+
+
+def create_message(**kwargs) -> "Message":
+    """``messages.create`` under the shared Anthropic limits (see ratelimit.py).
+
+    The raw response is requested so its rate-limit headers can pace the
+    calls that follow. A ``timeout`` of None keeps the client's default.
+    With a response cache in use (see responsecache.py), a request that was
+    answered before gets the same answer without calling the API.
+    """
+    if "timeout" in kwargs and kwargs["timeout"] is None:
+        # None would turn the client's default timeout off altogether
+        del kwargs["timeout"]
+    cache = responsecache.active()
+    if cache is not None:
+        key = responsecache.request_key(kwargs)
+        if (cached := cache.get(key)) is not None:
+            from anthropic.types import Message
+
+            return Message.model_validate_json(cached)
+    start = time.monotonic()
+    raw = ratelimit.upstream("anthropic").call(
+        get_client().messages.with_raw_response.create, **kwargs
+    )
+    # Never streamed, so parse() gives a Message
+    message = cast("Message", raw.parse())
+    if cache is not None:
+        cache.put(key, message.model_dump_json(), time.monotonic() - start)
+    return message
+
+
+def system_prompt(now: datetime | None = None) -> str:
+    """The analysis system prompt, with the current (or ``now``'s) date and time."""
+    return f"""You are analyzing RSS posts to determine if they announce events that should be added to a calendar.
 
 These posts come from Instagram accounts of cycling groups and community organizations. They may contain:
 - Event announcements with dates, times, and locations
@@ -268,11 +366,12 @@ Edge cases:
     </Sample description 2>
 </End Sample descriptions>
 
-For the sake of reasoning about relative dates (i.e. "this saturday"), the current date and time is {local_time_str(datetime.now(timezone.utc))}. The timezone is {TIME_ZONE}. 
+For the sake of reasoning about relative dates (i.e. "this saturday"), the current date and time is {local_time_str(now or datetime.now(timezone.utc))}. The timezone is {TIME_ZONE}. 
 It is OK to create events for dates in the past if the post was published in the past (the post speaks of the event in present or future tense).
 
 You MUST call submit_decision before exiting."""
 
+
 TOOLS = [
     {
         "name": "get_images",
@@ -379,15 +478,42 @@ TOOLS = [
 class AnalysisContext:
     """Context for a single post analysis, tracking tokens and state."""
 
-    def __init__(self, post: RssPost, dry_run: bool = False):
+    def __init__(
+        self,
+        post: RssPost,
+        dry_run: bool = False,
+        defer_writes: bool = False,
+        deadline: latency.Deadline | None = None,
+        hedge: bool = False,
+        now: datetime | None = None,
+        hidden_event_ids: set[str] | None = None,
+    ):
         self.post = post
         self.dry_run = dry_run
+        # Queue calendar writes for journal.flush() instead of sending them
+        self.defer_writes = defer_writes
+        self.deadline = deadline or latency.Deadline(None)
+        # Send backup copies of slow read-only calls (see latency.py)
+        self.hedge = hedge
+        # Replays of old posts (calsync eval) see the time they were analyzed
+        # at, and not the events their first analysis created
+        self.now = now
+        self.hidden_event_ids = hidden_event_ids or set()
         self.input_tokens = 0
         self.output_tokens = 0
         self.cache_creation_tokens = 0
         self.cache_read_tokens = 0
+        # model -> [input, output, cache write, cache read] tokens
+        self.tokens_by_model: dict[str, list[int]] = {}
         self.decisions: list[ClaudeDecision] = []
         self.calendar_event_ids: list[str | None] = []
+        # While the fast model runs, decisions are held here (as submitted)
+        # instead of being carried out; see analyze_post
+        self.provisional = False
+        self.held: list[dict] = []
+        self.model = STRONG_MODEL
+        # Why the fast model's attempt was discarded, if it was
+        self.escalation: str | None = None
         self.logger = SessionLogger(post.guid)
 
     @property
@@ -405,16 +531,48 @@ class AnalysisContext:
         """Whether at least one decision has been submitted."""
         return len(self.decisions) > 0
 
+    def add_usage(self, model: str, usage) -> None:
+        """Count a response's tokens (cache variants are billed differently)."""
+        counts = [
+            usage.input_tokens,
+            usage.output_tokens,
+            getattr(usage, "cache_creation_input_tokens", 0) or 0,
+            getattr(usage, "cache_read_input_tokens", 0) or 0,
+        ]
+        totals = self.tokens_by_model.setdefault(model, [0, 0, 0, 0])
+        for i, count in enumerate(counts):
+            totals[i] += count
+        self.input_tokens += counts[0]
+        self.output_tokens += counts[1]
+        self.cache_creation_tokens += counts[2]
+        self.cache_read_tokens += counts[3]
+
     @property
     def cost_usd(self) -> float:
-        return (
-            self.input_tokens * INPUT_COST_PER_M / 1_000_000
-            + self.output_tokens * OUTPUT_COST_PER_M / 1_000_000
-            + self.cache_creation_tokens * CACHE_WRITE_COST_PER_M / 1_000_000
-            + self.cache_read_tokens * CACHE_READ_COST_PER_M / 1_000_000
+        """Cost of every model call for this post, each at its model's prices."""
+        return sum(
+            PRICING[model].cost(*tokens)
+            for model, tokens in self.tokens_by_model.items()
         )
 
 
+def read_only(ctx: AnalysisContext, name: str, fn, *args, **kwargs):
+    """Call ``fn``, which must not change anything, hedged if the run asked for it."""
+    if not ctx.hedge:
+        return fn(*args, **kwargs)
+    return latency.hedger(name).call(fn, *args, **kwargs)
+
+
+def search_calendar(ctx: AnalysisContext, search, **kwargs) -> list:
+    """Run a calendar search, hedged if the run asked for it."""
+    if not ctx.hedge:
+        return search(**kwargs)
+    # Both copies run on worker threads, so each needs its own connection
+    return latency.hedger("calendar_search").call(
+        calendar.on_own_connection, search, **kwargs
+    )
+
+
 def _detect_media_type(data: bytes) -> str | None:
     """Detect image media type from magic bytes."""
     if data[:8] == b"\x89PNG\r\n\x1a\n":
@@ -428,10 +586,13 @@ def _detect_media_type(data: bytes) -> str | None:
     return None
 
 
-def fetch_image_as_base64(url: str) -> tuple[str, str] | None:
+@tracing.traced("fetch_image")
+def fetch_image_as_base64(
+    url: str, timeout: float | None = 30
+) -> tuple[str, str] | None:
     """Fetch an image and return as base64 with media type."""
     try:
-        response = httpx.get(url, timeout=30, follow_redirects=True)
+        response = httpx.get(url, timeout=timeout, follow_redirects=True)
         response.raise_for_status()
 
         media_type = _detect_media_type(response.content)
@@ -474,8 +635,9 @@ def execute_get_images(ctx: AnalysisContext) -> list[dict]:
     content_blocks: list[dict] = []
     fetched = 0
 
+    timeout = ctx.deadline.timeout() or 30
     for url in ctx.post.image_urls[:5]:
-        image_data = fetch_image_as_base64(url)
+        image_data = read_only(ctx, "image_fetch", fetch_image_as_base64, url, timeout)
         if image_data:
             media_type, b64 = image_data
             content_blocks.append(
@@ -556,9 +718,31 @@ def validate_day_of_week(date_str: str, day_of_week: str) -> str | None:
     )
 
 
+def _event_results(events: list, ctx: AnalysisContext) -> list[dict]:
+    """Search results as sent to the model, without the context's hidden events."""
+    return [
+        {
+            "id": e.id,
+            "title": e.title,
+            "start": e.start.isoformat(),
+            "location": e.location,
+            "description": e.description,
+        }
+        for e in events
+        if e.id not in ctx.hidden_event_ids
+    ]
+
+
 def execute_tool(name: str, input_data: dict, ctx: AnalysisContext) -> Any:
     """Execute a tool and return the result."""
+    with tracing.span(f"execute_tool.{name}"):
+        return _run_tool(name, input_data, ctx)
+
+
+def _run_tool(name: str, input_data: dict, ctx: AnalysisContext) -> Any:
     if name == "get_images":
+        if ctx.provisional:
+            raise Escalate("the post's images are needed")
         return execute_get_images(ctx)
 
     elif name == "search_events_by_date":
@@ -566,33 +750,31 @@ def execute_tool(name: str, input_data: dict, ctx: AnalysisContext) -> Any:
             error = validate_day_of_week(input_data["start_date"], day_of_week)
             if error:
                 return {"error": error}
-        events = calendar.search_events_by_date(
-            start_date=input_data["start_date"],
-            end_date=input_data["end_date"],
+        start_date, end_date = input_data["start_date"], input_data["end_date"]
+        events = search_calendar(
+            ctx,
+            calendar.search_events_by_date,
+            start_date=start_date,
+            end_date=end_date,
         )
-        return [
-            {
-                "id": e.id,
-                "title": e.title,
-                "start": e.start.isoformat(),
-                "location": e.location,
-                "description": e.description,
-            }
-            for e in events
-        ]
+        events = journal.overlay_pending(
+            events, lambda e: start_date <= e.start.date().isoformat() <= end_date
+        )
+        return _event_results(events, ctx)
 
     elif name == "search_events_by_keyword":
-        events = calendar.search_events_by_keyword(keywords=input_data["keywords"])
-        return [
-            {
-                "id": e.id,
-                "title": e.title,
-                "start": e.start.isoformat(),
-                "location": e.location,
-                "description": e.description,
-            }
-            for e in events
-        ]
+        keywords = [k.strip().lower() for k in input_data["keywords"] if k.strip()]
+        events = search_calendar(
+            ctx, calendar.search_events_by_keyword, keywords=input_data["keywords"]
+        )
+        events = journal.overlay_pending(
+            events,
+            lambda e: any(
+                k in f"{e.title} {e.location or ''} {e.description or ''}".lower()
+                for k in keywords
+            ),
+        )
+        return _event_results(events, ctx)
 
     elif name == "submit_decision":
         return handle_submit_decision(input_data, ctx)
@@ -601,6 +783,20 @@ def execute_tool(name: str, input_data: dict, ctx: AnalysisContext) -> Any:
         return {"error": f"Unknown tool: {name}"}
 
 
+class Escalate(Exception):
+    """The fast model's attempt can't stand; the strong model takes the post."""
+
+
+def escalation_reason(decisions: list[ClaudeDecision]) -> str | None:
+    """Why the fast model's decisions need the strong model, if they do."""
+    for decision in decisions:
+        if decision.action in ESCALATION_ACTIONS:
+            return f"{decision.action.value} changes an existing event"
+        if decision.confidence < ESCALATION_CONFIDENCE:
+            return f"confidence {decision.confidence:.0%}"
+    return None
+
+
 def handle_submit_decision(input_data: dict, ctx: AnalysisContext) -> dict:
     """Validate and process the submit_decision tool call."""
     try:
@@ -628,28 +824,24 @@ def handle_submit_decision(input_data: dict, ctx: AnalysisContext) -> dict:
         # Validation passed - now execute the action
         calendar_event_id = decision.related_event_id
 
-        if not ctx.dry_run:
-            if decision.action == Action.CREATE and decision.event:
-                calendar_event_id = calendar.create_event(decision.event)
-            elif (
-                decision.action == Action.UPDATE
-                and decision.event
-                and decision.related_event_id
-            ):
-                calendar_event_id = calendar.update_event(
-                    decision.related_event_id, decision.event
-                )
-            elif decision.action == Action.CANCEL and decision.related_event_id:
-                calendar.delete_event(decision.related_event_id)
-                calendar_event_id = decision.related_event_id
+        if ctx.provisional:
+            # Carried out (submitted again) only if no escalation is needed
+            ctx.decisions.append(decision)
+            ctx.calendar_event_ids.append(calendar_event_id)
+            ctx.held.append(input_data)
+            return {
+                "success": True,
+                "action": decision.action.value,
+                "calendar_event_id": calendar_event_id,
+                "done": input_data.get("done", True),
+            }
 
         # cost should only be logged for the final decision (submitted with done=true)
         # to avoid double-counting costs if multiple decisions are submitted for one post.
         done = input_data.get("done", True)
         cost_usd = ctx.cost_usd if done else 0.0
 
-        # Record to database
-        db.record_processed(
+        record = db.ProcessedRecord(
             post_guid=ctx.post.guid,
             decision=decision.action,
             calendar_event_id=calendar_event_id,
@@ -666,6 +858,31 @@ def handle_submit_decision(input_data: dict, ctx: AnalysisContext) -> dict:
             post_extra=ctx.post.extra or None,
         )
 
+        target_event_id = None
+        if not ctx.dry_run:
+            if decision.action == Action.CREATE and decision.event:
+                target_event_id = calendar.event_id_for(ctx.post.guid, decision.event)
+            elif (
+                decision.action == Action.UPDATE
+                and decision.event
+                and decision.related_event_id
+            ) or (decision.action == Action.CANCEL and decision.related_event_id):
+                target_event_id = decision.related_event_id
+
+        if target_event_id and ctx.defer_writes:
+            # Sent (and the decision recorded) by journal.flush() after the run
+            calendar_event_id = journal.defer(
+                decision.action, target_event_id, decision.event, record
+            )
+        elif target_event_id:
+            # Journaled, so a crash between the API call and the record is
+            # finished by journal.reconcile() instead of a new analysis
+            calendar_event_id = journal.execute(
+                decision.action, target_event_id, decision.event, record
+            )
+        else:
+            db.record_processed(**record)
+
         ctx.decisions.append(decision)
         ctx.calendar_event_ids.append(calendar_event_id)
 
@@ -686,36 +903,94 @@ def handle_submit_decision(input_data: dict, ctx: AnalysisContext) -> dict:
         return {"error": str(e)}
 
 
-def analyze_post(post: RssPost, dry_run: bool = False) -> AnalysisContext:
-    """Analyze a post using Claude. Returns the context with results."""
-    client = Anthropic()
-    ctx = AnalysisContext(post, dry_run)
+@tracing.traced("analyze_post")
+def analyze_post(
+    post: RssPost,
+    dry_run: bool = False,
+    defer_writes: bool = False,
+    deadline: latency.Deadline | None = None,
+    hedge: bool = False,
+    route: bool = False,
+    now: datetime | None = None,
+    hidden_event_ids: set[str] | None = None,
+) -> AnalysisContext:
+    """Analyze a post using Claude. Returns the context with results.
+
+    With ``route``, ``FAST_MODEL`` tries first. Its decisions are held, and
+    only carried out if none of them needs escalating (see
+    ``escalation_reason``) and it didn't ask for the images; otherwise
+    ``STRONG_MODEL`` analyzes the post from scratch. Without it,
+    ``STRONG_MODEL`` does all the work.
+
+    ``now`` and ``hidden_event_ids`` replay an old post: the prompt gets
+    ``now`` as the current time and calendar searches leave those events out.
+
+    Raises ``latency.DeadlineExceeded`` if ``deadline`` passes before the
+    model has decided.
+    """
+    ctx = AnalysisContext(
+        post, dry_run, defer_writes, deadline, hedge, now, hidden_event_ids
+    )
 
     user_content = build_message_content(post)
     ctx.logger.log_user_message(user_content)
 
+    if route:
+        ctx.provisional = True
+        try:
+            _run_agent(ctx, FAST_MODEL, user_content)
+            reason = escalation_reason(ctx.decisions)
+        except Escalate as e:
+            reason = str(e)
+        except RuntimeError as e:
+            # No decision (or an invalid one) from the fast model
+            reason = str(e)
+        ctx.provisional = False
+        held, ctx.held = ctx.held, []
+        ctx.decisions.clear()
+        ctx.calendar_event_ids.clear()
+        if reason is None:
+            # Submitted again for real; the decisions were already validated
+            for input_data in held:
+                handle_submit_decision(input_data, ctx)
+            ctx.logger.log_final(ctx)
+            return ctx
+        ctx.escalation = reason
+        ctx.logger.log_escalation(reason)
+        tracing.annotate(escalation=reason)
+
+    _run_agent(ctx, STRONG_MODEL, user_content)
+    ctx.logger.log_final(ctx)
+    return ctx
+
+
+def _run_agent(ctx: AnalysisContext, model: str, user_content: list[dict]) -> None:
+    """Run ``model``'s tool loop on the post until it submits its last decision."""
+    ctx.model = model
     messages = [{"role": "user", "content": user_content}]
 
     # Agentic loop
     max_turns = 10
-    for _ in range(max_turns):
-        response = client.messages.create(
-            model=MODEL_NAME,
-            max_tokens=4096,
-            system=SYSTEM_PROMPT,
-            tools=TOOLS,  # ty: ignore[invalid-argument-type]
-            messages=messages,  # ty: ignore[invalid-argument-type]
-        )
-
-        # Track tokens (including cache variants billed at different rates)
-        ctx.input_tokens += response.usage.input_tokens
-        ctx.output_tokens += response.usage.output_tokens
-        ctx.cache_creation_tokens += (
-            getattr(response.usage, "cache_creation_input_tokens", 0) or 0
-        )
-        ctx.cache_read_tokens += (
-            getattr(response.usage, "cache_read_input_tokens", 0) or 0
-        )
+    for turn in range(1, max_turns + 1):
+        try:
+            ctx.deadline.check("Analysis")
+        except latency.DeadlineExceeded as e:
+            ctx.logger.log_error(str(e))
+            raise
+        with tracing.span("model_turn", model=model, turn=turn):
+            response = create_message(
+                model=model,
+                max_tokens=4096,
+                system=system_prompt(ctx.now),
+                tools=TOOLS,
+                messages=messages,
+                timeout=ctx.deadline.timeout(),
+            )
+            tracing.annotate(
+                input_tokens=response.usage.input_tokens,
+                output_tokens=response.usage.output_tokens,
+            )
+        ctx.add_usage(model, response.usage)
 
         if response.stop_reason == "tool_use":
             tool_results = []
@@ -725,6 +1000,7 @@ def analyze_post(post: RssPost, dry_run: bool = False) -> AnalysisContext:
             for block in response.content:
                 assistant_content.append(block)
                 if block.type == "tool_use":
+                    block = cast("ToolUseBlock", block)
                     result = execute_tool(block.name, block.input, ctx)
                     # get_images returns content blocks (with images); others return JSON-serializable data
                     if block.name == "get_images":
@@ -749,8 +1025,7 @@ def analyze_post(post: RssPost, dry_run: bool = False) -> AnalysisContext:
             ctx.logger.log_turn(response, tool_results)
 
             if done and ctx.submitted:
-                ctx.logger.log_final(ctx)
-                return ctx
+                return
 
             messages.append({"role": "assistant", "content": assistant_content})
             messages.append({"role": "user", "content": tool_results})
@@ -758,8 +1033,7 @@ def analyze_post(post: RssPost, dry_run: bool = False) -> AnalysisContext:
         elif response.stop_reason == "end_turn":
             ctx.logger.log_turn(response)
             if ctx.submitted:
-                ctx.logger.log_final(ctx)
-                return ctx
+                return
             # Claude stopped without ever calling submit_decision
             error_msg = (
                 f"Claude exited without calling submit_decision. "
@@ -1,7 +1,6 @@
 """CLI for calendar-sync."""
 
 from dotenv import load_dotenv
-import json
 
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
@@ -14,20 +13,17 @@ from rich.table import Table
 # Load environment variables from .env file
 load_dotenv()
 
-from . import (  # noqa: E402
-    calendar,
-    claude,
-    db,
-    fetch_events as fetch_events_module,
-    prefilter,
-    report,
-    rss,
-)
+# Only db is imported up front. Commands import the modules they need, so
+# e.g. `calsync history` doesn't load the Google and Anthropic SDKs
+# (benchmarks/bench_startup.py tracks this).
+from . import db  # noqa: E402
 from .models import Action, RssPost  # noqa: E402
 
 
 def format_local_time(iso_str: str | None) -> str:
     """Parse ISO format datetime string and convert to local time."""
+    from . import claude
+
     return claude.local_time_str(iso_str)
 
 
@@ -43,139 +39,795 @@ DEFAULT_FEED = "https://rssglue.subdavis.com/feed/cycling-merge/rss"
 
 @app.command()
 def process(
-    feed: str = typer.Option(DEFAULT_FEED, "--feed", "-f", help="RSS feed URL"),
+    feeds: Optional[list[str]] = typer.Option(
+        None,
+        "--feed",
+        "-f",
+        help=f"RSS feed URL (repeatable) [default: {DEFAULT_FEED}]",
+    ),
+    feeds_file: Optional[Path] = typer.Option(
+        None,
+        "--feeds-file",
+        help="File with one feed URL per line ('#' comments allowed)",
+    ),
     dry_run: bool = typer.Option(
         False, "--dry-run", "-n", help="Show what would happen without making changes"
     ),
     limit: Optional[int] = typer.Option(
-        None, "--limit", "-l", help="Maximum posts to process"
+        None,
+        "--limit",
+        "-l",
+        help="Maximum posts to process, picked by recency and likely-event score",
+    ),
+    max_cost: Optional[float] = typer.Option(
+        None,
+        "--max-cost",
+        help="Stop before the run's estimated Anthropic spend passes this many dollars",
+    ),
+    max_seconds: Optional[float] = typer.Option(
+        None,
+        "--max-seconds",
+        help="Stop before the run's estimated wall time passes this many seconds",
+    ),
+    refetch: bool = typer.Option(
+        False,
+        "--refetch",
+        help="Ignore the cached ETag/Last-Modified and parse the whole feed",
+    ),
+    feed_timeout: float = typer.Option(
+        30.0, "--feed-timeout", help="Per-feed fetch timeout in seconds"
+    ),
+    shard: Optional[str] = typer.Option(
+        None,
+        "--shard",
+        help="Only process posts in shard i of N (e.g. 0/4), hashed on post guid",
+    ),
+    segment: Optional[Path] = typer.Option(
+        None,
+        "--segment",
+        help="Also write this run's results to a segment file for `calsync merge`",
+    ),
+    batch_writes: bool = typer.Option(
+        True,
+        "--batch-writes/--no-batch-writes",
+        help="Queue calendar writes and send them in batches at the end of the run",
+    ),
+    write_parallelism: int = typer.Option(
+        4, "--write-parallelism", help="Batch calls in flight at once", min=1
+    ),
+    post_timeout: float = typer.Option(
+        600.0,
+        "--post-timeout",
+        help="Give up on a post (until the next run) after this many seconds; 0 for no limit",
+    ),
+    call_timeout: float = typer.Option(
+        120.0,
+        "--call-timeout",
+        help="Timeout for each model, image and Calendar call in seconds; 0 for none",
+    ),
+    hedge: bool = typer.Option(
+        False,
+        "--hedge/--no-hedge",
+        help="Send a second copy of slow read-only calls (searches, images, pre-filter)",
+    ),
+    route: bool = typer.Option(
+        True,
+        "--route/--no-route",
+        help="Try the fast model first and escalate unsure, image or update/cancel posts",
+    ),
+    checkpoint_command: Optional[str] = typer.Option(
+        None,
+        "--checkpoint-command",
+        envvar="CALSYNC_CHECKPOINT_COMMAND",
+        help="Command that pushes the DB (e.g. 'uv run scripts/push_db.py'), run periodically",
+    ),
+    checkpoint_every: int = typer.Option(
+        20, "--checkpoint-every", help="Checkpoint after this many posts", min=1
+    ),
+    checkpoint_seconds: float = typer.Option(
+        600.0,
+        "--checkpoint-seconds",
+        help="Checkpoint after this many seconds, if sooner; 0 for posts only",
+    ),
+    trace: bool = typer.Option(
+        False,
+        "--trace/--no-trace",
+        help="Record per-stage spans to traces/ (see `calsync profile`)",
+    ),
+    trace_format: str = typer.Option(
+        "chrome", "--trace-format", help="Trace file format: chrome or otlp"
     ),
 ):
-    """Process new posts from an RSS feed."""
+    """Process new posts from one or more RSS feeds."""
+    from . import shards, tracing
+
+    if trace_format not in tracing.FORMATS:
+        raise typer.BadParameter(
+            f"expected one of {', '.join(tracing.FORMATS)}", param_hint="--trace-format"
+        )
+
+    if shard:
+        try:
+            shards.parse_shard(shard)
+        except ValueError as e:
+            raise typer.BadParameter(str(e), param_hint="--shard")
+
     db.init_db()
+    tracer = tracing.start() if trace else None
+    try:
+        run_process(
+            _feed_urls(feeds, feeds_file),
+            dry_run=dry_run,
+            limit=limit,
+            max_cost=max_cost,
+            max_seconds=max_seconds,
+            refetch=refetch,
+            feed_timeout=feed_timeout,
+            shard=shard,
+            segment=segment,
+            batch_writes=batch_writes,
+            write_parallelism=write_parallelism,
+            post_timeout=post_timeout or None,
+            call_timeout=call_timeout or None,
+            hedge=hedge,
+            route=route,
+            checkpoint_command=checkpoint_command,
+            checkpoint_every=checkpoint_every,
+            checkpoint_seconds=checkpoint_seconds or None,
+        )
+    finally:
+        if tracer is not None:
+            tracing.stop()
+            path = tracing.write(tracer, trace_format)
+            console.print(f"Trace: {path} ({len(tracer.spans)} spans)")
+
+
+def _feed_urls(feeds: Optional[list[str]], feeds_file: Optional[Path]) -> list[str]:
+    from . import rss
+
+    feed_urls = list(feeds or [])
+    if feeds_file:
+        feed_urls += rss.read_feeds_file(str(feeds_file))
+    return list(dict.fromkeys(feed_urls)) or [DEFAULT_FEED]
+
+
+class ProcessStats:
+    """Counts from one processing pass, used by `serve` for metrics."""
+
+    def __init__(self):
+        self.feeds = 0
+        self.feeds_not_modified = 0
+        self.feed_errors = 0
+        self.posts_processed = 0
+        self.post_errors = 0
+        self.calendar_writes = 0
+        # Updates that would not have changed the event, so weren't sent
+        self.calendar_writes_skipped = 0
+        self.cost_usd = 0.0
+        # (seconds since received, seconds since published) per pushed post
+        self.ingest_latencies: list[tuple] = []
+        # Wall-clock seconds per post, from pre-filter to decision
+        self.post_seconds: list[float] = []
+        # Posts left for the next run by --limit, --max-cost or --max-seconds
+        self.posts_deferred = 0
+        self.checkpoints = 0
+        # Posts that reached full analysis, and how many of those the fast
+        # model handed to the strong one (see claude.analyze_post)
+        self.posts_analyzed = 0
+        self.posts_escalated = 0
+
+
+def run_process(
+    feed_urls: list[str],
+    dry_run: bool = False,
+    limit: Optional[int] = None,
+    refetch: bool = False,
+    feed_timeout: float = 30.0,
+    shard: Optional[str] = None,
+    segment: Optional[Path] = None,
+    http_client=None,
+    batch_writes: bool = True,
+    write_parallelism: int = 4,
+    post_timeout: Optional[float] = 600.0,
+    call_timeout: Optional[float] = 120.0,
+    hedge: bool = False,
+    max_cost: Optional[float] = None,
+    max_seconds: Optional[float] = None,
+    route: bool = True,
+    checkpoint_command: Optional[str] = None,
+    checkpoint_every: Optional[int] = 20,
+    checkpoint_seconds: Optional[float] = 600.0,
+) -> ProcessStats:
+    """Fetch feeds and process their new posts (the body of `calsync process`)."""
+    from . import (
+        calendar,
+        checkpoint,
+        claude,
+        ingest,
+        journal,
+        latency,
+        prefilter,
+        ratelimit,
+        rss,
+        scheduler,
+        shards,
+        tracing,
+    )
+
+    stats = ProcessStats()
+    # Started before the feeds are fetched, so --max-seconds covers the whole run
+    budget = scheduler.Budget(max_cost, max_seconds, limit)
+    checkpointer = (
+        checkpoint.Checkpointer(
+            checkpoint_command, checkpoint_every, checkpoint_seconds
+        )
+        if checkpoint_command and not dry_run
+        else None
+    )
+    calendar.http_timeout = call_timeout
+    hedges_before = latency.counters()
+    writes_before = calendar.write_stats.copy()
+    shard_index, shard_count = shards.parse_shard(shard) if shard else (None, None)
+
+    if not dry_run and db.get_pending_intents():
+        # Calendar writes from an interrupted run: finish them without the model
+        reconciled = journal.reconcile()
+        console.print(
+            f"[bold]Journal:[/bold] finished {reconciled.completed} interrupted "
+            f"calendar write(s) ({reconciled.already_applied} had already landed)"
+        )
+        for error in reconciled.errors:
+            console.print(f"  [red]✗[/red] {error}")
+
+    console.print(f"[bold]Fetching {len(feed_urls)} feed(s)[/bold]")
+    states = (
+        {}
+        if refetch
+        else {url: s for url in feed_urls if (s := db.get_feed_state(url))}
+    )
+    results = rss.fetch_feeds(
+        feed_urls,
+        states=states,
+        known_guids=None if refetch else db.get_processed_guids,
+        timeout=feed_timeout,
+        client=http_client,
+    )
+    stats.feeds = len(results)
+    stats.feeds_not_modified = sum(r.not_modified for r in results)
+    stats.feed_errors = sum(r.error is not None for r in results)
 
-    console.print(f"[bold]Fetching feed:[/bold] {feed}")
-    posts = rss.fetch_feed(feed)
-    console.print(f"Found {len(posts)} posts in feed")
+    for result in results:
+        if result.error:
+            console.print(
+                f"  [red]✗[/red] {result.url} [red]{result.error}[/red] "
+                f"[dim]({result.fetch_seconds:.2f}s)[/dim]"
+            )
+        elif result.not_modified:
+            console.print(
+                f"  [dim]✓ {result.url} not modified (304) in {result.fetch_seconds:.2f}s[/dim]"
+            )
+        else:
+            console.print(
+                f"  [green]✓[/green] {result.url} [dim]{result.bytes_fetched:,} bytes "
+                f"in {result.fetch_seconds:.2f}s, parsed {result.entry_count} entries "
+                f"in {result.parse_seconds * 1000:.0f}ms"
+                + (
+                    f" ({result.known_skipped} already processed"
+                    + (", stopped early" if result.stopped_early else "")
+                    + ")"
+                    if result.known_skipped
+                    else ""
+                )
+                + "[/dim]"
+            )
 
-    # Filter to unprocessed posts, oldest first
-    unprocessed: list[RssPost] = [p for p in posts if not db.is_processed(p.guid)]
+    posts, feeds_by_guid = rss.merge_feed_results(results)
+    console.print(f"Found {len(posts)} new posts across feeds")
+    # Posts pushed to the receiver (calsync serve --receive) since the last run
+    queued = [p for p in db.get_queued_posts() if p.guid not in feeds_by_guid]
+    if queued:
+        console.print(f"Found {len(queued)} pushed post(s) in the ingest queue")
+        posts += queued
+
+    # Filter to unprocessed posts, oldest first (one bulk lookup for the run).
+    # Posts with a journaled write still pending wait for the next reconcile.
+    processed_guids = db.get_processed_guids([p.guid for p in posts])
+    processed_guids |= db.get_pending_intent_guids()
+    unprocessed: list[RssPost] = [p for p in posts if p.guid not in processed_guids]
     unprocessed.sort(key=lambda p: p.published or datetime.min)
     console.print(f"[green]{len(unprocessed)} unprocessed posts[/green]")
+    if shard_count:
+        unprocessed = [
+            p
+            for p in unprocessed
+            if shards.shard_of(p.guid, shard_count) == shard_index
+        ]
+        console.print(f"Shard {shard}: {len(unprocessed)} of them are ours")
+
+    # Only remember a feed's validators once everything in this version of it
+    # has been handled; otherwise a 304 would hide posts that are still pending.
+    fetched = [r for r in results if not r.error and not r.not_modified]
+    incomplete_feeds: set[str] = set()
+    if dry_run or shard_count:
+        # A shard only handles part of each feed
+        incomplete_feeds = {r.url for r in fetched}
+
+    # With a budget, pick the posts most worth it (see scheduler.py)
+    model: scheduler.CostModel | None = None
+    if limit or max_cost is not None or max_seconds is not None:
+        model = scheduler.CostModel.from_history(db.get_cost_history())
+        picked, estimates = budget.plan(unprocessed, model)
+        if len(picked) < len(unprocessed):
+            picked_guids = {p.guid for p in picked}
+            for post in unprocessed:
+                if post.guid not in picked_guids:
+                    incomplete_feeds.update(feeds_by_guid.get(post.guid, []))
+            stats.posts_deferred = len(unprocessed) - len(picked)
+            console.print(
+                f"Budget: picked {len(picked)} post(s) by recency and likely-event "
+                f"score (est. ${sum(estimates[p.guid].cost for p in picked):.4f}, "
+                f"~{sum(estimates[p.guid].seconds for p in picked):.0f}s); "
+                f"{stats.posts_deferred} left for the next run"
+            )
+        unprocessed = picked
 
-    if limit:
-        unprocessed = unprocessed[:limit]
+    def finish_run() -> None:
+        writes = calendar.write_stats
+        stats.calendar_writes = writes.sent - writes_before.sent
+        stats.calendar_writes_skipped = writes.unchanged - writes_before.unchanged
+        if stats.calendar_writes or stats.calendar_writes_skipped:
+            console.print(
+                f"Calendar: {stats.calendar_writes} write(s) sent, "
+                f"{stats.calendar_writes_skipped} unchanged update(s) skipped"
+            )
+        with db.transaction():
+            for r in fetched:
+                if r.url not in incomplete_feeds:
+                    db.set_feed_state(r.url, r.etag, r.modified)
+        if dry_run:
+            return
+        finished = db.finish_queued_posts()
+        if finished:
+            stats.ingest_latencies = ingest.latencies(finished)
+            console.print(
+                f"Pushed posts: {len(finished)} processed, "
+                + ingest.format_latencies(stats.ingest_latencies)
+            )
+        if segment:
+            count = shards.write_segment(segment)
+            console.print(f"Wrote {count} decision(s) to segment {segment}")
+
+    def flush_writes() -> None:
+        with tracing.span("journal.flush"):
+            flushed = journal.flush(max_parallel=write_parallelism)
+        console.print(
+            f"\n[bold]Calendar writes:[/bold] {flushed.sent} sent in batches, "
+            f"{flushed.unchanged} already up to date, {flushed.failed} left pending"
+        )
+        for error in flushed.errors:
+            console.print(f"  [red]✗[/red] {error}")
+        for guid in flushed.dropped_guids:
+            # Rejected writes drop their decision; the post is analyzed again
+            incomplete_feeds.update(feeds_by_guid.get(guid, []))
+            stats.post_errors += 1
+
+    def run_checkpoint() -> None:
+        assert checkpointer is not None
+        if batch_writes and db.get_pending_intents():
+            flush_writes()
+        with tracing.span("checkpoint"):
+            error = checkpointer.push()
+        if error:
+            console.print(
+                f"\n[yellow]Checkpoint push failed ({error}); carrying on[/yellow]"
+            )
+        else:
+            stats.checkpoints += 1
+            console.print(f"\n[dim]Checkpoint {stats.checkpoints} pushed[/dim]")
 
     if not unprocessed:
+        finish_run()
         console.print("[yellow]Nothing to process[/yellow]")
-        return
+        return stats
 
     total_cost = 0.0
 
     for i, post in enumerate(unprocessed, 1):
-        console.print(
-            f"\n[bold]Processing {i}/{len(unprocessed)}:[/bold] {post.title[:60]}..."
-        )
-
-        if post.image_urls:
-            console.print(f"  [dim]{len(post.image_urls)} image(s)[/dim]")
+        # Between posts, so each checkpoint holds only whole decisions
+        if checkpointer and i > 1 and checkpointer.post_done():
+            run_checkpoint()
 
-        if dry_run:
-            console.print("  [yellow](dry run mode)[/yellow]")
-
-        # Pre-filter with Haiku to short-circuit obvious non-events
-        try:
-            pf = prefilter.prefilter_post(post)
-        except Exception as e:
+        with tracing.span("post", guid=post.guid, title=post.title[:60]):
             console.print(
-                f"  [yellow]Pre-filter error (proceeding to full analysis): {e}[/yellow]"
+                f"\n[bold]Processing {i}/{len(unprocessed)}:[/bold] {post.title[:60]}..."
             )
-            pf = None
 
-        if pf and not pf.is_likely_event:
-            reasoning = "Pre-filter: this is not an event announcement."
-            console.print("  [dim]Pre-filtered as non-event[/dim]")
-            console.print("  [cyan]Decision:[/cyan] [dim]ignore[/dim]")
-            console.print(f"  [dim]{reasoning}[/dim]")
+            if post.image_urls:
+                console.print(f"  [dim]{len(post.image_urls)} image(s)[/dim]")
+
+            if dry_run:
+                console.print("  [yellow](dry run mode)[/yellow]")
+
+            if model:
+                reason = budget.stop_reason(model.estimate(post), total_cost)
+                if reason:
+                    rest = unprocessed[i - 1 :]
+                    console.print(
+                        f"  [yellow]{reason}; leaving {len(rest)} post(s) "
+                        "for the next run[/yellow]"
+                    )
+                    for later in rest:
+                        incomplete_feeds.update(feeds_by_guid.get(later.guid, []))
+                    stats.posts_deferred += len(rest)
+                    break
+
+            deadline = latency.Deadline(post_timeout, call_timeout)
+
+            # Pre-filter with Haiku to short-circuit obvious non-events
+            try:
+                pf = prefilter.prefilter_post(post, deadline=deadline, hedge=hedge)
+            except Exception as e:
+                console.print(
+                    f"  [yellow]Pre-filter error (proceeding to full analysis): {e}[/yellow]"
+                )
+                pf = None
+
+            if pf and not pf.is_likely_event:
+                reasoning = "Pre-filter: this is not an event announcement."
+                console.print("  [dim]Pre-filtered as non-event[/dim]")
+                console.print("  [cyan]Decision:[/cyan] [dim]ignore[/dim]")
+                console.print(f"  [dim]{reasoning}[/dim]")
+                console.print(
+                    f"  [dim]Tokens (prefilter): {pf.input_tokens:,} in / {pf.output_tokens:,} out = ${pf.cost_usd:.4f}[/dim]"
+                )
+                if not dry_run:
+                    db.record_processed(
+                        post_guid=post.guid,
+                        decision=Action.IGNORE,
+                        post_content=post.content,
+                        reasoning=reasoning,
+                        input_tokens=pf.input_tokens,
+                        output_tokens=pf.output_tokens,
+                        cost_usd=pf.cost_usd,
+                        post_title=post.title,
+                        post_author=post.author,
+                        post_time=post.published.isoformat()
+                        if post.published
+                        else None,
+                        post_link=post.link,
+                        post_extra=post.extra or None,
+                    )
+                total_cost += pf.cost_usd
+                stats.posts_processed += 1
+                stats.post_seconds.append(deadline.elapsed())
+                if model:
+                    model.record_seconds(False, deadline.elapsed())
+                continue
+            else:
+                console.print(
+                    f"  [dim]Pre-filter result: {'likely event' if pf and pf.is_likely_event else 'unknown (no pre-filter)'}[/dim]"
+                )
+
+            # Show prefilter cost if it ran before full analysis
+            prefilter_input_tokens = pf.input_tokens if pf else 0
+            prefilter_output_tokens = pf.output_tokens if pf else 0
+            prefilter_cost = pf.cost_usd if pf else 0.0
+
+            try:
+                ctx = claude.analyze_post(
+                    post,
+                    dry_run=dry_run,
+                    defer_writes=batch_writes,
+                    deadline=deadline,
+                    hedge=hedge,
+                    route=route,
+                )
+            except ratelimit.CircuitOpenError as e:
+                # The API is down; every remaining post would fail the same way
+                console.print(
+                    f"  [red]{e}; leaving the remaining posts for later[/red]"
+                )
+                for rest in unprocessed[i - 1 :]:
+                    incomplete_feeds.update(feeds_by_guid.get(rest.guid, []))
+                stats.post_errors += 1
+                break
+            except latency.DeadlineExceeded as e:
+                console.print(f"  [yellow]{e}; leaving it for the next run[/yellow]")
+                incomplete_feeds.update(feeds_by_guid.get(post.guid, []))
+                stats.post_errors += 1
+                stats.post_seconds.append(deadline.elapsed())
+                total_cost += prefilter_cost
+                continue
+            except Exception as e:
+                console.print(f"  [red]Error: {e}[/red]")
+                incomplete_feeds.update(feeds_by_guid.get(post.guid, []))
+                stats.post_errors += 1
+                total_cost += prefilter_cost
+                continue
+            stats.post_seconds.append(deadline.elapsed())
+            if model:
+                model.record_seconds(True, deadline.elapsed())
+            stats.posts_analyzed += 1
+            stats.posts_escalated += ctx.escalation is not None
+
+            decision = ctx.decision
+            if decision is None:
+                console.print("  [red]No decision recorded[/red]")
+                incomplete_feeds.update(feeds_by_guid.get(post.guid, []))
+                stats.post_errors += 1
+                continue
+            stats.posts_processed += 1
+
+            # Display results
+            style = {
+                Action.CREATE: "green",
+                Action.UPDATE: "blue",
+                Action.CANCEL: "red",
+                Action.IGNORE: "dim",
+                Action.FLAG: "yellow",
+            }.get(decision.action, "")
+
             console.print(
-                f"  [dim]Tokens (prefilter): {pf.input_tokens:,} in / {pf.output_tokens:,} out = ${pf.cost_usd:.4f}[/dim]"
+                f"  [cyan]Decision:[/cyan] [{style}]{decision.action.value}[/{style}] (confidence: {decision.confidence:.0%})"
             )
-            if not dry_run:
-                db.record_processed(
-                    post_guid=post.guid,
-                    decision=Action.IGNORE,
-                    post_content=post.content,
-                    reasoning=reasoning,
-                    input_tokens=pf.input_tokens,
-                    output_tokens=pf.output_tokens,
-                    cost_usd=pf.cost_usd,
-                    post_title=post.title,
-                    post_author=post.author,
-                    post_time=post.published.isoformat() if post.published else None,
-                    post_link=post.link,
-                    post_extra=post.extra or None,
+            console.print(f"  [dim]{decision.reasoning}[/dim]")
+
+            if decision.is_event and decision.event:
+                console.print(f"  [blue]Event:[/blue] {decision.event.title}")
+                console.print(
+                    f"  [blue]Date:[/blue] {decision.event.date} {decision.event.time or 'all day'}"
                 )
-            total_cost += pf.cost_usd
-            continue
-        else:
+                if decision.event.location:
+                    console.print(f"  [blue]Location:[/blue] {decision.event.location}")
+
+            if ctx.calendar_event_id:
+                console.print(
+                    f"  [green]Calendar event:[/green] {ctx.calendar_event_id}"
+                )
+
+            combined_cost = ctx.cost_usd + prefilter_cost
+            if ctx.escalation:
+                console.print(
+                    f"  [dim]Model: {ctx.model} (escalated: {ctx.escalation})[/dim]"
+                )
+            else:
+                console.print(f"  [dim]Model: {ctx.model}[/dim]")
             console.print(
-                f"  [dim]Pre-filter result: {'likely event' if pf and pf.is_likely_event else 'unknown (no pre-filter)'}[/dim]"
+                f"  [dim]Tokens: {ctx.input_tokens:,} in / {ctx.output_tokens:,} out = ${ctx.cost_usd:.4f}[/dim]"
             )
+            if prefilter_cost > 0:
+                console.print(
+                    f"  [dim]Pre-filter: {prefilter_input_tokens:,} in / {prefilter_output_tokens:,} out = ${prefilter_cost:.4f}[/dim]"
+                )
+            console.print(f"  [dim]Log: {ctx.logger.log_path}[/dim]")
+            total_cost += combined_cost
 
-        # Show prefilter cost if it ran before full analysis
-        prefilter_input_tokens = pf.input_tokens if pf else 0
-        prefilter_output_tokens = pf.output_tokens if pf else 0
-        prefilter_cost = pf.cost_usd if pf else 0.0
+    if batch_writes and not dry_run and db.get_pending_intents():
+        flush_writes()
+    finish_run()
 
-        try:
-            ctx = claude.analyze_post(post, dry_run=dry_run)
-        except Exception as e:
-            console.print(f"  [red]Error: {e}[/red]")
-            continue
+    stats.cost_usd = total_cost
+    if stats.post_seconds:
+        console.print(
+            f"\n[bold]Per-post latency:[/bold] "
+            f"{latency.format_percentiles(stats.post_seconds)} "
+            f"over {len(stats.post_seconds)} post(s)"
+        )
+    if route and stats.posts_analyzed:
+        console.print(
+            f"[bold]Model routing:[/bold] {stats.posts_escalated} of "
+            f"{stats.posts_analyzed} analyzed post(s) escalated "
+            f"({stats.posts_escalated / stats.posts_analyzed:.0%})"
+        )
+    if stats.posts_processed:
+        console.print(
+            f"[dim]Cost per post: ${total_cost / stats.posts_processed:.4f} "
+            f"over {stats.posts_processed} post(s)[/dim]"
+        )
+    if hedge:
+        hedges = latency.counters()
+        hedged = sum(
+            v - hedges_before.get(k, 0)
+            for k, v in hedges.items()
+            if k.endswith("_hedged")
+        )
+        console.print(f"[dim]Hedged {hedged} slow read-only call(s)[/dim]")
+    console.print(f"\n[bold]Total cost:[/bold] ${total_cost:.4f}")
+    if max_cost is not None:
+        console.print(f"[dim]Cost budget: ${max_cost:.2f}[/dim]")
+    if stats.posts_deferred:
+        console.print(
+            f"[dim]{stats.posts_deferred} post(s) left for the next run by the budget[/dim]"
+        )
+    console.print(f"[bold]Cumulative cost:[/bold] ${db.get_total_cost():.4f}")
+    return stats
 
-        decision = ctx.decision
-        if decision is None:
-            console.print("  [red]No decision recorded[/red]")
-            continue
 
-        # Display results
-        style = {
-            Action.CREATE: "green",
-            Action.UPDATE: "blue",
-            Action.CANCEL: "red",
-            Action.IGNORE: "dim",
-            Action.FLAG: "yellow",
-        }.get(decision.action, "")
+@app.command()
+def merge(
+    segments: list[Path] = typer.Argument(
+        ..., help="Segment files written by `calsync process --segment`"
+    ),
+):
+    """Fold the results of sharded runs into the database."""
+    from . import shards
 
+    db.init_db()
+    missing = [p for p in segments if not p.exists()]
+    if missing:
         console.print(
-            f"  [cyan]Decision:[/cyan] [{style}]{decision.action.value}[/{style}] (confidence: {decision.confidence:.0%})"
+            f"[red]Segment not found: {', '.join(str(p) for p in missing)}[/red]"
         )
-        console.print(f"  [dim]{decision.reasoning}[/dim]")
+        raise typer.Exit(1)
 
-        if decision.is_event and decision.event:
-            console.print(f"  [blue]Event:[/blue] {decision.event.title}")
-            console.print(
-                f"  [blue]Date:[/blue] {decision.event.date} {decision.event.time or 'all day'}"
-            )
-            if decision.event.location:
-                console.print(f"  [blue]Location:[/blue] {decision.event.location}")
+    result = shards.merge_segments(segments)
+    console.print(
+        f"[green]Merged {result.segments} segment(s):[/green] "
+        f"{result.decisions} decision(s), {result.added} new"
+    )
+    for event_date, title, guids in result.duplicates:
+        console.print(
+            f"  [yellow]Possible duplicate event:[/yellow] {title} on {event_date} "
+            f"created from {len(guids)} posts: {', '.join(guids)}"
+        )
 
-        if ctx.calendar_event_id:
-            console.print(f"  [green]Calendar event:[/green] {ctx.calendar_event_id}")
 
-        combined_cost = ctx.cost_usd + prefilter_cost
-        console.print(
-            f"  [dim]Tokens: {ctx.input_tokens:,} in / {ctx.output_tokens:,} out = ${ctx.cost_usd:.4f}[/dim]"
+@app.command()
+def serve(
+    feeds: Optional[list[str]] = typer.Option(
+        None,
+        "--feed",
+        "-f",
+        help=f"RSS feed URL (repeatable) [default: {DEFAULT_FEED}]",
+    ),
+    feeds_file: Optional[Path] = typer.Option(
+        None,
+        "--feeds-file",
+        help="File with one feed URL per line, re-read every poll",
+    ),
+    interval: float = typer.Option(
+        90.0, "--interval", help="Seconds between feed polls"
+    ),
+    events_output: str = typer.Option(
+        "website/data/events.json",
+        "--events-output",
+        help="Regenerate this events.json after calendar writes (empty to disable)",
+    ),
+    events_every: float = typer.Option(
+        3600.0,
+        "--events-every",
+        help="Also regenerate events.json at least this often (seconds)",
+    ),
+    host: str = typer.Option("127.0.0.1", "--host", help="Health/metrics bind address"),
+    port: int = typer.Option(
+        8787, "--port", help="Health/metrics port (/healthz, /metrics); 0 disables"
+    ),
+    feed_timeout: float = typer.Option(
+        30.0, "--feed-timeout", help="Per-feed fetch timeout in seconds"
+    ),
+    receive: bool = typer.Option(
+        False,
+        "--receive",
+        help="Also accept pushed posts on /websub and /webhook and process them at once",
+    ),
+    secret: Optional[str] = typer.Option(
+        None,
+        "--secret",
+        envvar="CALSYNC_WEBHOOK_SECRET",
+        help="Require an X-Hub-Signature HMAC of pushed bodies with this secret",
+    ),
+):
+    """Keep running: poll feeds on an interval and process new posts as they appear.
+
+    The database, API clients and HTTP connections stay open between polls.
+    Stops cleanly on SIGTERM/SIGINT after the current poll.
+    """
+    import threading
+
+    import httpx
+
+    from . import calendar, claude, ingest
+    from . import fetch_events as fetch_events_module
+    from . import serve as serve_module
+
+    db.init_db()
+    # Warm the clients up front so a bad credential fails at start, not mid-poll
+    claude.get_client()
+    calendar.get_calendar_service()
+
+    metrics = serve_module.ServeMetrics()
+    stop = threading.Event()
+    wake = threading.Event()
+    serve_module.install_signal_handlers(stop, wake)
+
+    receiver = None
+    if receive:
+        if not port:
+            raise typer.BadParameter("--receive needs a --port", param_hint="--port")
+        receiver = ingest.Receiver(secret=secret, on_enqueue=lambda n: wake.set())
+
+    server = None
+    if port:
+        server = serve_module.make_server(
+            metrics, host, port, stale_after=interval * 3, receiver=receiver
         )
-        if prefilter_cost > 0:
-            console.print(
-                f"  [dim]Pre-filter: {prefilter_input_tokens:,} in / {prefilter_output_tokens:,} out = ${prefilter_cost:.4f}[/dim]"
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        console.print(f"[dim]Health: http://{host}:{server.server_port}/healthz[/dim]")
+
+    with httpx.Client(follow_redirects=True) as http_client:
+
+        def poll():
+            return run_process(
+                _feed_urls(feeds, feeds_file),
+                feed_timeout=feed_timeout,
+                http_client=http_client,
             )
-        console.print(f"  [dim]Log: {ctx.logger.log_path}[/dim]")
-        total_cost += combined_cost
 
-    console.print(f"\n[bold]Total cost:[/bold] ${total_cost:.4f}")
-    console.print(f"[bold]Cumulative cost:[/bold] ${db.get_total_cost():.4f}")
+        def export():
+            count = fetch_events_module.write_events_json(Path(events_output))
+            console.print(f"[dim]Wrote {count} events to {events_output}[/dim]")
+
+        console.print(f"[bold]Serving: polling every {interval:g}s[/bold]")
+        serve_module.run_loop(
+            poll,
+            export if events_output else None,
+            metrics,
+            interval=interval,
+            export_every=events_every,
+            stop=stop,
+            log=lambda msg: console.print(f"[red]{msg}[/red]"),
+            wake=wake,
+        )
+
+    if server:
+        server.shutdown()
+    db.close()
+    console.print("[green]Stopped[/green]")
+
+
+@app.command()
+def receive(
+    host: str = typer.Option("127.0.0.1", "--host", help="Bind address"),
+    port: int = typer.Option(8788, "--port", help="Port for /websub and /webhook"),
+    secret: Optional[str] = typer.Option(
+        None,
+        "--secret",
+        envvar="CALSYNC_WEBHOOK_SECRET",
+        help="Require an X-Hub-Signature HMAC of pushed bodies with this secret",
+    ),
+):
+    """Accept pushed posts (WebSub or JSON webhook) into the ingest queue.
+
+    Queued posts are processed by the next `calsync process` run. Use
+    `calsync serve --receive` to process them as soon as they arrive.
+    """
+    import threading
+
+    from . import ingest
+    from . import serve as serve_module
+
+    db.init_db()
+    stop = threading.Event()
+    serve_module.install_signal_handlers(stop)
+    receiver = ingest.Receiver(
+        secret=secret,
+        on_enqueue=lambda n: console.print(f"Queued {n} pushed post(s)"),
+    )
+    server = serve_module.make_server(
+        serve_module.ServeMetrics(),
+        host,
+        port,
+        stale_after=float("inf"),
+        receiver=receiver,
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    console.print(
+        f"[bold]Receiving on http://{host}:{server.server_port}/websub "
+        f"and /webhook[/bold] ({db.count_queued_posts()} already queued)"
+    )
+    stop.wait()
+    server.shutdown()
+    db.close()
 
 
 @app.command()
@@ -231,7 +883,11 @@ def details(
     """Show full details for a processed post."""
     db.init_db()
 
-    records = db.get_processed(guid)
+    try:
+        records = db.get_processed(guid)
+    except FileNotFoundError as e:
+        console.print(f"[yellow]{e}[/yellow]")
+        raise typer.Exit(1)
     if not records:
         console.print(f"[yellow]No record found for:[/yellow] {guid}")
         raise typer.Exit(1)
@@ -286,16 +942,55 @@ def reset(
         if not typer.confirm("This will clear all processing history. Continue?"):
             return
 
-        import sqlite3
-
-        conn = sqlite3.connect(db.get_db_path())
-        conn.execute("DELETE FROM processed_posts")
-        conn.commit()
-        conn.close()
+        db.clear_processed()
 
         console.print("[green]All history cleared[/green]")
 
 
+@app.command("archive")
+def archive_cmd(
+    older_than: int = typer.Option(
+        90,
+        "--older-than",
+        help="Archive posts whose latest decision is older than N days",
+    ),
+    dry_run: bool = typer.Option(
+        False, "--dry-run", "-n", help="Show what would be archived without moving it"
+    ),
+    vacuum: bool = typer.Option(
+        True, "--vacuum/--no-vacuum", help="Shrink the database file afterwards"
+    ),
+):
+    """Move old processing history out of the live DB into monthly archive files."""
+    from . import archive
+
+    db.init_db()
+    before = db.get_stats()["file_bytes"]
+
+    result = archive.archive_older_than(older_than, dry_run=dry_run)
+    if not result.posts:
+        console.print("[yellow]Nothing to archive[/yellow]")
+        return
+
+    if dry_run:
+        console.print(
+            f"[yellow](dry run)[/yellow] Would archive {result.posts:,} posts "
+            f"({result.decisions:,} decisions) from months: {', '.join(result.files)}"
+        )
+        return
+
+    if vacuum:
+        db.vacuum()
+    after = db.get_stats()["file_bytes"]
+
+    console.print(
+        f"[green]Archived {result.posts:,} posts ({result.decisions:,} decisions)[/green]"
+    )
+    for name in result.files:
+        console.print(f"  [dim]{archive.get_archive_dir() / name}[/dim]")
+    console.print(f"[bold]DB size:[/bold] {before:,} → {after:,} bytes")
+
+
 @app.command("report")
 def report_cmd(
     output: str = typer.Option(
@@ -304,6 +999,8 @@ def report_cmd(
     limit: int = typer.Option(50, "--limit", "-l", help="Number of entries to include"),
 ):
     """Generate a static HTML report of processing history."""
+    from . import report
+
     db.init_db()
     entries = db.get_history(limit)
 
@@ -321,12 +1018,256 @@ def report_cmd(
     )
 
 
+@app.command("eval")
+def eval_cmd(
+    sample: int = typer.Option(50, "--sample", "-n", help="Posts to replay", min=1),
+    seed: int = typer.Option(0, "--seed", help="Seed for picking the sample"),
+    since: Optional[str] = typer.Option(
+        None, "--since", help="Only sample posts published on or after this date"
+    ),
+    configs: Optional[list[str]] = typer.Option(
+        None,
+        "--config",
+        "-c",
+        help="Configuration to replay (repeatable; the first is the baseline): "
+        "default, no-route, no-prefilter, fast-prefilter [default: default]",
+    ),
+    parallelism: int = typer.Option(
+        4, "--parallelism", "-p", help="Replays in flight at once", min=1
+    ),
+    cache: bool = typer.Option(
+        True,
+        "--cache/--no-cache",
+        help="Answer repeated model requests from data/response_cache.db",
+    ),
+    show: int = typer.Option(
+        10, "--show", help="Disagreements to list per configuration"
+    ),
+):
+    """Replay past posts (dry-run) and compare with what was decided."""
+    import os
+    import tempfile
+
+    from . import claude, evaluate, responsecache
+
+    names = configs or ["default"]
+    for name in names:
+        if name not in evaluate.CONFIGS:
+            raise typer.BadParameter(
+                f"unknown configuration {name!r}", param_hint="--config"
+            )
+
+    db.init_db()
+    cases = evaluate.sample_cases(sample, seed, since)
+    if not cases:
+        console.print("[yellow]No posts to replay[/yellow]")
+        return
+    db.close()
+
+    # Replays record their decisions; keep those out of the real DB, and
+    # their session logs together
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+    logs_dir = claude.get_logs_dir() / f"eval-{stamp}"
+    saved_env = {k: os.environ.get(k) for k in ("CALSYNC_DB_PATH", "CALSYNC_LOGS_DIR")}
+    scratch = tempfile.TemporaryDirectory()
+    os.environ["CALSYNC_DB_PATH"] = str(Path(scratch.name) / "eval.db")
+    os.environ["CALSYNC_LOGS_DIR"] = str(logs_dir)
+    response_cache = (
+        responsecache.ResponseCache(responsecache.get_cache_path()) if cache else None
+    )
+    responsecache.use(response_cache)
+
+    console.print(
+        f"Replaying {len(cases)} post(s) under {', '.join(names)}, "
+        f"{parallelism} at a time"
+    )
+
+    def progress(replay: "evaluate.Replay") -> None:
+        mark = "[green]✓[/green]" if replay.actions_agree else "[red]✗[/red]"
+        console.print(
+            f"  {mark} [dim]{replay.config.name}:[/dim] "
+            f"{replay.case.post.title[:60] or replay.case.post.guid}"
+        )
+
+    try:
+        db.init_db()
+        results = evaluate.run_eval(
+            cases,
+            [evaluate.CONFIGS[name] for name in names],
+            parallelism=parallelism,
+            on_replay=progress,
+        )
+    finally:
+        responsecache.use(None)
+        db.close()
+        for key, value in saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        scratch.cleanup()
+
+    summaries = {name: evaluate.Summary(replays) for name, replays in results.items()}
+    baseline = summaries[names[0]]
+
+    table = Table(title=f"Replay of {len(cases)} post(s) (seed {seed})")
+    table.add_column("Config", no_wrap=True)
+    table.add_column("Actions agree", justify="right")
+    table.add_column("Date/time agree", justify="right")
+    table.add_column("Cost/post", justify="right")
+    table.add_column("Δ cost", justify="right")
+    table.add_column("p50", justify="right")
+    table.add_column("p95", justify="right")
+    table.add_column("Δ p50", justify="right")
+    table.add_column("Escalated", justify="right")
+    table.add_column("Errors", justify="right")
+    table.add_row(
+        "[dim]recorded[/dim]",
+        "",
+        "",
+        f"[dim]${baseline.recorded_cost_per_post:.4f}[/dim]",
+        "",
+        "",
+        "",
+        "",
+        "",
+        "",
+    )
+    for name, summary in summaries.items():
+        when = (
+            f"{summary.when_agreement:.0%} of {summary.dated}"
+            if summary.when_agreement is not None
+            else "-"
+        )
+        cost_delta = (
+            f"{summary.cost_per_post / baseline.cost_per_post - 1:+.0%}"
+            if baseline.cost_per_post
+            else "-"
+        )
+        table.add_row(
+            name,
+            f"{summary.action_agreement:.0%}",
+            when,
+            f"${summary.cost_per_post:.4f}",
+            cost_delta if summary is not baseline else "",
+            f"{summary.p50:.1f}s",
+            f"{summary.p95:.1f}s",
+            f"{summary.p50 - baseline.p50:+.1f}s" if summary is not baseline else "",
+            str(summary.escalated),
+            str(summary.errors),
+        )
+    console.print(table)
+
+    for name, replays in results.items():
+        disagreements = [
+            r for r in replays if not r.actions_agree or r.when_agrees is False
+        ]
+        if not disagreements or not show:
+            continue
+        console.print(f"\n[bold]{name}[/bold]: {len(disagreements)} disagreement(s)")
+        for r in disagreements[:show]:
+            recorded = ", ".join(sorted(r.case.actions))
+            replayed = r.error or ", ".join(sorted(r.actions)) or "no decision"
+            console.print(
+                f"  {r.case.post.guid} [dim]{r.case.post.title[:40]}[/dim]: "
+                f"{recorded} → {replayed}"
+            )
+            if r.when_agrees is False and r.error is None:
+                console.print(
+                    f"    [dim]when: {sorted(r.case.when, key=str)} → "
+                    f"{sorted(r.when, key=str)}[/dim]"
+                )
+
+    if response_cache is not None:
+        console.print(
+            f"\nResponse cache: {response_cache.hits} hit(s), "
+            f"{response_cache.misses} miss(es)"
+        )
+        response_cache.close()
+    console.print(f"Session logs: {logs_dir}")
+
+
+@app.command()
+def profile(
+    run: str = typer.Argument(
+        "latest",
+        help="Trace file, run time (e.g. 20250501-1700) or 'latest' from traces/",
+    ),
+    posts: int = typer.Option(
+        10, "--posts", "-n", help="Slowest posts to break down", min=0
+    ),
+    depth: int = typer.Option(4, "--depth", help="Levels shown per post", min=1),
+):
+    """Show where a `process --trace` run spent its time, by stage and per post."""
+    from . import tracing
+
+    try:
+        path = tracing.find_trace(run)
+    except FileNotFoundError as e:
+        console.print(f"[red]{e}[/red]")
+        raise typer.Exit(1)
+    spans = tracing.load(path)
+    if not spans:
+        console.print(f"[yellow]No spans in {path}[/yellow]")
+        return
+
+    wall = (max(s.end_ns for s in spans) - min(s.start_ns for s in spans)) / 1e9
+    console.print(f"[bold]{path.name}[/bold]: {len(spans)} spans over {wall:.1f}s")
+
+    table = Table(title="Time by stage")
+    table.add_column("Stage", no_wrap=True)
+    table.add_column("Calls", justify="right")
+    table.add_column("Total", justify="right")
+    table.add_column("Self", justify="right")
+    table.add_column("Self %", justify="right")
+    for node in tracing.stage_totals(spans):
+        table.add_row(
+            node.name,
+            str(node.count),
+            f"{node.seconds:.2f}s",
+            f"{node.self_seconds:.2f}s",
+            f"{node.self_seconds / wall:.0%}" if wall else "-",
+        )
+    console.print(table)
+
+    children_of = tracing.children_by_parent(spans)
+    slowest = sorted(
+        (s for s in spans if s.name == "post"), key=lambda s: s.seconds, reverse=True
+    )
+    for post in slowest[:posts]:
+        root = tracing.Node("post")
+        root.add(post, children_of)
+        title = post.attrs.get("title") or post.attrs.get("guid", "")
+        console.print(f"\n[bold]{post.seconds:.1f}s[/bold] {title}")
+
+        def show(node: "tracing.Node", level: int) -> None:
+            width = round(30 * node.seconds / post.seconds) if post.seconds else 0
+            count = f" ×{node.count}" if node.count > 1 else ""
+            console.print(
+                f"  {'  ' * level}[cyan]{'█' * width or '▏'}[/cyan] "
+                f"{node.name}{count} {node.seconds:.2f}s "
+                f"[dim](self {node.self_seconds:.2f}s)[/dim]"
+            )
+            if level + 1 < depth:
+                for child in sorted(
+                    node.children.values(), key=lambda n: n.seconds, reverse=True
+                ):
+                    show(child, level + 1)
+
+        for child in sorted(
+            root.children.values(), key=lambda n: n.seconds, reverse=True
+        ):
+            show(child, 0)
+
+
 @app.command()
 def validate():
     """Validate Google Calendar API access."""
     from datetime import datetime, timedelta
     from zoneinfo import ZoneInfo
 
+    from . import calendar
+
     console.print("[bold]Validating calendar access...[/bold]\n")
 
     # Check credentials file
@@ -345,7 +1286,7 @@ def validate():
         raise typer.Exit(1)
 
     # Try to access the calendar
-    calendar_id = calendar.CALENDAR_ID
+    calendar_id = calendar.get_calendar_id()
     console.print(f"[dim]Calendar ID:[/dim] {calendar_id[:40]}...")
 
     try:
@@ -413,20 +1354,77 @@ def fetch_events(
     Recurring events are expanded for the next 4 months (next occurrence kept,
     count annotated). One-off events beyond 4 months are included as-is.
     """
+    from . import fetch_events as fetch_events_module
+
     db.init_db()
 
     console.print("[bold]Fetching events…[/bold]")
 
-    events = fetch_events_module.build_events_json()
-
-    console.print(f"[green]Found {len(events)} events[/green]")
-
     out_path = Path(output)
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    out_path.write_text(json.dumps(events, indent=2, default=str))
+    count = fetch_events_module.write_events_json(out_path)
 
+    console.print(f"[green]Found {count} events[/green]")
     console.print(f"[green]Written to:[/green] {out_path}")
 
 
+db_app = typer.Typer(help="Database maintenance commands", no_args_is_help=True)
+app.add_typer(db_app, name="db")
+
+
+@db_app.command("migrate")
+def db_migrate():
+    """Apply pending schema migrations."""
+    applied = db.migrate()
+    for name in applied:
+        console.print(f"[green]Applied:[/green] {name}")
+    console.print(f"[bold]Schema version:[/bold] {db.get_schema_version()}")
+
+
+@db_app.command("stats")
+def db_stats():
+    """Show database size and row counts."""
+    db.init_db()
+    stats = db.get_stats()
+
+    console.print(f"[bold]Path:[/bold]            {stats['path']}")
+    console.print(f"[bold]File size:[/bold]       {stats['file_bytes']:,} bytes")
+    console.print(f"[bold]Used pages:[/bold]      {stats['used_bytes']:,} bytes")
+    console.print(f"[bold]Posts:[/bold]           {stats['posts']:,}")
+    console.print(f"[bold]Decisions:[/bold]       {stats['decisions']:,}")
+    console.print(f"[bold]Archived posts:[/bold]  {stats['archived_posts']:,}")
+    if stats["pending_calendar_writes"]:
+        console.print(
+            f"[bold]Pending writes:[/bold]  {stats['pending_calendar_writes']:,} "
+            "[dim](finished by the next process run)[/dim]"
+        )
+    console.print(
+        f"[bold]Contents:[/bold]        {stats['post_contents']:,} "
+        f"({stats['content_compressed_bytes']:,} bytes compressed)"
+    )
+
+
+@db_app.command("explain")
+def db_explain():
+    """Print query plans for each database access path."""
+    db.init_db()
+
+    console.print(f"[bold]Schema version:[/bold] {db.get_schema_version()}\n")
+
+    full_scans = 0
+    for name, plan in db.explain_queries().items():
+        console.print(f"[bold]{name}[/bold]")
+        for detail in plan:
+            if db.is_full_scan(detail):
+                full_scans += 1
+                console.print(f"  [red]{detail}[/red]")
+            else:
+                console.print(f"  [dim]{detail}[/dim]")
+
+    if full_scans:
+        console.print(f"\n[red]{full_scans} full table scan(s)[/red]")
+        raise typer.Exit(1)
+    console.print("\n[green]No full table scans[/green]")
+
+
 if __name__ == "__main__":
     app()
@@ -1,28 +1,191 @@
 """SQLite database for tracking processed posts."""
 
+import atexit
+import base64
+import hashlib
 import json
+import os
 import sqlite3
+import threading
+import uuid
+import zlib
+from collections import defaultdict
+from contextlib import contextmanager
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional, Required, TypedDict
 
-from .models import Action, EventDetails
+from .models import Action, EventDetails, RssPost
+
+
+# SQLite's default host-parameter limit is 999 on older builds
+IN_CHUNK_SIZE = 500
+
+# How long a writer waits for another thread/process to release the write lock
+BUSY_TIMEOUT_SECONDS = 30.0
+
+# Columns exposed by the processed_posts view, in the original table's order
+PROCESSED_POSTS_COLUMNS = [
+    "id",
+    "post_guid",
+    "processed_at",
+    "decision",
+    "calendar_event_id",
+    "post_content",
+    "reasoning",
+    "input_tokens",
+    "output_tokens",
+    "cost_usd",
+    "post_title",
+    "post_author",
+    "post_time",
+    "post_link",
+    "event_title",
+    "event_date",
+    "event_time",
+    "event_location",
+    "post_extra",
+]
+
+
+def compress_content(content: str) -> bytes:
+    """Compress post HTML for storage in post_contents."""
+    return zlib.compress(content.encode("utf-8"), 9)
+
+
+def decompress_content(blob: bytes | None) -> str | None:
+    """Inverse of compress_content; registered as the zlib_decompress SQL function."""
+    if blob is None:
+        return None
+    return zlib.decompress(blob).decode("utf-8")
+
+
+def content_hash(content: str) -> str:
+    """Hash used to deduplicate post content."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
 
 
 def get_db_path() -> Path:
-    """Get the database file path."""
+    """Get the database file path from env var or default to data/."""
+    env_path = os.getenv("CALSYNC_DB_PATH")
+    if env_path:
+        return Path(env_path)
     return Path(__file__).parent.parent / "data" / "calendar_sync.db"
 
 
-def init_db() -> None:
-    """Initialize the database schema."""
-    db_path = get_db_path()
-    db_path.parent.mkdir(parents=True, exist_ok=True)
+class ConnectionManager:
+    """Process-wide owner of SQLite connections.
+
+    Each thread gets its own long-lived connection per database file (sqlite3
+    connections must not be shared across threads), so prepared statements are
+    reused via sqlite3's per-connection statement cache. Connections run in
+    WAL mode with synchronous=NORMAL so readers never block the writer and
+    commits don't fsync the main file.
+
+    Writes go through ``transaction()``; nested calls join the outermost
+    transaction, so a batch of ``record_processed`` calls inside one
+    ``with db.transaction():`` block commits once.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._all: list[sqlite3.Connection] = []
+
+    def _open(self, path: Path) -> sqlite3.Connection:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(
+            path,
+            timeout=BUSY_TIMEOUT_SECONDS,
+            isolation_level=None,  # we issue BEGIN/COMMIT ourselves
+            check_same_thread=False,  # only so close_all() can run from any thread
+            cached_statements=256,
+        )
+        conn.row_factory = sqlite3.Row
+        # Used by the processed_posts view; tools outside this package that
+        # read post_content need to register it too.
+        conn.create_function(
+            "zlib_decompress", 1, decompress_content, deterministic=True
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        with self._lock:
+            self._all.append(conn)
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """Return this thread's connection to the current database path."""
+        path = get_db_path()
+        conns: dict[str, sqlite3.Connection] = getattr(self._local, "conns", None) or {}
+        self._local.conns = conns
+        conn = conns.get(str(path))
+        if conn is None:
+            conn = conns[str(path)] = self._open(path)
+        return conn
 
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run a block in a write transaction, joining an enclosing one if any."""
+        conn = self.connection()
+        if conn.in_transaction:
+            yield conn
+            return
 
-    cursor.execute("""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def close_all(self) -> None:
+        """Close every connection and fold the WAL back into the main file.
+
+        Called at exit so the single .db file is complete before push_db.py
+        uploads it.
+        """
+        with self._lock:
+            conns, self._all = self._all, []
+        for conn in conns:
+            try:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            except sqlite3.Error:
+                pass
+            conn.close()
+        self._local = threading.local()
+
+
+_manager = ConnectionManager()
+atexit.register(_manager.close_all)
+
+
+def connect() -> sqlite3.Connection:
+    """Return the calling thread's shared connection."""
+    return _manager.connection()
+
+
+def transaction():
+    """Context manager for a multi-statement write transaction.
+
+    Example:
+        with db.transaction():
+            for row in rows:
+                db.record_processed(**row)
+    """
+    return _manager.transaction()
+
+
+def close() -> None:
+    """Close all connections and checkpoint the WAL."""
+    _manager.close_all()
+
+
+def _create_processed_posts(conn: sqlite3.Connection) -> None:
+    conn.execute("""
         CREATE TABLE IF NOT EXISTS processed_posts (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             post_guid TEXT NOT NULL,
@@ -46,45 +209,519 @@ def init_db() -> None:
         )
     """)
 
-    # Migration: add post_extra column if missing (for existing databases)
-    cursor.execute("PRAGMA table_info(processed_posts)")
-    columns = {row[1] for row in cursor.fetchall()}
+    # Databases created before user_version tracking may lack post_extra
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(processed_posts)")}
     if "post_extra" not in columns:
-        cursor.execute("ALTER TABLE processed_posts ADD COLUMN post_extra TEXT")
+        conn.execute("ALTER TABLE processed_posts ADD COLUMN post_extra TEXT")
+
+
+def _create_feed_state(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS feed_state (
+            feed_url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            fetched_at TEXT NOT NULL
+        )
+    """)
+
+
+def _add_access_path_indexes(conn: sqlite3.Connection) -> None:
+    # is_processed / get_processed_guids / get_processed / delete_processed
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_processed_posts_post_guid "
+        "ON processed_posts(post_guid)"
+    )
+    # get_rows_by_calendar_event_ids (id so the ORDER BY comes from the index)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_processed_posts_calendar_event_id "
+        "ON processed_posts(calendar_event_id, id)"
+    )
+    # get_history
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_processed_posts_processed_at "
+        "ON processed_posts(processed_at)"
+    )
+    # get_total_cost: covering index so the sum never reads post_content pages
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_processed_posts_cost_usd "
+        "ON processed_posts(cost_usd)"
+    )
+
+
+def _normalize_posts_and_decisions(conn: sqlite3.Connection) -> None:
+    """Split processed_posts into posts / decisions / post_contents.
+
+    Post content used to be copied into every decision row. It now lives once
+    per distinct body in post_contents (zlib-compressed, keyed by SHA-256),
+    post metadata lives once per guid in posts, and each decision references
+    its post. A processed_posts view with the original columns keeps existing
+    readers working. Decision ids are preserved.
+    """
+    conn.execute("""
+        CREATE TABLE post_contents (
+            content_hash TEXT PRIMARY KEY,
+            content BLOB NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE posts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            post_guid TEXT NOT NULL UNIQUE,
+            content_hash TEXT REFERENCES post_contents(content_hash),
+            post_title TEXT,
+            post_author TEXT,
+            post_time TEXT,
+            post_link TEXT,
+            post_extra TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE decisions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            post_id INTEGER NOT NULL REFERENCES posts(id) ON DELETE CASCADE,
+            processed_at TEXT NOT NULL,
+            decision TEXT NOT NULL,
+            calendar_event_id TEXT,
+            reasoning TEXT,
+            input_tokens INTEGER,
+            output_tokens INTEGER,
+            cost_usd REAL,
+            event_title TEXT,
+            event_date TEXT,
+            event_time TEXT,
+            event_location TEXT
+        )
+    """)
+
+    post_ids: dict[str, int] = {}
+    seen_hashes: set[str] = set()
+    for row in conn.execute("SELECT * FROM processed_posts ORDER BY id"):
+        guid = row["post_guid"]
+        if guid not in post_ids:
+            content = row["post_content"] or ""
+            digest = content_hash(content)
+            if digest not in seen_hashes:
+                conn.execute(
+                    "INSERT OR IGNORE INTO post_contents (content_hash, content) VALUES (?, ?)",
+                    (digest, compress_content(content)),
+                )
+                seen_hashes.add(digest)
+            cursor = conn.execute(
+                """
+                INSERT INTO posts
+                (post_guid, content_hash, post_title, post_author, post_time,
+                 post_link, post_extra)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    guid,
+                    digest,
+                    row["post_title"],
+                    row["post_author"],
+                    row["post_time"],
+                    row["post_link"],
+                    row["post_extra"],
+                ),
+            )
+            assert cursor.lastrowid is not None
+            post_ids[guid] = cursor.lastrowid
+        conn.execute(
+            """
+            INSERT INTO decisions
+            (id, post_id, processed_at, decision, calendar_event_id, reasoning,
+             input_tokens, output_tokens, cost_usd, event_title, event_date,
+             event_time, event_location)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                row["id"],
+                post_ids[guid],
+                row["processed_at"],
+                row["decision"],
+                row["calendar_event_id"],
+                row["reasoning"],
+                row["input_tokens"],
+                row["output_tokens"],
+                row["cost_usd"],
+                row["event_title"],
+                row["event_date"],
+                row["event_time"],
+                row["event_location"],
+            ),
+        )
+
+    conn.execute("DROP TABLE processed_posts")
+    conn.execute("""
+        CREATE VIEW processed_posts AS
+        SELECT
+            d.id, p.post_guid, d.processed_at, d.decision, d.calendar_event_id,
+            zlib_decompress(c.content) AS post_content, d.reasoning,
+            d.input_tokens, d.output_tokens, d.cost_usd, p.post_title,
+            p.post_author, p.post_time, p.post_link, d.event_title,
+            d.event_date, d.event_time, d.event_location, p.post_extra
+        FROM decisions d
+        JOIN posts p ON p.id = d.post_id
+        LEFT JOIN post_contents c ON c.content_hash = p.content_hash
+    """)
+
+    conn.execute("CREATE INDEX idx_posts_content_hash ON posts(content_hash)")
+    conn.execute("CREATE INDEX idx_decisions_post_id ON decisions(post_id)")
+    conn.execute(
+        "CREATE INDEX idx_decisions_calendar_event_id ON decisions(calendar_event_id, id)"
+    )
+    conn.execute("CREATE INDEX idx_decisions_processed_at ON decisions(processed_at)")
+    conn.execute("CREATE INDEX idx_decisions_cost_usd ON decisions(cost_usd)")
+
+
+def _create_archived_posts(conn: sqlite3.Connection) -> None:
+    # Hot index of posts moved to archive files (see archive.py)
+    conn.execute("""
+        CREATE TABLE archived_posts (
+            post_guid TEXT PRIMARY KEY,
+            archive_file TEXT NOT NULL,
+            archived_at TEXT NOT NULL,
+            decision_count INTEGER NOT NULL,
+            cost_usd REAL NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX idx_archived_posts_cost_usd ON archived_posts(cost_usd)")
+
+
+def _add_sync_tracking(conn: sqlite3.Connection) -> None:
+    """Track local changes so push_db can ship deltas instead of the whole file.
+
+    Each decision gets a stable uid so a replica can apply it exactly once.
+    Triggers note every new decision, deleted/archived post and feed_state
+    change in sync_outbox; ``export_changes`` turns the outbox into a
+    changeset (see dbsync.py).
+    """
+    conn.execute("ALTER TABLE decisions ADD COLUMN uid TEXT")
+    conn.execute("UPDATE decisions SET uid = lower(hex(randomblob(16)))")
+    conn.execute("CREATE UNIQUE INDEX idx_decisions_uid ON decisions(uid)")
+    conn.execute("""
+        CREATE TABLE sync_outbox (
+            kind TEXT NOT NULL,
+            key TEXT NOT NULL,
+            PRIMARY KEY (kind, key)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE sync_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE sync_applied (
+            changeset TEXT PRIMARY KEY,
+            applied_at TEXT NOT NULL
+        ) WITHOUT ROWID
+    """)
+    # Not INSERT OR IGNORE: an outer statement's conflict clause (e.g. an
+    # upsert) overrides the one inside a trigger body.
+    for name, event, table, kind, key in [
+        ("trg_decisions_sync", "INSERT", "decisions", "decision", "NEW.uid"),
+        ("trg_posts_delete_sync", "DELETE", "posts", "deleted", "OLD.post_guid"),
+        (
+            "trg_archived_delete_sync",
+            "DELETE",
+            "archived_posts",
+            "deleted",
+            "OLD.post_guid",
+        ),
+        (
+            "trg_archived_insert_sync",
+            "INSERT",
+            "archived_posts",
+            "archived",
+            "NEW.post_guid",
+        ),
+        ("trg_feed_insert_sync", "INSERT", "feed_state", "feed", "NEW.feed_url"),
+        ("trg_feed_update_sync", "UPDATE", "feed_state", "feed", "NEW.feed_url"),
+    ]:
+        conn.execute(f"""
+            CREATE TRIGGER {name} AFTER {event} ON {table}
+            BEGIN
+                INSERT INTO sync_outbox (kind, key)
+                SELECT '{kind}', {key}
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM sync_outbox WHERE kind = '{kind}' AND key = {key}
+                );
+            END
+        """)
+
+
+def _create_ingest_queue(conn: sqlite3.Connection) -> None:
+    """Posts pushed to the webhook receiver, waiting for ``process`` (see ingest.py).
+
+    Local to each machine: not change-tracked and cleared from base snapshots.
+    """
+    conn.execute("""
+        CREATE TABLE ingest_queue (
+            post_guid TEXT PRIMARY KEY,
+            post_json TEXT NOT NULL,
+            source TEXT,
+            published_at TEXT,
+            received_at TEXT NOT NULL
+        ) WITHOUT ROWID
+    """)
+    conn.execute(
+        "CREATE INDEX idx_ingest_queue_received_at ON ingest_queue(received_at)"
+    )
+
+
+def _create_calendar_journal(conn: sqlite3.Connection) -> None:
+    """Write-ahead journal of calendar writes (see journal.py).
+
+    A row is added before each create/update/delete is sent to the API, and
+    removed in the same transaction that records the decision. A row left
+    behind means the process died in between.
+    """
+    conn.execute("""
+        CREATE TABLE calendar_journal (
+            id INTEGER PRIMARY KEY,
+            idempotency_key TEXT NOT NULL UNIQUE,
+            post_guid TEXT NOT NULL,
+            action TEXT NOT NULL,
+            event_id TEXT NOT NULL,
+            record_json TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            created_at TEXT NOT NULL
+        )
+    """)
+
+
+# Schema migrations, applied in order. PRAGMA user_version records how many
+# have run; append new steps and never edit or reorder existing ones. The
+# early steps use IF NOT EXISTS because databases predating user_version
+# tracking already have some of these objects.
+MIGRATIONS = [
+    _create_processed_posts,
+    _create_feed_state,
+    _add_access_path_indexes,
+    _normalize_posts_and_decisions,
+    _create_archived_posts,
+    _add_sync_tracking,
+    _create_ingest_queue,
+    _create_calendar_journal,
+]
+
+# Steps that free enough space to be worth a VACUUM afterwards
+_VACUUM_AFTER = {_normalize_posts_and_decisions.__name__.lstrip("_")}
+
+
+def get_schema_version() -> int:
+    """Return the database's PRAGMA user_version."""
+    return connect().execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate() -> list[str]:
+    """Apply any pending migrations, each in its own transaction.
+
+    Returns: names of the migrations that were applied
+    """
+    applied = []
+    while True:
+        # Re-read the version inside each write transaction so two processes
+        # starting at once can't both apply the same step.
+        with transaction() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version >= len(MIGRATIONS):
+                return applied
+            step = MIGRATIONS[version]
+            step(conn)
+            # PRAGMA doesn't accept bound parameters; version is an int we control
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+        applied.append(step.__name__.lstrip("_"))
+
 
-    conn.commit()
-    conn.close()
+def init_db() -> None:
+    """Initialize the database schema, running any pending migrations."""
+    if _VACUUM_AFTER & set(migrate()):
+        vacuum()
+
+
+def vacuum() -> None:
+    """Rebuild the database file to release free pages."""
+    conn = connect()
+    conn.execute("VACUUM")
+    # In WAL mode the rebuilt pages sit in the WAL until checkpointed
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
 
 
 def is_processed(post_guid: str) -> bool:
     """Check if a post has already been processed."""
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
-
-    cursor.execute(
-        "SELECT 1 FROM processed_posts WHERE post_guid = ?",
-        (post_guid,),
+    row = (
+        connect()
+        .execute(
+            """
+            SELECT 1 FROM posts WHERE post_guid = ?
+            UNION ALL
+            SELECT 1 FROM archived_posts WHERE post_guid = ?
+            """,
+            (post_guid, post_guid),
+        )
+        .fetchone()
     )
-    result = cursor.fetchone() is not None
+    return row is not None
 
-    conn.close()
-    return result
+
+def get_processed_guids(post_guids: list[str]) -> set[str]:
+    """Return the subset of post_guids that have already been processed.
+
+    Looks up all guids with chunked ``IN`` queries instead of one query per
+    guid.
+    """
+    unique = list(dict.fromkeys(post_guids))
+    if not unique:
+        return set()
+
+    conn = connect()
+    found: set[str] = set()
+    for start in range(0, len(unique), IN_CHUNK_SIZE):
+        chunk = unique[start : start + IN_CHUNK_SIZE]
+        placeholders = ",".join("?" * len(chunk))
+        rows = conn.execute(
+            f"""
+            SELECT post_guid FROM posts WHERE post_guid IN ({placeholders})
+            UNION
+            SELECT post_guid FROM archived_posts WHERE post_guid IN ({placeholders})
+            """,
+            chunk + chunk,
+        )
+        found.update(row[0] for row in rows)
+    return found
 
 
 def get_processed(post_guid: str) -> list[dict]:
-    """Get all processing records for a post."""
-    conn = sqlite3.connect(get_db_path())
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
+    """Get all processing records for a post.
 
-    cursor.execute(
+    Falls back to the archive files for posts moved out by ``calsync archive``.
+    Raises FileNotFoundError if the post was archived but its archive file
+    hasn't been pulled locally.
+    """
+    conn = connect()
+    rows = conn.execute(
         "SELECT * FROM processed_posts WHERE post_guid = ? ORDER BY id",
         (post_guid,),
+    ).fetchall()
+    if rows:
+        return [dict(row) for row in rows]
+
+    archived = conn.execute(
+        "SELECT archive_file FROM archived_posts WHERE post_guid = ?", (post_guid,)
+    ).fetchone()
+    if archived is None:
+        return []
+
+    from .archive import read_archived_post
+
+    return read_archived_post(archived["archive_file"], post_guid)
+
+
+def _upsert_post(
+    conn: sqlite3.Connection,
+    post_guid: str,
+    post_content: str,
+    post_title: Optional[str],
+    post_author: Optional[str],
+    post_time: Optional[str],
+    post_link: Optional[str],
+    post_extra: Optional[str],
+) -> int:
+    """Store a post (and its content, once per distinct body); return its id."""
+    digest = content_hash(post_content)
+    exists = conn.execute(
+        "SELECT 1 FROM post_contents WHERE content_hash = ?", (digest,)
+    ).fetchone()
+    if not exists:
+        conn.execute(
+            "INSERT INTO post_contents (content_hash, content) VALUES (?, ?)",
+            (digest, compress_content(post_content)),
+        )
+    return _upsert_post_row(
+        conn,
+        post_guid,
+        digest,
+        post_title,
+        post_author,
+        post_time,
+        post_link,
+        post_extra,
     )
-    rows = cursor.fetchall()
 
-    conn.close()
-    return [dict(row) for row in rows]
+
+def _upsert_post_row(
+    conn: sqlite3.Connection,
+    post_guid: str,
+    digest: Optional[str],
+    post_title: Optional[str],
+    post_author: Optional[str],
+    post_time: Optional[str],
+    post_link: Optional[str],
+    post_extra: Optional[str],
+) -> int:
+    """Insert or update a posts row whose content is already stored; return its id."""
+    row = conn.execute(
+        """
+        INSERT INTO posts
+        (post_guid, content_hash, post_title, post_author, post_time, post_link,
+         post_extra)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(post_guid) DO UPDATE SET
+            content_hash = excluded.content_hash,
+            post_title = excluded.post_title,
+            post_author = excluded.post_author,
+            post_time = excluded.post_time,
+            post_link = excluded.post_link,
+            post_extra = excluded.post_extra
+        RETURNING id
+        """,
+        (
+            post_guid,
+            digest,
+            post_title,
+            post_author,
+            post_time,
+            post_link,
+            post_extra,
+        ),
+    ).fetchone()
+    return row[0]
+
+
+def _gc_post_contents(conn: sqlite3.Connection, hashes: list[str]) -> None:
+    """Drop the given content blobs if no post references them any more."""
+    for digest in hashes:
+        conn.execute(
+            """
+            DELETE FROM post_contents
+            WHERE content_hash = ?
+              AND NOT EXISTS (SELECT 1 FROM posts WHERE content_hash = ?)
+            """,
+            (digest, digest),
+        )
+
+
+class ProcessedRecord(TypedDict, total=False):
+    """Keyword arguments of ``record_processed``, kept while a write is journaled."""
+
+    post_guid: Required[str]
+    decision: Required[Action]
+    calendar_event_id: Optional[str]
+    post_content: str
+    reasoning: Optional[str]
+    input_tokens: int
+    output_tokens: int
+    cost_usd: float
+    post_title: Optional[str]
+    post_author: Optional[str]
+    post_time: Optional[str]
+    post_link: Optional[str]
+    event: Optional[EventDetails]
+    post_extra: Optional[dict]
 
 
 def record_processed(
@@ -103,43 +740,45 @@ def record_processed(
     event: Optional[EventDetails] = None,
     post_extra: Optional[dict] = None,
 ) -> None:
-    """Record that a post has been processed."""
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
+    """Record that a post has been processed.
 
-    cursor.execute(
-        """
-        INSERT INTO processed_posts
-        (post_guid, processed_at, decision, calendar_event_id, post_content, reasoning,
-         input_tokens, output_tokens, cost_usd, post_title, post_author,
-         post_time, post_link, event_title, event_date, event_time, event_location,
-         post_extra)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-        (
+    Commits immediately unless called inside ``transaction()``.
+    """
+    with transaction() as conn:
+        post_id = _upsert_post(
+            conn,
             post_guid,
-            datetime.now(timezone.utc).isoformat(),
-            decision.value,
-            calendar_event_id,
             post_content,
-            reasoning,
-            input_tokens,
-            output_tokens,
-            cost_usd,
             post_title,
             post_author,
             post_time,
             post_link,
-            event.title if event else None,
-            event.date if event else None,
-            event.time if event else None,
-            event.location if event else None,
             json.dumps(post_extra) if post_extra else None,
-        ),
-    )
-
-    conn.commit()
-    conn.close()
+        )
+        conn.execute(
+            """
+            INSERT INTO decisions
+            (uid, post_id, processed_at, decision, calendar_event_id, reasoning,
+             input_tokens, output_tokens, cost_usd, event_title, event_date,
+             event_time, event_location)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                uuid.uuid4().hex,
+                post_id,
+                datetime.now(timezone.utc).isoformat(),
+                decision.value,
+                calendar_event_id,
+                reasoning,
+                input_tokens,
+                output_tokens,
+                cost_usd,
+                event.title if event else None,
+                event.date if event else None,
+                event.time if event else None,
+                event.location if event else None,
+            ),
+        )
 
 
 def delete_processed(post_guid: str) -> bool:
@@ -147,27 +786,55 @@ def delete_processed(post_guid: str) -> bool:
 
     Returns True if a record was deleted, False if not found.
     """
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
+    with transaction() as conn:
+        # decisions go with the post via ON DELETE CASCADE
+        rows = conn.execute(
+            "DELETE FROM posts WHERE post_guid = ? RETURNING content_hash",
+            (post_guid,),
+        ).fetchall()
+        _gc_post_contents(conn, [row[0] for row in rows if row[0]])
+        archived = conn.execute(
+            "DELETE FROM archived_posts WHERE post_guid = ?", (post_guid,)
+        ).rowcount
+        return len(rows) > 0 or archived > 0
 
-    cursor.execute(
-        "DELETE FROM processed_posts WHERE post_guid = ?",
-        (post_guid,),
-    )
-    deleted = cursor.rowcount > 0
 
-    conn.commit()
-    conn.close()
-    return deleted
+def mark_archived(entries: list[tuple[str, str, int, float]]) -> None:
+    """Replace hot posts with archived_posts entries.
+
+    Args:
+        entries: (post_guid, archive_file, decision_count, cost_usd) per post
+    """
+    archived_at = datetime.now(timezone.utc).isoformat()
+    with transaction() as conn:
+        for post_guid, archive_file, decision_count, cost_usd in entries:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO archived_posts
+                (post_guid, archive_file, archived_at, decision_count, cost_usd)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (post_guid, archive_file, archived_at, decision_count, cost_usd),
+            )
+            rows = conn.execute(
+                "DELETE FROM posts WHERE post_guid = ? RETURNING content_hash",
+                (post_guid,),
+            ).fetchall()
+            _gc_post_contents(conn, [row[0] for row in rows if row[0]])
+
+
+def clear_processed() -> None:
+    """Delete all processing history."""
+    with transaction() as conn:
+        conn.execute("DELETE FROM decisions")
+        conn.execute("DELETE FROM posts")
+        conn.execute("DELETE FROM post_contents")
+        conn.execute("DELETE FROM archived_posts")
 
 
 def get_history(limit: int = 20) -> list[dict]:
     """Get recent processing history."""
-    conn = sqlite3.connect(get_db_path())
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-
-    cursor.execute(
+    rows = connect().execute(
         """
         SELECT *
         FROM processed_posts
@@ -176,23 +843,47 @@ def get_history(limit: int = 20) -> list[dict]:
         """,
         (limit,),
     )
-    rows = cursor.fetchall()
+    return [dict(row) for row in rows]
 
-    conn.close()
+
+def get_cost_history(limit: int = 500) -> list[dict]:
+    """Cost, author and content of the most recent decisions, for estimates.
+
+    ``prefiltered`` is 1 for posts the pre-filter ignored without analysis.
+    """
+    rows = connect().execute(
+        """
+        SELECT post_author, decision, cost_usd, post_content,
+               reasoning LIKE 'Pre-filter:%' AS prefiltered
+        FROM processed_posts
+        ORDER BY processed_at DESC
+        LIMIT ?
+        """,
+        (limit,),
+    )
     return [dict(row) for row in rows]
 
 
+def get_post_guids(since: Optional[str] = None) -> list[str]:
+    """Guids of the posts in the live DB, oldest first.
+
+    With ``since`` (an ISO date), only posts published on or after it.
+    Archived posts aren't included.
+    """
+    rows = connect().execute(
+        "SELECT post_guid FROM posts WHERE ? IS NULL OR post_time >= ? ORDER BY id",
+        (since, since),
+    )
+    return [row[0] for row in rows]
+
+
 def get_rows_by_calendar_event_ids(event_ids: list[str]) -> dict[str, dict]:
     """Return a mapping of calendar_event_id → most-recent DB row for each id."""
     if not event_ids:
         return {}
 
-    conn = sqlite3.connect(get_db_path())
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-
     placeholders = ",".join("?" * len(event_ids))
-    cursor.execute(
+    rows = connect().execute(
         f"""
         SELECT * FROM processed_posts
         WHERE calendar_event_id IN ({placeholders})
@@ -200,8 +891,6 @@ def get_rows_by_calendar_event_ids(event_ids: list[str]) -> dict[str, dict]:
         """,
         event_ids,
     )
-    rows = cursor.fetchall()
-    conn.close()
 
     # Keep only the most-recent row per calendar_event_id (ORDER BY id DESC)
     result: dict[str, dict] = {}
@@ -215,11 +904,627 @@ def get_rows_by_calendar_event_ids(event_ids: list[str]) -> dict[str, dict]:
 
 def get_total_cost() -> float:
     """Get total cost across all processed posts."""
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
+    row = (
+        connect()
+        .execute(
+            """
+            SELECT (SELECT COALESCE(SUM(cost_usd), 0) FROM decisions)
+                 + (SELECT COALESCE(SUM(cost_usd), 0) FROM archived_posts)
+            """
+        )
+        .fetchone()
+    )
+    return row[0]
 
-    cursor.execute("SELECT COALESCE(SUM(cost_usd), 0) FROM processed_posts")
-    result = cursor.fetchone()[0]
 
-    conn.close()
-    return result
+def get_stats() -> dict:
+    """Return size and row-count figures for the database."""
+    conn = connect()
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    compressed = conn.execute(
+        "SELECT COALESCE(SUM(LENGTH(content)), 0) FROM post_contents"
+    ).fetchone()[0]
+    path = get_db_path()
+    return {
+        "path": str(path),
+        "file_bytes": path.stat().st_size if path.exists() else 0,
+        "used_bytes": (page_count - freelist) * page_size,
+        "posts": conn.execute("SELECT COUNT(*) FROM posts").fetchone()[0],
+        "decisions": conn.execute("SELECT COUNT(*) FROM decisions").fetchone()[0],
+        "post_contents": conn.execute("SELECT COUNT(*) FROM post_contents").fetchone()[
+            0
+        ],
+        "content_compressed_bytes": compressed,
+        "archived_posts": conn.execute(
+            "SELECT COUNT(*) FROM archived_posts"
+        ).fetchone()[0],
+        "pending_calendar_writes": conn.execute(
+            "SELECT COUNT(*) FROM calendar_journal"
+        ).fetchone()[0],
+    }
+
+
+def get_feed_state(feed_url: str) -> dict | None:
+    """Get the cached HTTP validators (ETag/Last-Modified) for a feed."""
+    row = (
+        connect()
+        .execute("SELECT * FROM feed_state WHERE feed_url = ?", (feed_url,))
+        .fetchone()
+    )
+    return dict(row) if row else None
+
+
+def set_feed_state(
+    feed_url: str, etag: Optional[str], last_modified: Optional[str]
+) -> None:
+    """Store the HTTP validators from the latest successful fetch of a feed."""
+    with transaction() as conn:
+        conn.execute(
+            """
+            INSERT INTO feed_state (feed_url, etag, last_modified, fetched_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(feed_url) DO UPDATE SET
+                etag = excluded.etag,
+                last_modified = excluded.last_modified,
+                fetched_at = excluded.fetched_at
+            """,
+            (feed_url, etag, last_modified, datetime.now(timezone.utc).isoformat()),
+        )
+
+
+# ---------------------------------------------------------------------------
+# Ingest queue for pushed posts (see ingest.py)
+# ---------------------------------------------------------------------------
+
+
+def enqueue_posts(posts: list[RssPost], source: Optional[str] = None) -> int:
+    """Queue pushed posts for the next ``process`` run; return how many were new.
+
+    Posts that are already queued or already processed are skipped, so a
+    publisher redelivering a notification is harmless.
+    """
+    if not posts:
+        return 0
+    received_at = datetime.now(timezone.utc).isoformat()
+    known = get_processed_guids([p.guid for p in posts])
+    added = 0
+    with transaction() as conn:
+        for post in posts:
+            if post.guid in known:
+                continue
+            cursor = conn.execute(
+                """
+                INSERT INTO ingest_queue
+                    (post_guid, post_json, source, published_at, received_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(post_guid) DO NOTHING
+                """,
+                (
+                    post.guid,
+                    post.model_dump_json(),
+                    source,
+                    post.published.isoformat() if post.published else None,
+                    received_at,
+                ),
+            )
+            added += cursor.rowcount
+    return added
+
+
+def get_queued_posts() -> list[RssPost]:
+    """Queued posts, oldest notification first."""
+    rows = connect().execute(
+        "SELECT post_json FROM ingest_queue ORDER BY received_at, post_guid"
+    )
+    return [RssPost.model_validate_json(row[0]) for row in rows]
+
+
+def count_queued_posts() -> int:
+    return connect().execute("SELECT COUNT(*) FROM ingest_queue").fetchone()[0]
+
+
+def finish_queued_posts() -> list[dict]:
+    """Drop queued posts that have since been processed.
+
+    Returns their queue rows (``post_guid``, ``published_at``,
+    ``received_at``) so the caller can measure ingest latency.
+    """
+    with transaction() as conn:
+        guids = [row[0] for row in conn.execute("SELECT post_guid FROM ingest_queue")]
+        done = get_processed_guids(guids)
+        rows = _select_in(
+            conn,
+            "SELECT post_guid, published_at, received_at FROM ingest_queue "
+            "WHERE post_guid IN ({placeholders})",
+            sorted(done),
+        )
+        _select_in(
+            conn,
+            "DELETE FROM ingest_queue WHERE post_guid IN ({placeholders})",
+            sorted(done),
+        )
+    return [dict(row) for row in rows]
+
+
+# ---------------------------------------------------------------------------
+# Calendar write journal (see journal.py)
+# ---------------------------------------------------------------------------
+
+
+def add_intent(
+    idempotency_key: str,
+    post_guid: str,
+    action: str,
+    event_id: str,
+    record_json: str,
+) -> int:
+    """Journal a calendar write before it is sent; return the intent id.
+
+    An identical intent that is still pending is reused rather than added twice.
+    """
+    with transaction() as conn:
+        row = conn.execute(
+            """
+            INSERT INTO calendar_journal
+                (idempotency_key, post_guid, action, event_id, record_json, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(idempotency_key) DO UPDATE SET attempts = attempts
+            RETURNING id
+            """,
+            (
+                idempotency_key,
+                post_guid,
+                action,
+                event_id,
+                record_json,
+                datetime.now(timezone.utc).isoformat(),
+            ),
+        ).fetchone()
+    return row[0]
+
+
+def get_pending_intents() -> list[dict]:
+    """Journaled writes whose decision hasn't been recorded, oldest first."""
+    rows = connect().execute("SELECT * FROM calendar_journal ORDER BY id")
+    return [dict(row) for row in rows]
+
+
+def get_pending_intent_guids() -> set[str]:
+    rows = connect().execute("SELECT DISTINCT post_guid FROM calendar_journal")
+    return {row[0] for row in rows}
+
+
+def note_intent_error(intent_id: int, error: str) -> None:
+    """Count a failed attempt; the intent stays pending for the next reconcile."""
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE calendar_journal SET attempts = attempts + 1, last_error = ? "
+            "WHERE id = ?",
+            (error, intent_id),
+        )
+
+
+def remove_intent(intent_id: int) -> None:
+    """Drop an intent once its decision is recorded (or it's known not to apply)."""
+    with transaction() as conn:
+        conn.execute("DELETE FROM calendar_journal WHERE id = ?", (intent_id,))
+
+
+# ---------------------------------------------------------------------------
+# Machine-local tables
+# ---------------------------------------------------------------------------
+
+# Tables describing work in progress on this machine. They aren't change
+# tracked, are emptied in base snapshots, and survive the local DB being
+# replaced by a pulled base (see dbsync._rebase).
+LOCAL_TABLES = ("ingest_queue", "calendar_journal")
+
+
+def export_local_tables() -> dict[str, list[dict]]:
+    conn = connect()
+    return {
+        table: [dict(row) for row in conn.execute(f"SELECT * FROM {table}")]
+        for table in LOCAL_TABLES
+    }
+
+
+def import_local_tables(tables: dict[str, list[dict]]) -> None:
+    """Restore rows from ``export_local_tables`` as they were."""
+    with transaction() as conn:
+        for table, rows in tables.items():
+            for row in rows:
+                columns = ", ".join(row)
+                placeholders = ", ".join(f":{c}" for c in row)
+                conn.execute(
+                    f"INSERT OR IGNORE INTO {table} ({columns}) VALUES ({placeholders})",
+                    row,
+                )
+
+
+# ---------------------------------------------------------------------------
+# Change tracking for delta sync (see dbsync.py)
+# ---------------------------------------------------------------------------
+
+CHANGESET_FORMAT = 1
+
+# Decision columns carried in a changeset; post_id is local and resolved by guid
+_DECISION_SYNC_COLUMNS = [
+    "uid",
+    "processed_at",
+    "decision",
+    "calendar_event_id",
+    "reasoning",
+    "input_tokens",
+    "output_tokens",
+    "cost_usd",
+    "event_title",
+    "event_date",
+    "event_time",
+    "event_location",
+]
+
+
+def _select_in(conn: sqlite3.Connection, sql: str, keys: list[str]) -> list:
+    """Run ``sql`` once per IN_CHUNK_SIZE keys, filling its ``{placeholders}``."""
+    rows = []
+    for start in range(0, len(keys), IN_CHUNK_SIZE):
+        chunk = keys[start : start + IN_CHUNK_SIZE]
+        placeholders = ",".join("?" * len(chunk))
+        rows.extend(conn.execute(sql.format(placeholders=placeholders), chunk))
+    return rows
+
+
+def get_sync_meta(key: str) -> Optional[str]:
+    """Read a value recorded by dbsync (e.g. the base snapshot hash)."""
+    row = (
+        connect()
+        .execute("SELECT value FROM sync_meta WHERE key = ?", (key,))
+        .fetchone()
+    )
+    return row[0] if row else None
+
+
+def set_sync_meta(key: str, value: Optional[str]) -> None:
+    """Record a dbsync value; None removes it."""
+    with transaction() as conn:
+        if value is None:
+            conn.execute("DELETE FROM sync_meta WHERE key = ?", (key,))
+        else:
+            conn.execute(
+                "INSERT OR REPLACE INTO sync_meta (key, value) VALUES (?, ?)",
+                (key, value),
+            )
+
+
+def count_pending_changes() -> int:
+    """Number of local changes not yet pushed."""
+    return connect().execute("SELECT COUNT(*) FROM sync_outbox").fetchone()[0]
+
+
+def export_changes() -> dict | None:
+    """Return the local changes since the last push as a changeset, or None.
+
+    The changeset is a JSON-serializable dict. Its ``outbox`` entries should
+    be passed to ``clear_outbox`` once it is safely stored remotely.
+    """
+    conn = connect()
+    outbox = [
+        [row["kind"], row["key"]]
+        for row in conn.execute("SELECT kind, key FROM sync_outbox ORDER BY kind, key")
+    ]
+    if not outbox:
+        return None
+    keys: dict[str, list[str]] = defaultdict(list)
+    for kind, key in outbox:
+        keys[kind].append(key)
+
+    # Rows deleted or archived after being queued simply aren't found here
+    columns = ", ".join(f"d.{c}" for c in _DECISION_SYNC_COLUMNS)
+    decisions = [
+        dict(row)
+        for row in _select_in(
+            conn,
+            f"""
+            SELECT p.post_guid, {columns}
+            FROM decisions d JOIN posts p ON p.id = d.post_id
+            WHERE d.uid IN ({{placeholders}})
+            ORDER BY d.id
+            """,
+            keys["decision"],
+        )
+    ]
+    posts = [
+        dict(row)
+        for row in _select_in(
+            conn,
+            """
+            SELECT post_guid, content_hash, post_title, post_author, post_time,
+                   post_link, post_extra
+            FROM posts WHERE post_guid IN ({placeholders})
+            """,
+            list(dict.fromkeys(d["post_guid"] for d in decisions)),
+        )
+    ]
+    contents = [
+        {
+            "content_hash": row[0],
+            "content": base64.b64encode(row[1]).decode("ascii"),
+        }
+        for row in _select_in(
+            conn,
+            "SELECT content_hash, content FROM post_contents "
+            "WHERE content_hash IN ({placeholders})",
+            sorted({p["content_hash"] for p in posts if p["content_hash"]}),
+        )
+    ]
+    archived = [
+        dict(row)
+        for row in _select_in(
+            conn,
+            "SELECT * FROM archived_posts WHERE post_guid IN ({placeholders})",
+            keys["archived"],
+        )
+    ]
+    feed_state = [
+        dict(row)
+        for row in _select_in(
+            conn,
+            "SELECT * FROM feed_state WHERE feed_url IN ({placeholders})",
+            keys["feed"],
+        )
+    ]
+    return {
+        "format": CHANGESET_FORMAT,
+        "outbox": outbox,
+        "deleted": keys["deleted"],
+        "archived": archived,
+        "contents": contents,
+        "posts": posts,
+        "decisions": decisions,
+        "feed_state": feed_state,
+    }
+
+
+def clear_outbox(entries: list[list[str]]) -> None:
+    """Forget outbox entries that have been pushed."""
+    with transaction() as conn:
+        conn.executemany(
+            "DELETE FROM sync_outbox WHERE kind = ? AND key = ?",
+            [tuple(entry) for entry in entries],
+        )
+
+
+def requeue(entries: list[list[str]]) -> None:
+    """Put outbox entries back, e.g. after replaying local changes on a new base."""
+    with transaction() as conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO sync_outbox (kind, key) VALUES (?, ?)",
+            [tuple(entry) for entry in entries],
+        )
+
+
+def queue_all_changes() -> None:
+    """Queue every row for the next push (for a database that was never synced)."""
+    with transaction() as conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO sync_outbox (kind, key) "
+            "SELECT 'decision', uid FROM decisions"
+        )
+        conn.execute(
+            "INSERT OR IGNORE INTO sync_outbox (kind, key) "
+            "SELECT 'archived', post_guid FROM archived_posts"
+        )
+        conn.execute(
+            "INSERT OR IGNORE INTO sync_outbox (kind, key) "
+            "SELECT 'feed', feed_url FROM feed_state"
+        )
+
+
+def apply_changes(changeset: dict) -> int:
+    """Apply a changeset exported by another copy of the database.
+
+    Deletions are applied first, then archive entries, posts and decisions.
+    Decisions are keyed by uid and feed_state keeps the newest fetch, so
+    applying the same changeset twice is harmless. The applied rows already
+    exist remotely, so the outbox entries their triggers raise are dropped.
+
+    Returns: the number of decisions added
+    """
+    if changeset.get("format") != CHANGESET_FORMAT:
+        raise ValueError(f"Unsupported changeset format: {changeset.get('format')!r}")
+
+    with transaction() as conn:
+        pending = {
+            tuple(row) for row in conn.execute("SELECT kind, key FROM sync_outbox")
+        }
+
+        for guid in changeset["deleted"]:
+            rows = conn.execute(
+                "DELETE FROM posts WHERE post_guid = ? RETURNING content_hash", (guid,)
+            ).fetchall()
+            _gc_post_contents(conn, [row[0] for row in rows if row[0]])
+            conn.execute("DELETE FROM archived_posts WHERE post_guid = ?", (guid,))
+
+        for row in changeset["archived"]:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO archived_posts
+                (post_guid, archive_file, archived_at, decision_count, cost_usd)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (
+                    row["post_guid"],
+                    row["archive_file"],
+                    row["archived_at"],
+                    row["decision_count"],
+                    row["cost_usd"],
+                ),
+            )
+
+        conn.executemany(
+            "INSERT OR IGNORE INTO post_contents (content_hash, content) VALUES (?, ?)",
+            [
+                (row["content_hash"], base64.b64decode(row["content"]))
+                for row in changeset["contents"]
+            ],
+        )
+
+        post_ids = {
+            row["post_guid"]: _upsert_post_row(
+                conn,
+                row["post_guid"],
+                row["content_hash"],
+                row["post_title"],
+                row["post_author"],
+                row["post_time"],
+                row["post_link"],
+                row["post_extra"],
+            )
+            for row in changeset["posts"]
+        }
+
+        added = 0
+        columns = ", ".join(_DECISION_SYNC_COLUMNS)
+        placeholders = ", ".join("?" * (len(_DECISION_SYNC_COLUMNS) + 1))
+        for row in changeset["decisions"]:
+            post_id = post_ids[row["post_guid"]]
+            # Copies of the same decision made before uids existed have
+            # different uids; match those on (post, processed_at, decision)
+            added += conn.execute(
+                f"""
+                INSERT INTO decisions (post_id, {columns})
+                SELECT {placeholders}
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM decisions
+                    WHERE post_id = ? AND processed_at = ? AND decision = ?
+                )
+                ON CONFLICT(uid) DO NOTHING
+                """,
+                [post_id]
+                + [row[c] for c in _DECISION_SYNC_COLUMNS]
+                + [post_id, row["processed_at"], row["decision"]],
+            ).rowcount
+
+        for row in changeset["feed_state"]:
+            conn.execute(
+                """
+                INSERT INTO feed_state (feed_url, etag, last_modified, fetched_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(feed_url) DO UPDATE SET
+                    etag = excluded.etag,
+                    last_modified = excluded.last_modified,
+                    fetched_at = excluded.fetched_at
+                WHERE excluded.fetched_at > feed_state.fetched_at
+                """,
+                (
+                    row["feed_url"],
+                    row["etag"],
+                    row["last_modified"],
+                    row["fetched_at"],
+                ),
+            )
+
+        raised = [
+            tuple(row)
+            for row in conn.execute("SELECT kind, key FROM sync_outbox")
+            if tuple(row) not in pending
+        ]
+        conn.executemany("DELETE FROM sync_outbox WHERE kind = ? AND key = ?", raised)
+    return added
+
+
+def get_applied_changesets() -> set[str]:
+    """Names of remote changesets already applied to (or exported from) this DB."""
+    rows = connect().execute("SELECT changeset FROM sync_applied")
+    return {row[0] for row in rows}
+
+
+def mark_changeset_applied(name: str) -> None:
+    """Record that a remote changeset's rows are present locally."""
+    with transaction() as conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO sync_applied (changeset, applied_at) VALUES (?, ?)",
+            (name, datetime.now(timezone.utc).isoformat()),
+        )
+
+
+def reset_sync_state(base_sha256: str) -> None:
+    """Mark this DB as an exact copy of the given base snapshot."""
+    with transaction() as conn:
+        conn.execute("DELETE FROM sync_outbox")
+        conn.execute("DELETE FROM sync_applied")
+        conn.execute(
+            "INSERT OR REPLACE INTO sync_meta (key, value) VALUES ('base_sha256', ?)",
+            (base_sha256,),
+        )
+
+
+# Representative queries for each access path, checked by `calsync db explain`
+_EXPLAIN_QUERIES: dict[str, tuple[str, tuple]] = {
+    "is_processed": (
+        "SELECT 1 FROM posts WHERE post_guid = ? "
+        "UNION ALL SELECT 1 FROM archived_posts WHERE post_guid = ?",
+        ("guid", "guid"),
+    ),
+    "get_processed_guids": (
+        "SELECT post_guid FROM posts WHERE post_guid IN (?, ?) "
+        "UNION SELECT post_guid FROM archived_posts WHERE post_guid IN (?, ?)",
+        ("a", "b", "a", "b"),
+    ),
+    "get_processed": (
+        "SELECT * FROM processed_posts WHERE post_guid = ? ORDER BY id",
+        ("guid",),
+    ),
+    "delete_processed": (
+        "DELETE FROM posts WHERE post_guid = ?",
+        ("guid",),
+    ),
+    "get_history": (
+        "SELECT * FROM processed_posts ORDER BY processed_at DESC LIMIT ?",
+        (20,),
+    ),
+    "get_cost_history": (
+        "SELECT post_author, decision, cost_usd, post_content FROM processed_posts "
+        "ORDER BY processed_at DESC LIMIT ?",
+        (500,),
+    ),
+    "get_rows_by_calendar_event_ids": (
+        "SELECT * FROM processed_posts WHERE calendar_event_id IN (?, ?) ORDER BY id ASC",
+        ("a", "b"),
+    ),
+    "get_total_cost": (
+        "SELECT (SELECT COALESCE(SUM(cost_usd), 0) FROM decisions) "
+        "+ (SELECT COALESCE(SUM(cost_usd), 0) FROM archived_posts)",
+        (),
+    ),
+    "get_feed_state": (
+        "SELECT * FROM feed_state WHERE feed_url = ?",
+        ("url",),
+    ),
+    "export_changes": (
+        "SELECT p.post_guid, d.uid FROM decisions d JOIN posts p ON p.id = d.post_id "
+        "WHERE d.uid IN (?, ?) ORDER BY d.id",
+        ("a", "b"),
+    ),
+}
+
+
+def explain_queries() -> dict[str, list[str]]:
+    """Return the EXPLAIN QUERY PLAN detail lines for each access path."""
+    conn = connect()
+    plans = {}
+    for name, (sql, params) in _EXPLAIN_QUERIES.items():
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        plans[name] = [row["detail"] for row in rows]
+    return plans
+
+
+def is_full_scan(plan_detail: str) -> bool:
+    """Whether a query-plan line is a table scan that doesn't use an index."""
+    return (
+        plan_detail.startswith("SCAN")
+        and "INDEX" not in plan_detail
+        and "CONSTANT ROW" not in plan_detail
+    )
@@ -0,0 +1,645 @@
+"""Change-aware sync of the database to S3-compatible storage.
+
+Remote layout, under one key prefix::
+
+    manifest.json                current base name + hash, ordered changeset names
+    bases/<name>.db.gz           base snapshot (gzip-compressed SQLite file)
+    bases/<name>.db.gz.sha256    SHA-256 of the uncompressed base (sha256sum format)
+    changesets/<name>.json.gz    rows pushed since the base was written
+    archive/<name>.jsonl.gz      immutable archive files (see archive.py)
+
+``push`` uploads only the rows recorded in the local sync outbox since the
+last push, as a gzip-compressed JSON changeset, and uploads nothing at all
+when there are no local changes. Once MAX_CHANGESETS have piled up, or when
+the local database isn't a copy of the remote base, it uploads a fresh base
+snapshot instead (skipped if its hash matches the remote one).
+
+Objects other than the manifest are never overwritten, and the manifest is
+only replaced with a conditional (ETag / GCS generation) write, so runs can
+overlap: the loser of a race merges the winner's changes and retries.
+
+``pull`` downloads the base only when the local database isn't already a copy
+of it, then applies the changesets it hasn't seen yet. The base is streamed
+through gzip in both directions (multipart above MULTIPART_THRESHOLD) and is
+only swapped into place after its SHA-256 and an SQLite quick_check pass, so
+a truncated download never becomes the local database.
+
+The S3 client is passed in (see scripts/s3_config.py), so this module doesn't
+depend on boto3 and can be tested against moto.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import uuid
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+
+from . import db
+
+# Each snapshot gets a new name so a push that loses the manifest race never
+# overwrites the base other runs are reading
+BASE_PREFIX = "bases/"
+# Single uncompressed base written before manifests existed
+LEGACY_BASE_NAME = "calendar_sync.db"
+MANIFEST_NAME = "manifest.json"
+CHANGESET_PREFIX = "changesets/"
+MANIFEST_FORMAT = 1
+
+# Fold changesets into a new base after this many (~4 days of 2-hourly runs)
+MAX_CHANGESETS = 48
+
+# Streaming chunk size, and the size above which S3 transfers go multipart
+CHUNK_SIZE = 1024 * 1024
+MULTIPART_THRESHOLD = 16 * 1024 * 1024
+
+# A pull that races a snapshot push re-reads the manifest this many times
+PULL_ATTEMPTS = 3
+
+# A push that loses the manifest race merges and retries this many times
+PUSH_ATTEMPTS = 5
+
+
+class ObjectVersion:
+    """The version of a remote object a conditional write is based on.
+
+    ``etag`` is sent as If-Match. GCS's S3 interoperability API also reports
+    the object's generation, which is checked via x-goog-if-generation-match.
+    """
+
+    def __init__(self, etag: str, generation: str | None = None):
+        self.etag = etag
+        self.generation = generation
+
+
+class RemoteStore:
+    """Objects under one S3 key prefix, counting the bytes moved each way."""
+
+    def __init__(self, s3, bucket: str, prefix: str):
+        self.s3 = s3
+        self.bucket = bucket
+        self.prefix = prefix
+        self.bytes_up = 0
+        self.bytes_down = 0
+
+    def get(self, name: str) -> bytes | None:
+        """Return an object's bytes, or None if it doesn't exist."""
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=self.prefix + name)
+        except self.s3.exceptions.NoSuchKey:
+            return None
+        body = response["Body"].read()
+        self.bytes_down += len(body)
+        return body
+
+    def put(self, name: str, body: bytes) -> None:
+        self.s3.put_object(Bucket=self.bucket, Key=self.prefix + name, Body=body)
+        self.bytes_up += len(body)
+
+    def get_versioned(self, name: str) -> tuple[bytes | None, ObjectVersion | None]:
+        """Like ``get``, also returning the version for ``put_if``."""
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=self.prefix + name)
+        except self.s3.exceptions.NoSuchKey:
+            return None, None
+        body = response["Body"].read()
+        self.bytes_down += len(body)
+        headers = response["ResponseMetadata"].get("HTTPHeaders", {})
+        return body, ObjectVersion(response["ETag"], headers.get("x-goog-generation"))
+
+    def put_if(self, name: str, body: bytes, version: ObjectVersion | None) -> None:
+        """Write an object only if it is still at ``version``.
+
+        ``version=None`` means the object must not exist yet. Raises
+        ConflictError if someone else wrote it first.
+        """
+        kwargs = {"IfMatch": version.etag} if version else {"IfNoneMatch": "*"}
+        generation = version.generation if version else "0"
+
+        def add_generation_header(params, **_):
+            if version is None or version.generation:
+                params["headers"]["x-goog-if-generation-match"] = generation
+
+        events = self.s3.meta.events
+        events.register("before-call.s3.PutObject", add_generation_header)
+        try:
+            self.s3.put_object(
+                Bucket=self.bucket, Key=self.prefix + name, Body=body, **kwargs
+            )
+        except self.s3.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] in (
+                "PreconditionFailed",
+                "ConditionalRequestConflict",
+                "412",
+                "409",
+            ):
+                raise ConflictError(f"{name} was changed by another push") from e
+            raise
+        finally:
+            events.unregister("before-call.s3.PutObject", add_generation_header)
+        self.bytes_up += len(body)
+
+    def upload_file(self, name: str, path: Path) -> None:
+        """Upload a file, in parallel parts when it is large."""
+        from boto3.s3.transfer import TransferConfig
+
+        config = TransferConfig(
+            multipart_threshold=MULTIPART_THRESHOLD,
+            multipart_chunksize=MULTIPART_THRESHOLD,
+        )
+        self.s3.upload_file(str(path), self.bucket, self.prefix + name, Config=config)
+        self.bytes_up += path.stat().st_size
+
+    def download_file(self, name: str, path: Path) -> bool:
+        """Download an object to ``path``; False if it doesn't exist."""
+        from boto3.s3.transfer import TransferConfig
+
+        config = TransferConfig(
+            multipart_threshold=MULTIPART_THRESHOLD,
+            multipart_chunksize=MULTIPART_THRESHOLD,
+        )
+        try:
+            self.s3.download_file(
+                self.bucket, self.prefix + name, str(path), Config=config
+            )
+        except self.s3.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return False
+            raise
+        self.bytes_down += path.stat().st_size
+        return True
+
+    def etag(self, name: str) -> str | None:
+        """An object's ETag without quotes, or None if it doesn't exist."""
+        try:
+            response = self.s3.head_object(Bucket=self.bucket, Key=self.prefix + name)
+        except self.s3.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return None
+            raise
+        return response["ETag"].strip('"')
+
+    def delete(self, name: str) -> None:
+        self.s3.delete_object(Bucket=self.bucket, Key=self.prefix + name)
+
+    def list(self, prefix: str) -> set[str]:
+        """Names (relative to ``prefix``) of the objects under ``prefix``."""
+        names = set()
+        paginator = self.s3.get_paginator("list_objects_v2")
+        full_prefix = self.prefix + prefix
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=full_prefix):
+            for obj in page.get("Contents", []):
+                names.add(obj["Key"][len(full_prefix) :])
+        return names
+
+
+class SyncResult:
+    """What a push or pull did."""
+
+    def __init__(self, action: str, detail: str):
+        self.action = action  # "snapshot", "changeset", "skipped" or "missing"
+        self.detail = detail
+
+
+class StaleManifestError(Exception):
+    """The remote changed under a pull (a new base was pushed meanwhile)."""
+
+
+class CorruptDownloadError(Exception):
+    """A downloaded base failed its checksum or integrity check."""
+
+
+class ArchiveConflictError(Exception):
+    """An archive file's name is taken remotely by different contents."""
+
+
+class ConflictError(Exception):
+    """Another push updated the manifest first."""
+
+
+def _check_same_archive(store: RemoteStore, name: str, body: bytes) -> None:
+    # A single-part upload's ETag is its MD5; download only if that doesn't match
+    if store.etag(name) == hashlib.md5(body).hexdigest():
+        return
+    if store.get(name) != body:
+        raise ArchiveConflictError(
+            f"{name} already exists remotely with different contents; "
+            "not pushing the database changes that point at the local file"
+        )
+
+
+def push_archives(store: RemoteStore, archive_dir: Path, prefix: str) -> list[str]:
+    """Upload the archive files the bucket doesn't have yet; returns their names.
+
+    Archive names are unique and files never change, so a name that already
+    exists remotely must hold the same bytes. Raises ArchiveConflictError if
+    it doesn't, which stops the push before any DB changes point at the file.
+    """
+    if not archive_dir.exists():
+        return []
+    remote = store.list(prefix)
+    uploaded = []
+    for path in sorted(archive_dir.glob("*.jsonl.gz")):
+        body = path.read_bytes()
+        if path.name in remote:
+            _check_same_archive(store, prefix + path.name, body)
+            continue
+        try:
+            store.put_if(prefix + path.name, body, None)
+        except ConflictError:
+            # Uploaded by someone else since the listing
+            _check_same_archive(store, prefix + path.name, body)
+            continue
+        uploaded.append(path.name)
+    return uploaded
+
+
+def encode_changeset(changeset: dict) -> bytes:
+    """Serialize a changeset from ``db.export_changes`` for upload."""
+    data = json.dumps(changeset, separators=(",", ":")).encode("utf-8")
+    return gzip.compress(data, mtime=0)
+
+
+def decode_changeset(data: bytes) -> dict:
+    return json.loads(gzip.decompress(data))
+
+
+def compress_file(src: Path, dst: Path) -> str:
+    """Gzip ``src`` into ``dst`` in chunks; return the SHA-256 of ``src``."""
+    digest = hashlib.sha256()
+    with open(src, "rb") as fin, open(dst, "wb") as raw:
+        # Level 6: nearly level 9's ratio on SQLite pages at a fraction of the CPU
+        with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0) as gz:
+            for chunk in iter(lambda: fin.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+                gz.write(chunk)
+    return digest.hexdigest()
+
+
+def decompress_file(src: Path, dst: Path) -> str:
+    """Gunzip ``src`` into ``dst`` in chunks; return the SHA-256 of the output.
+
+    Raises CorruptDownloadError if ``src`` is truncated or not gzip.
+    """
+    digest = hashlib.sha256()
+    try:
+        with gzip.open(src, "rb") as gz, open(dst, "wb") as fout:
+            for chunk in iter(lambda: gz.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+                fout.write(chunk)
+    except (EOFError, gzip.BadGzipFile, zlib.error) as e:
+        raise CorruptDownloadError(f"{src.name}: {e}") from e
+    return digest.hexdigest()
+
+
+def sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _load_manifest(store: RemoteStore) -> tuple[dict | None, ObjectVersion | None]:
+    data, version = store.get_versioned(MANIFEST_NAME)
+    if data is None:
+        return None, None
+    manifest = json.loads(data)
+    if manifest.get("format") != MANIFEST_FORMAT:
+        raise ValueError(f"Unsupported manifest format: {manifest.get('format')!r}")
+    return manifest, version
+
+
+def _put_manifest(
+    store: RemoteStore, manifest: dict, version: ObjectVersion | None
+) -> None:
+    """Publish ``manifest`` unless the remote one changed since ``version``."""
+    store.put_if(MANIFEST_NAME, json.dumps(manifest, indent=2).encode("utf-8"), version)
+
+
+def _unique_name(prefix: str, suffix: str) -> str:
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    return f"{prefix}{stamp}-{uuid.uuid4().hex[:8]}{suffix}"
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _check_sqlite(path: Path) -> None:
+    """Raise CorruptDownloadError unless ``path`` is an intact SQLite database."""
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            result = conn.execute("PRAGMA quick_check").fetchone()[0]
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError as e:
+        raise CorruptDownloadError(f"{path.name}: {e}") from e
+    if result != "ok":
+        raise CorruptDownloadError(f"{path.name}: quick_check says {result}")
+
+
+def _fetch_base(
+    store: RemoteStore, name: str, expected_sha256: str | None
+) -> Path | None:
+    """Download and verify a base snapshot next to the local DB.
+
+    Returns the path of the verified, uncompressed copy (ready for
+    ``_install_local_db``), or None if the object doesn't exist. The expected
+    hash comes from the manifest; the sidecar is checked too when present.
+    """
+    path = db.get_db_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    download = path.with_name(f".{Path(name).name}.download")
+    verified = path.with_name(f".{path.name}.verified")
+    try:
+        if not store.download_file(name, download):
+            return None
+        if name.endswith(".gz"):
+            digest = decompress_file(download, verified)
+        else:
+            os.replace(download, verified)
+            digest = sha256_file(verified)
+        sidecar = store.get(name + ".sha256")
+        for expected in (expected_sha256, sidecar and sidecar.split()[0].decode()):
+            if expected and expected != digest:
+                raise CorruptDownloadError(
+                    f"{name}: SHA-256 {digest[:12]}… doesn't match {expected[:12]}…"
+                )
+        _check_sqlite(verified)
+    except BaseException:
+        verified.unlink(missing_ok=True)
+        raise
+    finally:
+        download.unlink(missing_ok=True)
+    return verified
+
+
+def _install_local_db(verified: Path) -> None:
+    """Atomically swap a verified download in as the local database file."""
+    path = db.get_db_path()
+    with open(verified, "rb") as f:
+        os.fsync(f.fileno())
+    db.close()
+    # A WAL left over from the previous local DB must not be replayed onto the new one
+    for suffix in ("-wal", "-shm"):
+        path.with_name(path.name + suffix).unlink(missing_ok=True)
+    os.replace(verified, path)
+
+
+def _apply_changesets(store: RemoteStore, manifest: dict) -> tuple[int, int]:
+    """Apply the manifest's changesets not yet applied locally.
+
+    Returns: (changesets applied, decisions added)
+    """
+    applied = db.get_applied_changesets()
+    count = added = 0
+    for name in manifest["changesets"]:
+        if name in applied:
+            continue
+        data = store.get(name)
+        if data is None:
+            raise StaleManifestError(f"changeset {name} is gone")
+        with db.transaction():
+            added += db.apply_changes(decode_changeset(data))
+            db.mark_changeset_applied(name)
+        count += 1
+    return count, added
+
+
+def _rebase(store: RemoteStore, manifest: dict, keep_unsynced: bool) -> str:
+    """Replace the local DB with the remote base, then replay local changes.
+
+    Local changes not yet pushed are exported first and re-applied (and
+    re-queued) on top of the remote state: decisions merge by uid and by
+    (guid, processed_at, decision), deletions by guid. With
+    ``keep_unsynced``, a database that was never synced treats all of its
+    rows as local changes instead of being overwritten.
+    """
+    verified = _fetch_base(
+        store, manifest.get("base", LEGACY_BASE_NAME), manifest["base_sha256"]
+    )
+    if verified is None:
+        raise StaleManifestError("base snapshot is gone")
+
+    local = None
+    local_tables: dict[str, list[dict]] = {}
+    if db.get_db_path().exists():
+        db.init_db()
+        if keep_unsynced and db.get_sync_meta("base_sha256") is None:
+            db.queue_all_changes()
+        local = db.export_changes()
+        local_tables = db.export_local_tables()
+
+    size = verified.stat().st_size
+    _install_local_db(verified)
+    db.init_db()
+    db.reset_sync_state(manifest["base_sha256"])
+    count, added = _apply_changesets(store, manifest)
+    # Queued posts and unfinished calendar writes belong to this machine
+    db.import_local_tables(local_tables)
+    note = (
+        f"downloaded base snapshot ({size:,} bytes uncompressed); "
+        f"applied {count} changeset(s) with {added} new decision(s)"
+    )
+    if local is not None:
+        with db.transaction():
+            db.apply_changes(local)
+            db.requeue(local["outbox"])
+        note += f"; kept {len(local['outbox'])} unpushed local change(s)"
+    return note
+
+
+# ---------------------------------------------------------------------------
+# Push
+# ---------------------------------------------------------------------------
+
+
+def push(store: RemoteStore, snapshot: bool = False) -> SyncResult:
+    """Upload local changes; ``snapshot`` forces a new base snapshot.
+
+    The manifest is only ever replaced with a conditional write. When another
+    run got there first, the remote changes are merged in (see ``_rebase``)
+    and the push is retried, so overlapping runs never drop each other's rows.
+    """
+    db.init_db()
+    notes = []
+    for _ in range(PUSH_ATTEMPTS):
+        manifest, version = _load_manifest(store)
+        try:
+            if manifest is not None and (
+                db.get_sync_meta("base_sha256") != manifest["base_sha256"]
+            ):
+                notes.append(_rebase(store, manifest, keep_unsynced=True))
+            if (
+                snapshot
+                or manifest is None
+                or len(manifest["changesets"]) >= MAX_CHANGESETS
+            ):
+                result = _push_snapshot(store, manifest, version)
+            else:
+                result = _push_changeset(store, manifest, version)
+        except (ConflictError, StaleManifestError, CorruptDownloadError) as e:
+            notes.append(f"retrying: {e}")
+            continue
+        if notes:
+            result.detail += " (" + "; ".join(notes) + ")"
+        return result
+    raise ConflictError(
+        f"Remote database kept changing during {PUSH_ATTEMPTS} push attempts"
+    )
+
+
+def _push_changeset(
+    store: RemoteStore, manifest: dict, version: ObjectVersion | None
+) -> SyncResult:
+    changeset = db.export_changes()
+    if changeset is None:
+        return SyncResult("skipped", "No local changes since the last push")
+
+    name = _unique_name(CHANGESET_PREFIX, ".json.gz")
+    store.put(name, encode_changeset(changeset))
+    try:
+        _put_manifest(
+            store,
+            {**manifest, "changesets": manifest["changesets"] + [name]},
+            version,
+        )
+    except ConflictError:
+        store.delete(name)
+        raise
+    with db.transaction():
+        db.clear_outbox(changeset["outbox"])
+        db.mark_changeset_applied(name)
+    return SyncResult(
+        "changeset",
+        f"Uploaded {name} ({len(changeset['decisions'])} decision(s), "
+        f"{len(changeset['deleted'])} deletion(s), "
+        f"{len(changeset['archived'])} archived post(s))",
+    )
+
+
+def _push_snapshot(
+    store: RemoteStore, manifest: dict | None, version: ObjectVersion | None
+) -> SyncResult:
+    # The new base must include every changeset it replaces
+    if manifest is not None:
+        _apply_changesets(store, manifest)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / LEGACY_BASE_NAME
+        db.connect().execute("VACUUM INTO ?", (str(path),))
+        # The base carries no sync state of its own; pull records it
+        conn = sqlite3.connect(path)
+        with conn:
+            conn.execute("DELETE FROM sync_outbox")
+            conn.execute("DELETE FROM sync_applied")
+            conn.execute("DELETE FROM sync_meta")
+            for table in db.LOCAL_TABLES:
+                conn.execute(f"DELETE FROM {table}")
+        conn.close()
+        raw_bytes = path.stat().st_size
+        compressed = Path(tmp) / "base.db.gz"
+        digest = compress_file(path, compressed)
+
+        if (
+            manifest is not None
+            and manifest["base_sha256"] == digest
+            and not manifest["changesets"]
+        ):
+            db.reset_sync_state(digest)
+            return SyncResult("skipped", "Base snapshot matches the remote copy")
+
+        name = _unique_name(BASE_PREFIX, ".db.gz")
+        store.upload_file(name, compressed)
+        compressed_bytes = compressed.stat().st_size
+
+    store.put(name + ".sha256", f"{digest}  {LEGACY_BASE_NAME}\n".encode())
+    try:
+        _put_manifest(
+            store,
+            {
+                "format": MANIFEST_FORMAT,
+                "base": name,
+                "base_sha256": digest,
+                "base_bytes": raw_bytes,
+                "base_compressed_bytes": compressed_bytes,
+                "base_created_at": _now(),
+                "changesets": [],
+            },
+            version,
+        )
+    except ConflictError:
+        store.delete(name)
+        store.delete(name + ".sha256")
+        raise
+    db.reset_sync_state(digest)
+
+    # Superseded by the new base; pulls still holding the old manifest retry
+    if manifest is not None:
+        old_base = manifest.get("base", LEGACY_BASE_NAME)
+        for old in [old_base, old_base + ".sha256", *manifest["changesets"]]:
+            store.delete(old)
+    return SyncResult(
+        "snapshot",
+        f"Uploaded base snapshot ({compressed_bytes:,} bytes, "
+        f"{raw_bytes:,} uncompressed)",
+    )
+
+
+# ---------------------------------------------------------------------------
+# Pull
+# ---------------------------------------------------------------------------
+
+
+def pull(store: RemoteStore) -> SyncResult:
+    """Bring the local database up to date with the remote copy.
+
+    Local changes that haven't been pushed yet are kept.
+    """
+    for _ in range(PULL_ATTEMPTS):
+        manifest, _version = _load_manifest(store)
+        if manifest is None:
+            return _pull_legacy(store)
+        try:
+            return _pull_manifest(store, manifest)
+        except (StaleManifestError, CorruptDownloadError):
+            # Most likely a new base landed mid-download; start over
+            continue
+    raise StaleManifestError(
+        f"Remote database changed or failed verification on each of "
+        f"{PULL_ATTEMPTS} pull attempts"
+    )
+
+
+def _pull_legacy(store: RemoteStore) -> SyncResult:
+    """Whole-file download for buckets pushed before manifests existed."""
+    verified = _fetch_base(store, LEGACY_BASE_NAME, None)
+    if verified is None:
+        return SyncResult("missing", "No remote database found, starting fresh")
+    size = verified.stat().st_size
+    _install_local_db(verified)
+    return SyncResult("snapshot", f"Downloaded database ({size:,} bytes)")
+
+
+def _pull_manifest(store: RemoteStore, manifest: dict) -> SyncResult:
+    local_base = None
+    if db.get_db_path().exists():
+        db.init_db()
+        local_base = db.get_sync_meta("base_sha256")
+
+    if local_base != manifest["base_sha256"]:
+        detail = _rebase(store, manifest, keep_unsynced=False)
+        return SyncResult("snapshot", detail[0].upper() + detail[1:])
+
+    count, added = _apply_changesets(store, manifest)
+    if count == 0:
+        return SyncResult("skipped", "Already up to date")
+    return SyncResult(
+        "changeset", f"Applied {count} changeset(s) with {added} new decision(s)"
+    )
@@ -0,0 +1,224 @@
+"""Replay historical posts to check decision quality and cost (``calsync eval``).
+
+A sample of posts from the DB is run through the pre-filter and analysis
+again, in dry-run mode, under each configuration. Every replay is compared
+with the decisions recorded for the post: do the actions match, and do the
+events' dates and times? Per configuration, that gives agreement rates next
+to the cost and latency per post, so a cheaper or faster setting (or a
+prompt change) can be checked before it ships.
+
+A replay sees the time the post was first analyzed as the current time, and
+calendar searches leave out the events that first analysis created, so the
+post can be decided again rather than found as a duplicate. Searches
+otherwise see today's calendar, so posts about events that were changed
+since may disagree for that reason alone.
+
+Replays record their decisions like ``process --dry-run`` does; the caller
+points the DB at a scratch file first (see ``cli.eval_cmd``).
+"""
+
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable
+
+from . import calendar, claude, db, prefilter, responsecache, rss
+from .latency import percentile
+from .models import Action, RssPost
+
+
+class Config:
+    """One combination of the settings `process` can run with."""
+
+    def __init__(
+        self,
+        name: str,
+        route: bool = True,
+        use_prefilter: bool = True,
+        prefilter_model: str = prefilter.PREFILTER_MODEL,
+    ):
+        self.name = name
+        self.route = route
+        self.use_prefilter = use_prefilter
+        self.prefilter_model = prefilter_model
+
+
+CONFIGS = {
+    config.name: config
+    for config in [
+        Config("default"),
+        Config("no-route", route=False),
+        Config("no-prefilter", use_prefilter=False),
+        Config("fast-prefilter", prefilter_model=claude.FAST_MODEL),
+    ]
+}
+
+
+class Case:
+    """A historical post and the decisions recorded for it."""
+
+    def __init__(self, rows: list[dict]):
+        first = rows[0]
+        content = first["post_content"] or ""
+        self.post = RssPost(
+            guid=first["post_guid"],
+            title=first["post_title"] or "",
+            link=first["post_link"] or "",
+            content=content,
+            author=first["post_author"],
+            published=(
+                datetime.fromisoformat(first["post_time"])
+                if first["post_time"]
+                else None
+            ),
+            image_urls=rss.extract_image_urls(content),
+            extra=json.loads(first["post_extra"]) if first["post_extra"] else {},
+        )
+        self.analyzed_at = datetime.fromisoformat(first["processed_at"])
+        self.actions = {row["decision"] for row in rows}
+        self.when = {
+            (row["event_date"], row["event_time"]) for row in rows if row["event_date"]
+        }
+        self.cost_usd = sum(row["cost_usd"] or 0.0 for row in rows)
+        self.created_ids = {
+            row["calendar_event_id"]
+            for row in rows
+            if row["decision"] == Action.CREATE.value and row["calendar_event_id"]
+        }
+
+
+def sample_cases(size: int, seed: int = 0, since: str | None = None) -> list[Case]:
+    """``size`` posts picked at random (repeatably, by ``seed``) from the DB."""
+    guids = db.get_post_guids(since)
+    picked = random.Random(seed).sample(guids, min(size, len(guids)))
+    return [Case(rows) for guid in picked if (rows := db.get_processed(guid))]
+
+
+class Replay:
+    """What one configuration decided for one case."""
+
+    def __init__(self, case: Case, config: Config):
+        self.case = case
+        self.config = config
+        self.actions: set[str] = set()
+        self.when: set[tuple[str, str | None]] = set()
+        self.cost_usd = 0.0
+        self.seconds = 0.0
+        self.prefiltered = False
+        self.escalated = False
+        self.error: str | None = None
+
+    @property
+    def actions_agree(self) -> bool:
+        return self.error is None and self.actions == self.case.actions
+
+    @property
+    def when_agrees(self) -> bool | None:
+        """Whether the events' dates and times match; None if none were recorded."""
+        if not self.case.when:
+            return None
+        return self.error is None and self.when == self.case.when
+
+
+def replay(case: Case, config: Config) -> Replay:
+    """Decide ``case``'s post again under ``config``, without changing the calendar.
+
+    ``seconds`` is the replay's wall time plus the recorded duration of the
+    model calls answered from the response cache.
+    """
+    result = Replay(case, config)
+    cache = responsecache.active()
+    if cache is not None:
+        cache.replayed_seconds()  # drop anything an earlier failure left
+    start = time.monotonic()
+    try:
+        _decide(result)
+    except Exception as e:
+        result.error = str(e) or type(e).__name__
+    result.seconds = time.monotonic() - start
+    if cache is not None:
+        result.seconds += cache.replayed_seconds()
+    return result
+
+
+def _decide(result: Replay) -> None:
+    case, config = result.case, result.config
+    if config.use_prefilter:
+        try:
+            pf = prefilter.prefilter_post(
+                case.post, model=config.prefilter_model, now=case.analyzed_at
+            )
+        except Exception:
+            pf = None  # like process: analyze the post if the pre-filter fails
+        if pf is not None:
+            result.cost_usd += pf.cost_usd
+            if not pf.is_likely_event:
+                result.prefiltered = True
+                result.actions = {Action.IGNORE.value}
+                return
+
+    # Replays run on worker threads, so each needs its own Calendar connection
+    ctx = calendar.on_own_connection(
+        claude.analyze_post,
+        case.post,
+        dry_run=True,
+        route=config.route,
+        now=case.analyzed_at,
+        hidden_event_ids=case.created_ids,
+    )
+    result.cost_usd += ctx.cost_usd
+    result.escalated = ctx.escalation is not None
+    result.actions = {d.action.value for d in ctx.decisions}
+    result.when = {(d.event.date, d.event.time) for d in ctx.decisions if d.event}
+
+
+def run_eval(
+    cases: list[Case],
+    configs: list[Config],
+    parallelism: int = 4,
+    on_replay: Callable[[Replay], None] | None = None,
+) -> dict[str, list[Replay]]:
+    """Replay every case under every config, ``parallelism`` at a time.
+
+    Returns each config's replays, in ``cases`` order.
+    """
+
+    def run(case: Case, config: Config) -> Replay:
+        result = replay(case, config)
+        if on_replay is not None:
+            on_replay(result)
+        return result
+
+    with ThreadPoolExecutor(max_workers=parallelism) as pool:
+        futures = {
+            config.name: [pool.submit(run, case, config) for case in cases]
+            for config in configs
+        }
+        return {name: [f.result() for f in fs] for name, fs in futures.items()}
+
+
+class Summary:
+    """Agreement, cost and latency of one configuration's replays."""
+
+    def __init__(self, replays: list[Replay]):
+        self.posts = len(replays)
+        self.errors = sum(r.error is not None for r in replays)
+        self.prefiltered = sum(r.prefiltered for r in replays)
+        self.escalated = sum(r.escalated for r in replays)
+        self.action_agreement = (
+            sum(r.actions_agree for r in replays) / self.posts if self.posts else 0.0
+        )
+        dated = [r.when_agrees for r in replays if r.when_agrees is not None]
+        self.dated = len(dated)
+        self.when_agreement = sum(dated) / len(dated) if dated else None
+        self.cost_per_post = (
+            sum(r.cost_usd for r in replays) / self.posts if self.posts else 0.0
+        )
+        self.recorded_cost_per_post = (
+            sum(r.case.cost_usd for r in replays) / self.posts if self.posts else 0.0
+        )
+        seconds = [r.seconds for r in replays]
+        self.p50 = percentile(seconds, 50) if seconds else 0.0
+        self.p95 = percentile(seconds, 95) if seconds else 0.0
@@ -2,6 +2,7 @@
 
 import re
 from datetime import datetime, timedelta, timezone
+from pathlib import Path
 from zoneinfo import ZoneInfo
 
 import json
@@ -53,7 +54,7 @@ def _fetch_single_events(time_min: str, time_max: str) -> list[dict]:
 
     while True:
         kwargs: dict = {
-            "calendarId": calendar.CALENDAR_ID,
+            "calendarId": calendar.get_calendar_id(),
             "timeMin": time_min,
             "timeMax": time_max,
             "singleEvents": True,
@@ -62,7 +63,7 @@ def _fetch_single_events(time_min: str, time_max: str) -> list[dict]:
         if page_token:
             kwargs["pageToken"] = page_token
 
-        result = service.events().list(**kwargs).execute()
+        result = calendar.execute(service.events().list(**kwargs))
         all_items.extend(result.get("items", []))
 
         page_token = result.get("nextPageToken")
@@ -85,7 +86,7 @@ def _fetch_non_recurring_events(time_min: str) -> list[dict]:
 
     while True:
         kwargs: dict = {
-            "calendarId": calendar.CALENDAR_ID,
+            "calendarId": calendar.get_calendar_id(),
             "timeMin": time_min,
             "singleEvents": False,
             "orderBy": "updated",
@@ -93,7 +94,7 @@ def _fetch_non_recurring_events(time_min: str) -> list[dict]:
         if page_token:
             kwargs["pageToken"] = page_token
 
-        result = service.events().list(**kwargs).execute()
+        result = calendar.execute(service.events().list(**kwargs))
         all_items.extend(result.get("items", []))
 
         page_token = result.get("nextPageToken")
@@ -309,3 +310,16 @@ def build_events_json() -> list[dict]:
     _attach_metadata(merged)
 
     return merged
+
+
+def write_events_json(path: Path) -> int:
+    """Build the events export and write it to ``path``; return the event count.
+
+    Written to a temp file and renamed so the site never serves a partial file.
+    """
+    events = build_events_json()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(json.dumps(events, indent=2, default=str))
+    tmp_path.replace(path)
+    return len(events)
@@ -0,0 +1,250 @@
+"""Push-based ingestion: a WebSub/webhook receiver that feeds the ingest queue.
+
+Polling bounds latency by the poll interval and spends a request per feed
+even when nothing changed. Instead, a publisher (a WebSub hub, rssglue, or
+anything that can POST) can push new items to us:
+
+- ``POST /websub``: a WebSub content notification. The body is the feed
+  document itself (RSS or Atom); the topic comes from the ``Link: <...>;
+  rel="self"`` header or a ``?topic=`` query parameter.
+- ``GET /websub``: WebSub subscription verification (echoes ``hub.challenge``).
+- ``POST /webhook``: JSON ``{"feed_url": ..., "items": [...]}``. Items use
+  JSON Feed field names (``id``, ``url``, ``title``, ``content_html``,
+  ``date_published``, ``authors``, ``image``); the RSS names ``guid``,
+  ``link``, ``content``/``description``, ``published`` and ``author`` work too.
+
+Both bodies go through the same parsing as a polled feed (``rss.entry_to_post``)
+and land in the ``ingest_queue`` table, which ``calsync process`` drains
+along with whatever it polls. With a ``secret``, requests must carry an
+``X-Hub-Signature`` (or ``X-Hub-Signature-256``) HMAC of the body.
+"""
+
+import hashlib
+import hmac
+import json
+import re
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable
+from urllib.parse import parse_qs, urlsplit
+
+import feedparser
+
+from . import db, rss
+
+# Larger bodies are rejected with 413 rather than parsed
+MAX_BODY_BYTES = 5 * 1024 * 1024
+
+_LINK_SELF_RE = re.compile(r'<([^>]+)>\s*;\s*rel="?self"?', re.IGNORECASE)
+
+
+class IngestError(Exception):
+    """A notification that can't be accepted; carries the HTTP status to return."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def verify_signature(secret: str, header: str | None, body: bytes) -> bool:
+    """Check a WebSub-style ``method=hexdigest`` HMAC signature header."""
+    if not header or "=" not in header:
+        return False
+    method, _, signature = header.partition("=")
+    if method not in ("sha1", "sha256", "sha512"):
+        return False
+    expected = hmac.new(secret.encode(), body, getattr(hashlib, method)).hexdigest()
+    return hmac.compare_digest(expected, signature.strip().lower())
+
+
+def _parse_datetime(value) -> datetime | None:
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            dt = parsedate_to_datetime(str(value))
+        except (TypeError, ValueError):
+            return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+def _json_item_to_entry(item: dict) -> feedparser.FeedParserDict:
+    """Shape a JSON item like a feedparser entry so ``rss.entry_to_post`` reads it."""
+    entry = feedparser.FeedParserDict()
+    guid = item.get("id") or item.get("guid") or item.get("url") or item.get("link")
+    if not guid:
+        raise IngestError(400, "every item needs an id, guid, url or link")
+    entry["id"] = str(guid)
+    entry["link"] = item.get("url") or item.get("link") or ""
+    entry["title"] = item.get("title") or ""
+    content = (
+        item.get("content_html")
+        or item.get("content")
+        or item.get("content_text")
+        or item.get("description")
+        or item.get("summary")
+    )
+    if content:
+        entry["summary"] = content
+    published = _parse_datetime(item.get("date_published") or item.get("published"))
+    if published:
+        entry["published_parsed"] = published.astimezone(timezone.utc).timetuple()
+    authors = item.get("authors") or []
+    author = item.get("author")
+    if isinstance(author, dict):
+        author = author.get("name")
+    if not author and authors and isinstance(authors[0], dict):
+        author = authors[0].get("name")
+    if author:
+        entry["author"] = author
+    images = [item["image"]] if item.get("image") else []
+    images += item.get("image_urls") or []
+    if images:
+        # feedparser derives ``enclosures`` from rel="enclosure" links
+        entry["links"] = [
+            feedparser.FeedParserDict(rel="enclosure", href=url, type="image/*")
+            for url in images
+        ]
+    for key, value in item.items():
+        if key.startswith("rssglue_"):
+            entry[key] = value
+    return entry
+
+
+def parse_websub(body: bytes, topic: str, content_type: str = "") -> list:
+    """Posts carried by a WebSub content notification."""
+    return rss.parse_feed_content(body, topic, content_type=content_type).posts
+
+
+def parse_webhook(body: bytes) -> tuple[str | None, list]:
+    """Feed URL and posts carried by a JSON webhook body."""
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise IngestError(400, "body is not valid JSON")
+    if not isinstance(payload, dict) or not isinstance(payload.get("items"), list):
+        raise IngestError(400, 'expected an object with an "items" list')
+    feed_url = payload.get("feed_url")
+    posts = rss.parse_entries([_json_item_to_entry(i) for i in payload["items"]])[0]
+    for post in posts:
+        post.extra["source_feed_url"] = feed_url or "webhook"
+    return feed_url, posts
+
+
+class Receiver:
+    """Handles receiver requests; plugged into the ``serve`` HTTP server.
+
+    ``on_enqueue`` is called after new posts are queued, e.g. to wake the
+    serve loop so they are processed right away instead of at the next poll.
+    """
+
+    PATHS = ("/websub", "/webhook")
+
+    def __init__(
+        self,
+        secret: str | None = None,
+        on_enqueue: Callable[[int], None] | None = None,
+    ):
+        self.secret = secret
+        self.on_enqueue = on_enqueue
+        self.max_body_bytes = MAX_BODY_BYTES
+        self.notifications = 0
+        self.rejected = 0
+        self.posts_received = 0
+        self.posts_queued = 0
+
+    def counters(self) -> dict:
+        """Receiver counters for ``/metrics``."""
+        return {
+            "push_notifications": self.notifications,
+            "push_rejected": self.rejected,
+            "push_posts_received": self.posts_received,
+            "push_posts_queued": self.posts_queued,
+        }
+
+    def handles(self, path: str) -> bool:
+        return urlsplit(path).path in self.PATHS
+
+    def handle_get(self, path: str) -> tuple[int, bytes]:
+        """WebSub intent verification: echo the challenge."""
+        query = parse_qs(urlsplit(path).query)
+        mode = (query.get("hub.mode") or [""])[0]
+        challenge = (query.get("hub.challenge") or [""])[0]
+        if mode in ("subscribe", "unsubscribe") and challenge:
+            return 200, challenge.encode()
+        return 400, b"expected hub.mode and hub.challenge\n"
+
+    def handle_post(self, path: str, headers, body: bytes) -> tuple[int, bytes]:
+        """Parse and queue a notification; returns (status, JSON body)."""
+        try:
+            queued = self._accept(path, headers, body)
+        except IngestError as e:
+            self.rejected += 1
+            return e.status, json.dumps({"error": str(e)}).encode()
+        return 202, json.dumps({"queued": queued}).encode()
+
+    def _accept(self, path: str, headers, body: bytes) -> int:
+        if len(body) > self.max_body_bytes:
+            raise IngestError(413, "body too large")
+        if self.secret:
+            signature = headers.get("X-Hub-Signature-256") or headers.get(
+                "X-Hub-Signature"
+            )
+            if not verify_signature(self.secret, signature, body):
+                raise IngestError(403, "bad or missing signature")
+
+        parts = urlsplit(path)
+        if parts.path == "/websub":
+            topic = (parse_qs(parts.query).get("topic") or [None])[0]
+            if not topic:
+                match = _LINK_SELF_RE.search(headers.get("Link") or "")
+                topic = match.group(1) if match else None
+            if not topic:
+                raise IngestError(400, 'no topic (Link rel="self" or ?topic=)')
+            source = topic
+            posts = parse_websub(body, topic, headers.get("Content-Type") or "")
+        else:
+            source, posts = parse_webhook(body)
+
+        queued = db.enqueue_posts(posts, source=source)
+        self.notifications += 1
+        self.posts_received += len(posts)
+        self.posts_queued += queued
+        if queued and self.on_enqueue:
+            self.on_enqueue(queued)
+        return queued
+
+
+def latencies(rows: list[dict], now: datetime | None = None) -> list[tuple]:
+    """(seconds since received, seconds since published or None) per finished row."""
+    now = now or datetime.now(timezone.utc)
+    result = []
+    for row in rows:
+        received = _parse_datetime(row["received_at"])
+        published = _parse_datetime(row["published_at"])
+        result.append(
+            (
+                (now - received).total_seconds() if received else None,
+                (now - published).total_seconds() if published else None,
+            )
+        )
+    return result
+
+
+def format_latencies(pairs: list[tuple]) -> str:
+    """Summarize ``latencies`` output as p50/max for queue→decision and post→decision."""
+    parts = []
+    for label, values in (
+        ("queue→decision", [q for q, _ in pairs if q is not None]),
+        ("post→decision", [p for _, p in pairs if p is not None]),
+    ):
+        if values:
+            values = sorted(values)
+            parts.append(
+                f"{label} p50 {values[len(values) // 2]:.1f}s, max {values[-1]:.1f}s"
+            )
+    return "; ".join(parts) or "no timestamps"
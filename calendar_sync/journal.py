@@ -0,0 +1,334 @@
+"""Write-ahead journal for calendar writes.
+
+Calendar writes used to be sent first and the decision recorded after. A
+crash or timeout in between left an event on the calendar with no record of
+it, so the next run analyzed the post again (a whole agent session) and
+created the event a second time.
+
+Now each create/update/cancel is journaled together with the decision it
+belongs to before the API call. Once the call succeeds, the decision is
+recorded and the journal row removed in one transaction. ``reconcile()``
+runs before each ``process`` pass. For every row left behind it checks the
+calendar, sends the write only if it hadn't landed, and records the
+decision. The model is never asked about that post again.
+
+With ``defer()`` the journal doubles as the run's write queue: writes are
+only journaled while posts are analyzed, and ``flush()`` sends them all at
+the end of the run through the batch endpoint (see batching.py). Event ids
+are chosen by us (``calendar.event_id_for``), so the model gets the id of an
+event it creates right away, and ``overlay_pending()`` shows queued writes
+in its calendar searches.
+"""
+
+import hashlib
+import json
+from typing import Callable, cast
+
+from . import calendar, db
+from .models import Action, CalendarEvent, EventDetails
+
+# Writes that go through the journal
+JOURNALED_ACTIONS = (Action.CREATE, Action.UPDATE, Action.CANCEL)
+
+
+class ReconcileResult:
+    """Outcome of replaying the journal."""
+
+    def __init__(self):
+        # Writes that had landed before the crash; only the decision was missing
+        self.already_applied = 0
+        # Writes that hadn't landed and were sent again
+        self.replayed = 0
+        # Still pending (the calendar couldn't be reached, ...)
+        self.failed = 0
+        self.errors: list[str] = []
+
+    @property
+    def completed(self) -> int:
+        return self.already_applied + self.replayed
+
+
+def intent_key(post_guid: str, action: Action, event_id: str, event) -> str:
+    """Idempotency key: the same write for the same post always maps to one intent."""
+    details = event.model_dump_json() if event else ""
+    key = f"{post_guid}|{action.value}|{event_id}|{details}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def _dump_record(record: db.ProcessedRecord) -> str:
+    event = record.get("event")
+    return json.dumps(
+        {
+            **record,
+            "decision": record["decision"].value,
+            "event": event.model_dump() if event else None,
+        }
+    )
+
+
+def _load_record(record_json: str) -> db.ProcessedRecord:
+    record = json.loads(record_json)
+    record["decision"] = Action(record["decision"])
+    if record.get("event"):
+        record["event"] = EventDetails(**record["event"])
+    return cast(db.ProcessedRecord, record)
+
+
+def _http_status(error: Exception) -> int | None:
+    resp = getattr(error, "resp", None)
+    return getattr(resp, "status", None)
+
+
+def _was_rejected(error: Exception) -> bool:
+    """Whether the API refused the write outright, so nothing was changed."""
+    status = _http_status(error)
+    return status is not None and 400 <= status < 500 and status not in (408, 429)
+
+
+def _send(action: Action, event_id: str, event: EventDetails | None) -> str:
+    if action == Action.CREATE:
+        assert event is not None
+        return calendar.create_event(event, event_id=event_id)
+    if action == Action.UPDATE:
+        assert event is not None
+        return calendar.update_event(event_id, event)
+    calendar.delete_event(event_id)
+    return event_id
+
+
+def _complete(
+    intent_id: int, record: db.ProcessedRecord, calendar_event_id: str
+) -> None:
+    record = record.copy()
+    record["calendar_event_id"] = calendar_event_id
+    with db.transaction():
+        db.record_processed(**record)
+        db.remove_intent(intent_id)
+
+
+def execute(
+    action: Action,
+    event_id: str,
+    event: EventDetails | None,
+    record: db.ProcessedRecord,
+) -> str:
+    """Journal a calendar write, send it, and record its decision.
+
+    ``record`` holds the ``db.record_processed`` arguments for the decision.
+    Returns the calendar event id. If the API call fails, the error is raised.
+    The intent is kept for ``reconcile()`` unless the API rejected the write
+    outright.
+    """
+    intent_id = db.add_intent(
+        intent_key(record["post_guid"], action, event_id, event),
+        record["post_guid"],
+        action.value,
+        event_id,
+        _dump_record(record),
+    )
+    try:
+        calendar_event_id = _send(action, event_id, event)
+    except Exception as e:
+        if _was_rejected(e):
+            db.remove_intent(intent_id)
+        else:
+            db.note_intent_error(intent_id, str(e))
+        raise
+    _complete(intent_id, record, calendar_event_id)
+    return calendar_event_id
+
+
+def _already_applied(action: Action, event_id: str) -> bool:
+    if action == Action.UPDATE:
+        # update_event compares with the current event itself and skips the
+        # write if it already landed
+        return False
+    current = calendar.get_event(event_id)
+    exists = current is not None and current.get("status") != "cancelled"
+    return exists if action == Action.CREATE else not exists
+
+
+def reconcile() -> ReconcileResult:
+    """Finish every journaled write left behind by an interrupted run."""
+    result = ReconcileResult()
+    for intent in db.get_pending_intents():
+        action = Action(intent["action"])
+        record = _load_record(intent["record_json"])
+        event_id = intent["event_id"]
+        try:
+            if _already_applied(action, event_id):
+                result.already_applied += 1
+                calendar_event_id = event_id
+            else:
+                calendar_event_id = _send(action, event_id, record.get("event"))
+                result.replayed += 1
+        except Exception as e:
+            if _was_rejected(e):
+                # E.g. the event to update was deleted since; the post will
+                # be analyzed again
+                db.remove_intent(intent["id"])
+            else:
+                db.note_intent_error(intent["id"], str(e))
+            result.failed += 1
+            result.errors.append(f"{action.value} {event_id}: {e}")
+            continue
+        _complete(intent["id"], record, calendar_event_id)
+    return result
+
+
+def defer(
+    action: Action,
+    event_id: str,
+    event: EventDetails | None,
+    record: db.ProcessedRecord,
+) -> str:
+    """Journal a calendar write for ``flush()``; returns the calendar event id."""
+    db.add_intent(
+        intent_key(record["post_guid"], action, event_id, event),
+        record["post_guid"],
+        action.value,
+        event_id,
+        _dump_record(record),
+    )
+    return event_id
+
+
+def overlay_pending(
+    events: list[CalendarEvent], matches: Callable[[CalendarEvent], bool]
+) -> list[CalendarEvent]:
+    """Apply journaled writes not sent yet to calendar search results.
+
+    ``matches`` is the search's own filter, applied to queued events.
+    """
+    by_id = {e.id: e for e in events}
+    for intent in db.get_pending_intents():
+        event_id = intent["event_id"]
+        event = _load_record(intent["record_json"]).get("event")
+        if Action(intent["action"]) == Action.CANCEL or event is None:
+            by_id.pop(event_id, None)
+            continue
+        queued = calendar.preview_event(event_id, event)
+        if matches(queued):
+            by_id[event_id] = queued
+        else:
+            by_id.pop(event_id, None)
+    return list(by_id.values())
+
+
+class FlushResult:
+    """Outcome of sending the journaled writes."""
+
+    def __init__(self):
+        self.sent = 0
+        # Nothing to send: the event already looked as asked
+        self.unchanged = 0
+        # Rejected by the API; the intent is dropped and the post analyzed again
+        self.dropped_guids: set[str] = set()
+        # Still pending for the next run (rate limited, network, ...)
+        self.failed = 0
+        self.errors: list[str] = []
+
+
+def flush(
+    max_parallel: int = 4,
+    http_factory: Callable[[], object] | None = None,
+    **batch_options,
+) -> FlushResult:
+    """Send every journaled write, in batches, and record their decisions.
+
+    Each event's current state is fetched first (also in batches), so writes
+    that already landed or change nothing are skipped and updates are sent
+    as minimal patches. When several writes target one event, they go out
+    in journal order, one per round, because a batch doesn't order its parts.
+    """
+    result = FlushResult()
+    service = calendar.get_calendar_service()
+    options = dict(
+        http_factory=http_factory or calendar.new_http,
+        max_parallel=max_parallel,
+        **batch_options,
+    )
+
+    intents = db.get_pending_intents()
+    while intents:
+        wave: dict[str, dict] = {}
+        later: list[dict] = []
+        for intent in intents:
+            if intent["event_id"] in wave:
+                later.append(intent)
+            else:
+                wave[intent["event_id"]] = intent
+
+        failed_events = _flush_wave(list(wave.values()), service, options, result)
+        # Writes queued behind a failed one wait for the next run
+        intents = [i for i in later if i["event_id"] not in failed_events]
+    return result
+
+
+def _flush_wave(
+    intents: list[dict], service, options: dict, result: FlushResult
+) -> set[str]:
+    """Send one write per event; returns the event ids whose write failed."""
+    from . import batching
+
+    failed: set[str] = set()
+
+    def fail(intent: dict, error: Exception) -> None:
+        if _was_rejected(error) and not batching.is_retryable(error):
+            db.remove_intent(intent["id"])
+            result.dropped_guids.add(intent["post_guid"])
+        else:
+            db.note_intent_error(intent["id"], str(error))
+            result.failed += 1
+        failed.add(intent["event_id"])
+        result.errors.append(f"{intent['action']} {intent['event_id']}: {error}")
+
+    calendar_id = calendar.get_calendar_id()
+    gets = {
+        str(i["id"]): service.events().get(
+            calendarId=calendar_id, eventId=i["event_id"]
+        )
+        for i in intents
+    }
+    current = batching.execute_all(service, gets, **options)
+
+    writes: dict[str, tuple[dict, db.ProcessedRecord, str]] = {}
+    requests = {}
+    for intent in intents:
+        key = str(intent["id"])
+        action = Action(intent["action"])
+        record = _load_record(intent["record_json"])
+        response, error = current[key]
+        if error is not None and _http_status(error) not in (404, 410):
+            fail(intent, error)
+            continue
+        event = cast(dict, response) if error is None else None
+        try:
+            planned = calendar.write_request(
+                action, intent["event_id"], record.get("event"), event
+            )
+        except Exception as e:
+            fail(intent, e)
+            continue
+        if planned is None:
+            calendar.write_stats.unchanged += 1
+            result.unchanged += 1
+            _complete(intent["id"], record, intent["event_id"])
+            continue
+        kind, request = planned
+        writes[key] = (intent, record, kind)
+        requests[key] = request
+
+    for key, (response, error) in batching.execute_all(
+        service, requests, **options
+    ).items():
+        intent, record, kind = writes[key]
+        if error is not None and not (
+            kind == "deleted" and _http_status(error) in (404, 410)
+        ):
+            fail(intent, error)
+            continue
+        calendar.write_stats.record(kind)
+        result.sent += 1
+        _complete(intent["id"], record, intent["event_id"])
+    return failed
@@ -0,0 +1,199 @@
+"""Per-post deadlines, per-call timeouts and hedged read-only calls.
+
+A run's wall time is dominated by its slowest posts: one model call that
+takes minutes, or a Calendar search stuck on a dead connection. Three
+things bound that tail:
+
+- a ``Deadline`` per post. ``analyze_post`` checks it before every model
+  turn and gives up with ``DeadlineExceeded`` once it has passed; the post
+  is left for the next run like any other failed post;
+- a per-call timeout, capped by what's left of the post's deadline, on
+  model calls, image downloads and new Calendar connections;
+- optional hedging of read-only calls (calendar searches, image downloads,
+  the prefilter): when a call hasn't answered within the p95 of recent
+  calls, a ``Hedger`` sends a second copy and takes whichever answers first.
+  Only calls that change nothing may be hedged, since both copies run.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, TypeVar
+
+from . import tracing
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(Exception):
+    """A post ran past its wall-clock budget."""
+
+
+class Deadline:
+    """Wall-clock budget for one post; ``seconds=None`` means no limit."""
+
+    def __init__(
+        self,
+        seconds: float | None,
+        call_timeout: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.seconds = seconds
+        self.call_timeout = call_timeout
+        self.clock = clock
+        self.started_at = clock()
+
+    def elapsed(self) -> float:
+        return self.clock() - self.started_at
+
+    def remaining(self) -> float | None:
+        if self.seconds is None:
+            return None
+        return self.seconds - self.elapsed()
+
+    def check(self, what: str = "post") -> None:
+        """Raise ``DeadlineExceeded`` if the budget is spent."""
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceeded(
+                f"{what} exceeded its {self.seconds:g}s deadline "
+                f"after {self.elapsed():.1f}s"
+            )
+
+    def timeout(self) -> float | None:
+        """Timeout for the next call: ``call_timeout`` or what's left, if less."""
+        remaining = self.remaining()
+        if remaining is None:
+            return self.call_timeout
+        remaining = max(remaining, 1.0)
+        if self.call_timeout is None:
+            return remaining
+        return min(self.call_timeout, remaining)
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile ``q`` (0-100) of ``values``."""
+    ordered = sorted(values)
+    rank = math.ceil(len(ordered) * q / 100)
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+
+def format_percentiles(values: list[float]) -> str:
+    """``p50 1.2s, p95 3.4s, p99 5.6s`` for a list of durations."""
+    if not values:
+        return "no samples"
+    return ", ".join(f"p{q} {percentile(values, q):.1f}s" for q in (50, 95, 99))
+
+
+class Hedger:
+    """Sends a backup copy of a slow read-only call; the first answer wins.
+
+    The hedge delay is the ``quantile`` of the last ``window`` latencies, so
+    about 5% of calls are hedged at the default p95. Until ``min_samples``
+    calls have been timed, ``initial_delay`` is used instead.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        quantile: float = 95,
+        min_samples: int = 20,
+        initial_delay: float = 2.0,
+        window: int = 200,
+        max_workers: int = 8,
+    ):
+        self.name = name
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.initial_delay = initial_delay
+        self.samples: deque[float] = deque(maxlen=window)
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=f"hedge-{name}"
+        )
+        self._lock = threading.Lock()
+
+        # Counters for run summaries
+        self.calls = 0
+        self.hedged = 0
+        self.backup_wins = 0
+
+    def delay(self) -> float:
+        """Seconds to wait for the first copy before sending the backup."""
+        with self._lock:
+            samples = list(self.samples)
+        if len(samples) < self.min_samples:
+            return self.initial_delay
+        return percentile(samples, self.quantile)
+
+    def _record(self, seconds: float) -> None:
+        with self._lock:
+            self.samples.append(seconds)
+
+    def call(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """Call ``fn``, and a second copy of it if the first is slow."""
+        return self.call_all(fn, *args, **kwargs)[0]
+
+    def call_all(
+        self, fn: Callable[..., T], *args, **kwargs
+    ) -> tuple[T, list["Future[T]"]]:
+        """Like ``call``, also returning the copy that didn't win, if one was sent.
+
+        The losing copy may still be running (or have failed). Its work is
+        done and paid for all the same, so callers that count usage use it.
+        """
+        fn = tracing.carry(fn)
+        self.calls += 1
+        started = time.monotonic()
+        first = self._pool.submit(fn, *args, **kwargs)
+        done, _ = wait([first], timeout=self.delay())
+        if done:
+            self._record(time.monotonic() - started)
+            return first.result(), []
+
+        self.hedged += 1
+        backup = self._pool.submit(fn, *args, **kwargs)
+        pending: set[Future] = {first, backup}
+        error: BaseException | None = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    self._record(time.monotonic() - started)
+                    if future is backup:
+                        self.backup_wins += 1
+                    return future.result(), [first if future is backup else backup]
+                error = future.exception()
+        # Both copies failed; the slower one's error is as good as any
+        assert error is not None
+        raise error
+
+    def counters(self) -> dict:
+        return {
+            f"{self.name}_calls": self.calls,
+            f"{self.name}_hedged": self.hedged,
+            f"{self.name}_backup_wins": self.backup_wins,
+        }
+
+
+_hedgers: dict[str, Hedger] = {}
+_lock = threading.Lock()
+
+
+def hedger(name: str) -> Hedger:
+    """The process-wide ``Hedger`` for the read-only call ``name``."""
+    with _lock:
+        if name not in _hedgers:
+            _hedgers[name] = Hedger(name)
+        return _hedgers[name]
+
+
+def counters() -> dict:
+    """Counters of every hedger used so far."""
+    with _lock:
+        items = list(_hedgers.values())
+    result = {}
+    for item in items:
+        result.update(item.counters())
+    return result
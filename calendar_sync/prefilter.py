@@ -1,18 +1,19 @@
 """Pre-filter posts to quickly identify non-events before full analysis."""
 
 from datetime import datetime
-from calendar_sync.claude import local_time_str, TIME_ZONE
-
-from anthropic import Anthropic
-from anthropic.types import TextBlock
+from calendar_sync.claude import PRICING, create_message, local_time_str, TIME_ZONE
 
+from . import latency, tracing
 from .models import RssPost
 
-PREFILTER_INPUT_COST_PER_M = 3.00
-PREFILTER_OUTPUT_COST_PER_M = 15.00
 PREFILTER_MODEL = "claude-sonnet-4-6"
+# YES or NO
+PREFILTER_MAX_TOKENS = 8
+
 
-PREFILTER_PROMPT = f"""You are a binary classifier. Given an RSS post from a cycling community social account, determine if the post could plausibly be announcing an event (a ride, meetup, race, social gathering, etc. with a date/time).
+def prefilter_prompt(now: datetime | None = None) -> str:
+    """The pre-filter system prompt, with the current (or ``now``'s) date and time."""
+    return f"""You are a binary classifier. Given an RSS post from a cycling community social account, determine if the post could plausibly be announcing an event (a ride, meetup, race, social gathering, etc. with a date/time).
 
 Answer with exactly one word: YES or NO.
 
@@ -20,7 +21,7 @@ Answer with exactly one word: YES or NO.
 - NO means the post is clearly not an event announcement, or the post is written in past tense about an event that has already happened, and can be safely ignored.
 
 More instructions:
-* For the sake of reasoning about relative dates (i.e. "this saturday"), the current date and time is {local_time_str(datetime.now())}. The timezone is {TIME_ZONE}. 
+* For the sake of reasoning about relative dates (i.e. "this saturday"), the current date and time is {local_time_str(now or datetime.now())}. The timezone is {TIME_ZONE}. 
 * If the event is referred to in future tense but seems to have happened in the recent past, answer YES.
 * If the post has so little content such that you'd probably need to see the images/videos to determine if it's an event, answer YES.
 
@@ -31,27 +32,39 @@ do NOT print ANYTHING OTHER THAN YES or NO.
 class PrefilterResult:
     """Result from the pre-filter."""
 
-    def __init__(self, is_likely_event: bool, input_tokens: int, output_tokens: int):
+    def __init__(
+        self,
+        is_likely_event: bool,
+        input_tokens: int,
+        output_tokens: int,
+        model: str = PREFILTER_MODEL,
+    ):
         self.is_likely_event = is_likely_event
         self.input_tokens = input_tokens
         self.output_tokens = output_tokens
+        self.model = model
 
     @property
     def cost_usd(self) -> float:
-        return (
-            self.input_tokens * PREFILTER_INPUT_COST_PER_M / 1_000_000
-            + self.output_tokens * PREFILTER_OUTPUT_COST_PER_M / 1_000_000
-        )
+        return PRICING[self.model].cost(self.input_tokens, self.output_tokens)
 
 
-def prefilter_post(post: RssPost) -> PrefilterResult:
+@tracing.traced("prefilter_post")
+def prefilter_post(
+    post: RssPost,
+    deadline: latency.Deadline | None = None,
+    hedge: bool = False,
+    model: str = PREFILTER_MODEL,
+    now: datetime | None = None,
+) -> PrefilterResult:
     """Run a cheap check to see if a post is plausibly an event.
 
     Returns a PrefilterResult. If is_likely_event is False, the post can be
     short-circuited to "ignore" without running the full Sonnet analysis.
+    The call is timed out by ``deadline`` and, with ``hedge``, hedged (it
+    only reads). ``now`` replaces the current time in the prompt (for
+    replaying old posts).
     """
-    client = Anthropic()
-
     user_text = f"""Analyze this RSS post:
 
 Title: {post.title}
@@ -63,12 +76,23 @@ Content:
 {post.content}
 """
 
-    response = client.messages.create(
-        model=PREFILTER_MODEL,
-        max_tokens=8,
-        system=PREFILTER_PROMPT,
+    tracing.annotate(model=model)
+    request = dict(
+        model=model,
+        max_tokens=PREFILTER_MAX_TOKENS,
+        system=prefilter_prompt(now),
         messages=[{"role": "user", "content": user_text}],
+        timeout=deadline.timeout() if deadline else None,
     )
+    losers = []
+    if hedge:
+        response, losers = latency.hedger("prefilter").call_all(
+            create_message, **request
+        )
+    else:
+        response = create_message(**request)
+
+    from anthropic.types import TextBlock
 
     first_block = response.content[0]
     assert isinstance(first_block, TextBlock)
@@ -82,8 +106,21 @@ Content:
             f"Warning: pre-filter response had more than one message. Using only the first message's text. Full response: {response.content}"
         )
 
+    # A hedge's losing copy is billed too. One still running sends the same
+    # input and is counted at up to max_tokens of output.
+    input_tokens = response.usage.input_tokens
+    output_tokens = response.usage.output_tokens
+    for loser in losers:
+        if not loser.done():
+            input_tokens += response.usage.input_tokens
+            output_tokens += PREFILTER_MAX_TOKENS
+        elif loser.exception() is None:
+            input_tokens += loser.result().usage.input_tokens
+            output_tokens += loser.result().usage.output_tokens
+
     return PrefilterResult(
         is_likely_event=is_likely_event,
-        input_tokens=response.usage.input_tokens,
-        output_tokens=response.usage.output_tokens,
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        model=model,
     )
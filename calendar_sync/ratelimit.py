@@ -0,0 +1,350 @@
+"""Client-side rate limiting, retries and circuit breaking per upstream API.
+
+Every Anthropic and Google Calendar call goes through an ``Upstream``:
+
+- a token bucket paces requests. Its rate follows the rate-limit headers
+  the API sends (``anthropic-ratelimit-requests-remaining``/``-reset``);
+  without them it creeps up on success and halves when throttled.
+  ``Retry-After`` pauses it;
+- an AIMD limit on concurrent calls grows by one per window of successes
+  and halves when the API throttles (429, 529, 403 rate limit), so parallel
+  callers (batch flushes, concurrent runs) settle at what the quota allows
+  instead of hammering it;
+- throttled and transient failures (5xx, timeouts, connection errors) are
+  retried with jittered exponential backoff;
+- a circuit breaker opens after ``failure_threshold`` consecutive server or
+  connection failures and fails calls fast (``CircuitOpenError``) until
+  ``reset_after`` seconds have passed and a trial call succeeds.
+
+Client errors such as 400 or 404 are passed straight through and don't
+count against the breaker.
+"""
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, TypeVar
+
+T = TypeVar("T")
+
+# Token shortfalls below this are float rounding, not a reason to wait
+EPSILON = 1e-9
+
+THROTTLE_STATUSES = {429, 529}
+TRANSIENT_STATUSES = {408, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+# anthropic.APIConnectionError (and APITimeoutError), httplib2.HttpLib2Error
+CONNECTION_ERRORS = {"APIConnectionError", "HttpLib2Error"}
+
+
+class CircuitOpenError(Exception):
+    """The upstream failed repeatedly; calls are refused until it recovers."""
+
+
+def status_of(error: Exception) -> int | None:
+    """HTTP status of an Anthropic or googleapiclient error, if it has one."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "resp", None), "status", None)
+    return status
+
+
+def headers_of(obj) -> dict:
+    """Response headers of an error or raw response, lower-cased."""
+    headers = getattr(obj, "headers", None)
+    if headers is None:
+        response = getattr(obj, "response", None)
+        headers = getattr(response, "headers", None)
+    if headers is None:
+        # googleapiclient's HttpError.resp is a dict of headers
+        headers = getattr(obj, "resp", None)
+    try:
+        return {str(k).lower(): v for k, v in dict(headers or {}).items()}
+    except (TypeError, ValueError):
+        return {}
+
+
+def _google_reason(error: Exception) -> str | None:
+    import json
+
+    try:
+        payload = json.loads(getattr(error, "content", b"") or b"{}")
+        return payload["error"]["errors"][0]["reason"]
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+
+
+def classify(error: Exception) -> str | None:
+    """Kind of failure: "throttle", "transient", or None if retrying won't help."""
+    status = status_of(error)
+    if status is None:
+        # Matched by name so neither SDK has to be imported here
+        names = {cls.__name__ for cls in type(error).__mro__}
+        connection = isinstance(error, OSError) or bool(names & CONNECTION_ERRORS)
+        return "transient" if connection else None
+    if status in THROTTLE_STATUSES:
+        return "throttle"
+    if status == 403 and _google_reason(error) in RATE_LIMIT_REASONS:
+        return "throttle"
+    if status in TRANSIENT_STATUSES:
+        return "transient"
+    return None
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 32.0) -> float:
+    """Exponential backoff with jitter for retry ``attempt`` (0-based).
+
+    At least half the nominal delay, so a quota has time to refill.
+    """
+    delay = min(cap, base * 2**attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def _seconds_until(value: str, now: float) -> float | None:
+    """Seconds from ``now`` (wall clock) to an RFC 3339 time."""
+    try:
+        reset = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return reset.timestamp() - now
+
+
+class Upstream:
+    """Rate limiter, retry policy and circuit breaker for one API."""
+
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        burst: float,
+        max_concurrency: int = 8,
+        min_rate: float = 0.1,
+        max_rate: float = 100.0,
+        rate_step: float = 1.0,
+        failure_threshold: int = 5,
+        reset_after: float = 30.0,
+        max_attempts: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+        wall_clock: Callable[[], float] = time.time,
+    ):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.max_concurrency = max_concurrency
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.clock = clock
+        self.sleep = sleep
+        self.wall_clock = wall_clock
+
+        # Without rate-limit headers the rate is AIMD too: +rate_step per
+        # success, halved per throttle
+        self.rate_step = rate_step
+        self.header_paced = False
+        self.tokens = burst
+        self.refilled_at = clock()
+        self.paused_until = 0.0
+        # AIMD concurrency limit; fractional so it can grow by 1/limit per success
+        self.concurrency = float(max_concurrency)
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.opened_at: float | None = None
+        self.trial_in_flight = False
+
+        # Counters for run summaries and /metrics
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+        self.rejected = 0
+
+        self._cond = threading.Condition()
+
+    # -- pacing ------------------------------------------------------------
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(
+            self.burst, self.tokens + (now - self.refilled_at) * self.rate
+        )
+        self.refilled_at = now
+
+    def _wait_time(self, now: float, cost: float) -> float:
+        """Seconds until a call may start (0 if it may start now)."""
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.in_flight >= max(1, int(self.concurrency)):
+            return -1  # wait for a release
+        self._refill(now)
+        needed = min(cost, self.burst)
+        if needed - self.tokens > EPSILON:
+            return (needed - self.tokens) / self.rate
+        return 0.0
+
+    def _check_breaker(self, now: float) -> bool:
+        """Raise if the breaker is open; True if this call is the half-open trial."""
+        if self.opened_at is None:
+            return False
+        if now - self.opened_at < self.reset_after or self.trial_in_flight:
+            self.rejected += 1
+            raise CircuitOpenError(
+                f"{self.name} is failing; not calling it for "
+                f"{max(0.0, self.reset_after - (now - self.opened_at)):.0f}s"
+            )
+        self.trial_in_flight = True
+        return True
+
+    @contextmanager
+    def slot(self, cost: float = 1):
+        """Wait for ``cost`` tokens and a concurrency slot; yields during the call.
+
+        A batch call costs one token per request in it.
+        """
+        with self._cond:
+            trial = self._check_breaker(self.clock())
+            while True:
+                wait = self._wait_time(self.clock(), cost)
+                if wait == 0:
+                    break
+                if wait < 0:
+                    self._cond.wait()
+                else:
+                    self._cond.release()
+                    try:
+                        self.sleep(wait)
+                    finally:
+                        self._cond.acquire()
+            self.tokens -= cost
+            self.in_flight += 1
+            self.calls += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+                if trial:
+                    self.trial_in_flight = False
+                self._cond.notify_all()
+
+    # -- feedback ----------------------------------------------------------
+
+    def observe(self, headers: dict) -> None:
+        """Adjust pacing from rate-limit response headers."""
+        now = self.clock()
+        with self._cond:
+            retry_after = headers.get("retry-after")
+            try:
+                if retry_after is not None:
+                    self.paused_until = max(self.paused_until, now + float(retry_after))
+            except ValueError:
+                pass
+            remaining = headers.get("anthropic-ratelimit-requests-remaining")
+            reset = headers.get("anthropic-ratelimit-requests-reset")
+            seconds = _seconds_until(reset, self.wall_clock()) if reset else None
+            if remaining is not None and seconds is not None:
+                try:
+                    left = float(remaining)
+                except ValueError:
+                    return
+                seconds = max(seconds, 1.0)
+                if left <= 0:
+                    self.paused_until = max(self.paused_until, now + seconds)
+                # Spread what's left of the window over the time until it resets
+                self.rate = min(self.max_rate, max(self.min_rate, left / seconds))
+                self.header_paced = True
+
+    def record_success(self) -> None:
+        with self._cond:
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self.concurrency = min(
+                self.max_concurrency, self.concurrency + 1 / self.concurrency
+            )
+            if not self.header_paced:
+                self.rate = min(self.max_rate, self.rate + self.rate_step)
+
+    def record_failure(self, kind: str | None) -> None:
+        """Feed back a failed call classified by ``classify``."""
+        with self._cond:
+            if kind == "throttle":
+                self.throttled += 1
+                self.concurrency = max(1.0, self.concurrency / 2)
+                self.rate = max(self.min_rate, self.rate / 2)
+            elif kind == "transient":
+                self.failures += 1
+                self.consecutive_failures += 1
+                if self.consecutive_failures >= self.failure_threshold:
+                    self.opened_at = self.clock()
+
+    # -- calls -------------------------------------------------------------
+
+    def call(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """Call ``fn`` under this upstream's limits, retrying what can be retried."""
+        for attempt in range(self.max_attempts):
+            with self.slot():
+                try:
+                    result = fn(*args, **kwargs)
+                except Exception as e:
+                    kind = classify(e)
+                    self.observe(headers_of(e))
+                    self.record_failure(kind)
+                    if kind is None or attempt == self.max_attempts - 1:
+                        raise
+                    error = e
+                else:
+                    self.observe(headers_of(result))
+                    self.record_success()
+                    return result
+            if self.opened_at is not None:
+                raise CircuitOpenError(f"{self.name} is failing: {error}") from error
+            self.retries += 1
+            self.sleep(backoff_delay(attempt, self.base_delay, self.max_delay))
+        raise AssertionError("unreachable")
+
+    def counters(self) -> dict:
+        return {
+            f"{self.name}_calls": self.calls,
+            f"{self.name}_retries": self.retries,
+            f"{self.name}_throttled": self.throttled,
+            f"{self.name}_failures": self.failures,
+            f"{self.name}_circuit_rejected": self.rejected,
+            f"{self.name}_circuit_open": int(self.opened_at is not None),
+        }
+
+
+# Starting points; the Anthropic rate follows its response headers from the
+# first call on, and Google's adapts to its 403/429s.
+DEFAULTS: dict[str, dict[str, Any]] = {
+    "anthropic": dict(rate=1.0, burst=5, max_concurrency=4),
+    "google_calendar": dict(rate=100.0, burst=100, max_rate=500, max_concurrency=8),
+}
+
+_upstreams: dict[str, Upstream] = {}
+_lock = threading.Lock()
+
+
+def upstream(name: str) -> Upstream:
+    """The process-wide ``Upstream`` for ``name`` (one of ``DEFAULTS``)."""
+    with _lock:
+        if name not in _upstreams:
+            _upstreams[name] = Upstream(name, **DEFAULTS[name])
+        return _upstreams[name]
+
+
+def counters() -> dict:
+    """Counters of every upstream used so far."""
+    with _lock:
+        items = list(_upstreams.values())
+    result = {}
+    for item in items:
+        result.update(item.counters())
+    return result
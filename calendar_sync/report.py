@@ -5,14 +5,14 @@ import html as html_lib
 from collections import defaultdict
 from datetime import datetime, timezone
 
-from . import claude
-from .calendar import CALENDAR_ID
+from . import calendar, claude
 from .rss import extract_image_urls
 
 
 def _gcal_url(event_id: str) -> str:
     """Build a Google Calendar web URL for an event."""
-    eid = base64.b64encode(f"{event_id} {CALENDAR_ID}".encode()).decode()
+    calendar_id = calendar.get_calendar_id()
+    eid = base64.b64encode(f"{event_id} {calendar_id}".encode()).decode()
     return f"https://www.google.com/calendar/event?eid={eid}"
 
 
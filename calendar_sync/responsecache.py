@@ -0,0 +1,101 @@
+"""A local cache of model responses, keyed on the whole request.
+
+Used by ``calsync eval``: replaying the same posts with the same prompts,
+models and tool results costs nothing the second time, so only what changed
+is paid for. Each entry keeps how long the call took; a hit adds that to the
+thread's ``replayed_seconds`` so replays stay comparable on latency.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+def get_cache_path() -> Path:
+    """Cache file path from ``CALSYNC_RESPONSE_CACHE`` or default to data/."""
+    env_path = os.getenv("CALSYNC_RESPONSE_CACHE")
+    if env_path:
+        return Path(env_path)
+    return Path(__file__).parent.parent / "data" / "response_cache.db"
+
+
+def _jsonable(value):
+    # SDK content blocks echoed back to the model in later turns
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    raise TypeError(f"Can't hash a {type(value).__name__} in a request")
+
+
+def request_key(request: dict) -> str:
+    """Hash of everything in a request that affects the answer (not its timeout)."""
+    body = {k: v for k, v in request.items() if k != "timeout"}
+    text = json.dumps(body, sort_keys=True, default=_jsonable)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Responses (as JSON) by request key, in a SQLite file shared by all threads."""
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                seconds REAL NOT NULL,
+                created_at TEXT NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> str | None:
+        """The cached response for ``key``; its duration counts as replayed."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT response, seconds FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        self.local.seconds = getattr(self.local, "seconds", 0.0) + row[1]
+        return row[0]
+
+    def put(self, key: str, response: str, seconds: float) -> None:
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, response, seconds, datetime.now(timezone.utc).isoformat()),
+            )
+
+    def replayed_seconds(self) -> float:
+        """Recorded duration of this thread's hits since the last call; resets it."""
+        seconds = getattr(self.local, "seconds", 0.0)
+        self.local.seconds = 0.0
+        return seconds
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
+
+
+_active: ResponseCache | None = None
+
+
+def use(cache: ResponseCache | None) -> None:
+    """Send every model call through ``cache`` (None turns caching off)."""
+    global _active
+    _active = cache
+
+
+def active() -> ResponseCache | None:
+    return _active
@@ -1,12 +1,22 @@
 """RSS feed fetching and parsing."""
 
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timezone
+from typing import Callable
 
 import feedparser
+import httpx
 
+from . import tracing
 from .models import RssPost
 
+# Stop converting entries once this many consecutive already-processed guids
+# have been seen. The merged feed is newest-first, so a run this long means
+# everything after it was handled by an earlier sync.
+KNOWN_RUN_CUTOFF = 25
+
 
 def extract_image_urls(content: str) -> list[str]:
     """Extract image URLs from HTML content."""
@@ -26,60 +36,323 @@ def time_struct_to_datetime(time_struct) -> datetime | None:
         return None
 
 
+class FeedResult:
+    """Result of a conditional feed fetch."""
+
+    def __init__(
+        self,
+        posts: list[RssPost],
+        url: str = "",
+        error: str | None = None,
+        not_modified: bool = False,
+        etag: str | None = None,
+        modified: str | None = None,
+        bytes_fetched: int = 0,
+        entry_count: int = 0,
+        known_skipped: int = 0,
+        stopped_early: bool = False,
+        fetch_seconds: float = 0.0,
+        parse_seconds: float = 0.0,
+    ):
+        self.posts = posts
+        self.url = url
+        self.error = error
+        self.not_modified = not_modified
+        self.etag = etag
+        self.modified = modified
+        self.bytes_fetched = bytes_fetched
+        self.entry_count = entry_count
+        self.known_skipped = known_skipped
+        self.stopped_early = stopped_early
+        self.fetch_seconds = fetch_seconds
+        self.parse_seconds = parse_seconds
+
+
+def entry_guid(entry) -> str:
+    """Return the guid feedparser exposes for an entry (falls back to the link)."""
+    return entry.get("id", entry.get("link", ""))
+
+
+def entry_to_post(entry) -> RssPost:
+    """Convert a single feedparser entry into an RssPost."""
+    # Get content - try different fields
+    content = ""
+    if hasattr(entry, "content") and entry.content:
+        content = entry.content[0].get("value", "")
+    elif hasattr(entry, "summary"):
+        content = entry.summary
+    elif hasattr(entry, "description"):
+        content = entry.description
+
+    # Extract images from content
+    image_urls = extract_image_urls(content)
+
+    # Also check for enclosures (attachments)
+    if hasattr(entry, "enclosures"):
+        for enc in entry.enclosures:
+            if enc.get("type", "").startswith("image/"):
+                image_urls.append(enc.get("href", ""))
+
+    # Parse published date (feedparser pre-parses into *_parsed attributes)
+    published = None
+    if hasattr(entry, "published_parsed"):
+        published = time_struct_to_datetime(entry.published_parsed)
+    elif hasattr(entry, "updated_parsed"):
+        published = time_struct_to_datetime(entry.updated_parsed)
+
+    # Extract author
+    author = None
+    if hasattr(entry, "author"):
+        author = entry.author
+    elif hasattr(entry, "author_detail"):
+        author = entry.author_detail.get("name")
+
+    # Collect custom namespaced metadata (e.g. rssglue:score → rssglue_score)
+    extra: dict = {}
+    for key, value in entry.items():
+        if key.startswith("rssglue_"):
+            extra[key] = value
+
+    return RssPost(
+        guid=entry_guid(entry),
+        title=entry.get("title", ""),
+        link=entry.get("link", ""),
+        content=content,
+        author=author,
+        published=published,
+        image_urls=image_urls,
+        extra=extra,
+    )
+
+
+def parse_entries(
+    entries: list,
+    is_known: Callable[[str], bool] | None = None,
+    known_run_cutoff: int = KNOWN_RUN_CUTOFF,
+) -> tuple[list[RssPost], int, bool]:
+    """Convert feed entries into posts, skipping ones that are already known.
+
+    Known entries are never converted. Once ``known_run_cutoff`` known entries
+    have been seen in a row, parsing stops early.
+
+    Returns: (new posts, number of known entries skipped, whether parsing stopped early)
+    """
+    posts: list[RssPost] = []
+    skipped = 0
+    run = 0
+
+    for entry in entries:
+        if is_known is not None and is_known(entry_guid(entry)):
+            skipped += 1
+            run += 1
+            if known_run_cutoff and run >= known_run_cutoff:
+                return posts, skipped, True
+            continue
+        run = 0
+        posts.append(entry_to_post(entry))
+
+    return posts, skipped, False
+
+
+@tracing.traced("rss.fetch_feed")
 def fetch_feed(url: str) -> list[RssPost]:
     """Fetch and parse an RSS feed, returning posts."""
     feed = feedparser.parse(url)
-    posts = []
-
-    for entry in feed.entries:
-        # Get content - try different fields
-        content = ""
-        if hasattr(entry, "content") and entry.content:
-            content = entry.content[0].get("value", "")
-        elif hasattr(entry, "summary"):
-            content = entry.summary
-        elif hasattr(entry, "description"):
-            content = entry.description
-
-        # Extract images from content
-        image_urls = extract_image_urls(content)
-
-        # Also check for enclosures (attachments)
-        if hasattr(entry, "enclosures"):
-            for enc in entry.enclosures:
-                if enc.get("type", "").startswith("image/"):
-                    image_urls.append(enc.get("href", ""))
-
-        # Parse published date (feedparser pre-parses into *_parsed attributes)
-        published = None
-        if hasattr(entry, "published_parsed"):
-            published = time_struct_to_datetime(entry.published_parsed)
-        elif hasattr(entry, "updated_parsed"):
-            published = time_struct_to_datetime(entry.updated_parsed)
-
-        # Extract author
-        author = None
-        if hasattr(entry, "author"):
-            author = entry.author
-        elif hasattr(entry, "author_detail"):
-            author = entry.author_detail.get("name")
-
-        # Collect custom namespaced metadata (e.g. rssglue:score → rssglue_score)
-        extra: dict = {}
-        for key, value in entry.items():
-            if key.startswith("rssglue_"):
-                extra[key] = value
-
-        post = RssPost(
-            guid=entry.get("id", entry.get("link", "")),
-            title=entry.get("title", ""),
-            link=entry.get("link", ""),
-            content=content,
-            author=author,
-            published=published,
-            image_urls=image_urls,
-            extra=extra,
+    return [entry_to_post(entry) for entry in feed.entries]
+
+
+@tracing.traced("rss.fetch_feed")
+def fetch_feed_conditional(
+    url: str,
+    etag: str | None = None,
+    modified: str | None = None,
+    known_guids: Callable[[list[str]], set[str]] | None = None,
+    timeout: float = 30.0,
+    client: httpx.Client | None = None,
+) -> FeedResult:
+    """Fetch a feed with a conditional GET and parse only new entries.
+
+    Args:
+        url: Feed URL
+        etag: ETag from the previous fetch, sent as If-None-Match
+        modified: Last-Modified from the previous fetch, sent as If-Modified-Since
+        known_guids: Returns the already-processed subset of a list of guids;
+            called once per fetch with every entry's guid
+        timeout: HTTP timeout in seconds
+        client: Reuse this client's connection pool (e.g. across polls)
+
+    Returns: A FeedResult; ``not_modified`` is set when the server answered 304.
+    Each post is tagged with ``extra["source_feed_url"]``.
+    """
+    tracing.annotate(url=url)
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if modified:
+        headers["If-Modified-Since"] = modified
+
+    fetch_start = time.perf_counter()
+    get = client.get if client is not None else httpx.get
+    response = get(url, headers=headers, timeout=timeout, follow_redirects=True)
+    fetch_seconds = time.perf_counter() - fetch_start
+
+    if response.status_code == 304:
+        return FeedResult(
+            posts=[],
+            url=url,
+            not_modified=True,
+            etag=etag,
+            modified=modified,
+            fetch_seconds=fetch_seconds,
         )
-        posts.append(post)
+    response.raise_for_status()
+
+    result = parse_feed_content(
+        response.content,
+        url,
+        content_type=response.headers.get("content-type", ""),
+        content_location=str(response.url),
+        known_guids=known_guids,
+    )
+    result.etag = response.headers.get("etag")
+    result.modified = response.headers.get("last-modified")
+    result.fetch_seconds = fetch_seconds
+    return result
+
+
+@tracing.traced("rss.parse")
+def parse_feed_content(
+    content: bytes,
+    url: str,
+    content_type: str = "",
+    content_location: str | None = None,
+    known_guids: Callable[[list[str]], set[str]] | None = None,
+) -> FeedResult:
+    """Parse a feed document that was fetched (or pushed to us) from ``url``.
+
+    Shared by conditional fetches and the webhook receiver (ingest.py), so a
+    pushed post looks exactly like a polled one. Each post is tagged with
+    ``extra["source_feed_url"]``.
+    """
+    parse_start = time.perf_counter()
+    feed = feedparser.parse(
+        content,
+        response_headers={
+            "content-location": content_location or url,
+            "content-type": content_type,
+        },
+    )
+    is_known = None
+    if known_guids is not None:
+        is_known = known_guids([entry_guid(e) for e in feed.entries]).__contains__
+    posts, skipped, stopped_early = parse_entries(feed.entries, is_known)
+    for post in posts:
+        post.extra["source_feed_url"] = url
+
+    return FeedResult(
+        posts=posts,
+        url=url,
+        bytes_fetched=len(content),
+        entry_count=len(feed.entries),
+        known_skipped=skipped,
+        stopped_early=stopped_early,
+        parse_seconds=time.perf_counter() - parse_start,
+    )
+
+
+def read_feeds_file(path: str) -> list[str]:
+    """Read feed URLs from a config file: one URL per line, '#' starts a comment."""
+    urls = []
+    with open(path) as f:
+        for line in f:
+            url = line.split("#", 1)[0].strip()
+            if url:
+                urls.append(url)
+    return urls
+
+
+def fetch_feeds(
+    urls: list[str],
+    states: dict[str, dict] | None = None,
+    known_guids: Callable[[list[str]], set[str]] | None = None,
+    timeout: float = 30.0,
+    max_workers: int = 8,
+    client: httpx.Client | None = None,
+) -> list[FeedResult]:
+    """Fetch several feeds concurrently.
+
+    A feed that errors or exceeds ``timeout`` yields a FeedResult with ``error``
+    set instead of failing the whole batch. Results are returned in the same
+    order as ``urls``.
+
+    Args:
+        urls: Feed URLs
+        states: feed_state rows keyed by URL, used for conditional GETs
+        known_guids: Returns the already-processed subset of a list of guids
+        timeout: Per-feed wall-clock budget in seconds
+        max_workers: Maximum concurrent fetches
+        client: Shared HTTP client (httpx clients are thread-safe)
+    """
+    states = states or {}
+    workers = max(1, min(max_workers, len(urls)))
+    executor = ThreadPoolExecutor(max_workers=workers)
+    started = time.perf_counter()
+    futures = {
+        url: executor.submit(
+            tracing.carry(fetch_feed_conditional),
+            url,
+            etag=(states.get(url) or {}).get("etag"),
+            modified=(states.get(url) or {}).get("last_modified"),
+            known_guids=known_guids,
+            timeout=timeout,
+            client=client,
+        )
+        for url in urls
+    }
+    # Fetches beyond max_workers queue up, so allow one timeout per "wave"
+    waves = -(-len(urls) // workers)
+    wait(futures.values(), timeout=timeout * waves)
+    # Don't block on stragglers; their threads exit once the HTTP timeout fires
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    results = []
+    for url, future in futures.items():
+        if not future.done():
+            results.append(
+                FeedResult(
+                    posts=[],
+                    url=url,
+                    error=f"timed out after {timeout:.0f}s",
+                    fetch_seconds=time.perf_counter() - started,
+                )
+            )
+        elif future.exception() is not None:
+            results.append(
+                FeedResult(
+                    posts=[],
+                    url=url,
+                    error=str(future.exception()),
+                    fetch_seconds=time.perf_counter() - started,
+                )
+            )
+        else:
+            results.append(future.result())
+    return results
+
+
+def merge_feed_results(results: list[FeedResult]) -> tuple[list[RssPost], dict]:
+    """Merge posts from several feeds, deduplicating by guid.
+
+    The first feed (in ``results`` order) that carries a guid wins, so its URL
+    is the one recorded in ``extra["source_feed_url"]``.
 
-    return posts
+    Returns: (merged posts, mapping of guid → every feed URL that carried it)
+    """
+    merged: dict[str, RssPost] = {}
+    feeds_by_guid: dict[str, list[str]] = {}
+    for result in results:
+        for post in result.posts:
+            feeds_by_guid.setdefault(post.guid, []).append(result.url)
+            if post.guid not in merged:
+                merged[post.guid] = post
+    return list(merged.values()), feeds_by_guid
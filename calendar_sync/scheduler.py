@@ -0,0 +1,215 @@
+"""Choose which posts a `process` run handles within a cost and time budget.
+
+Under a backlog, processing oldest-first spends the run's time and money on
+stale posts while fresh ones wait. With ``--max-cost``, ``--max-seconds`` or
+``--limit``, the run instead:
+
+- estimates each post's cost and time from its content length and image
+  count, priced with the averages of recent decisions in ``processed_posts``;
+- scores how likely it is to be an event: the author's share of past posts
+  that were events, starting from a guess based on event-like words;
+- picks posts by that score weighted by recency (halving every
+  ``HALF_LIFE_HOURS``) until the budget is spent;
+- processes the picked posts oldest-first, so a cancellation still comes
+  after the announcement it cancels, and stops before a post whose estimate
+  no longer fits what's left. Everything else waits for the next run.
+"""
+
+import re
+import time
+from datetime import datetime, timezone
+from typing import Callable
+
+from .models import Action, RssPost
+from .rss import extract_image_urls
+
+HALF_LIFE_HOURS = 72.0
+
+# Rough Anthropic token counts: ~4 characters per token, ~1,600 tokens for a
+# typical feed image, plus the prompt and tool definitions sent every time
+CHARS_PER_TOKEN = 4
+IMAGE_TOKENS = 1600
+BASE_TOKENS = 4000
+
+# Used until there's history to learn from
+DEFAULT_PREFILTER_COST = 0.002
+DEFAULT_ANALYSIS_COST = 0.05
+DEFAULT_PREFILTER_SECONDS = 2.0
+DEFAULT_ANALYSIS_SECONDS = 30.0
+
+# How many past posts an author's event rate is worth against the word guess
+PRIOR_WEIGHT = 3
+
+EVENT_WORDS = re.compile(
+    r"\b(ride|rides|race|races|meet|meetup|join|rsvp|tonight|tomorrow|"
+    r"monday|tuesday|wednesday|thursday|friday|saturday|sunday|"
+    r"jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec|"
+    r"\d{1,2}(:\d\d)?\s*(am|pm)|cancel+ed|postponed|rescheduled)\b",
+    re.IGNORECASE,
+)
+EVENT_ACTIONS = {Action.CREATE.value, Action.UPDATE.value, Action.CANCEL.value}
+
+
+def post_tokens(content: str) -> int:
+    """Estimated input tokens to analyze a post with this content."""
+    images = len(extract_image_urls(content))
+    return BASE_TOKENS + len(content) // CHARS_PER_TOKEN + images * IMAGE_TOKENS
+
+
+def word_score(post: RssPost) -> float:
+    """Guess (0.1-0.9) of whether a post is an event, from its wording alone."""
+    hits = len(EVENT_WORDS.findall(f"{post.title}\n{post.content}"))
+    return min(0.9, 0.1 + 0.15 * hits)
+
+
+class Estimate:
+    """Expected cost and seconds of processing one post."""
+
+    def __init__(self, cost: float, seconds: float, score: float, priority: float):
+        self.cost = cost
+        self.seconds = seconds
+        self.score = score
+        self.priority = priority
+
+
+class CostModel:
+    """Per-post cost, time and event-likelihood estimates."""
+
+    def __init__(
+        self,
+        prefilter_cost: float = DEFAULT_PREFILTER_COST,
+        cost_per_token: float = DEFAULT_ANALYSIS_COST / BASE_TOKENS,
+        author_events: dict[str, tuple[int, int]] | None = None,
+    ):
+        self.prefilter_cost = prefilter_cost
+        self.cost_per_token = cost_per_token
+        # author -> (event posts, posts)
+        self.author_events = author_events or {}
+        # Running means of this run's post durations, starting at the defaults
+        self._seconds = {
+            False: [DEFAULT_PREFILTER_SECONDS, 1],
+            True: [DEFAULT_ANALYSIS_SECONDS, 1],
+        }
+
+    @classmethod
+    def from_history(cls, rows: list[dict]) -> "CostModel":
+        """Fit to ``db.get_cost_history()`` rows."""
+        prefilter = [r["cost_usd"] or 0.0 for r in rows if r["prefiltered"]]
+        analyzed = [r for r in rows if not r["prefiltered"] and r["cost_usd"]]
+        tokens = sum(post_tokens(r["post_content"] or "") for r in analyzed)
+        author_events: dict[str, tuple[int, int]] = {}
+        for r in rows:
+            if r["post_author"]:
+                events, posts = author_events.get(r["post_author"], (0, 0))
+                event = r["decision"] in EVENT_ACTIONS
+                author_events[r["post_author"]] = (events + event, posts + 1)
+        return cls(
+            prefilter_cost=(
+                sum(prefilter) / len(prefilter) if prefilter else DEFAULT_PREFILTER_COST
+            ),
+            cost_per_token=(
+                sum(r["cost_usd"] for r in analyzed) / tokens
+                if tokens
+                else DEFAULT_ANALYSIS_COST / BASE_TOKENS
+            ),
+            author_events=author_events,
+        )
+
+    def event_score(self, post: RssPost) -> float:
+        """Probability-like score that the post is an event and gets analyzed."""
+        prior = word_score(post)
+        events, posts = self.author_events.get(post.author or "", (0, 0))
+        return (events + prior * PRIOR_WEIGHT) / (posts + PRIOR_WEIGHT)
+
+    def record_seconds(self, analyzed: bool, seconds: float) -> None:
+        """Learn from how long a post of this run took."""
+        mean, count = self._seconds[analyzed]
+        self._seconds[analyzed] = [mean + (seconds - mean) / (count + 1), count + 1]
+
+    def estimate(self, post: RssPost, now: datetime | None = None) -> Estimate:
+        score = self.event_score(post)
+        analysis_cost = post_tokens(post.content) * self.cost_per_token
+        seconds = (1 - score) * self._seconds[False][0] + score * self._seconds[True][0]
+        now = now or datetime.now(timezone.utc)
+        if post.published:
+            published = post.published
+            if published.tzinfo is None:
+                published = published.replace(tzinfo=timezone.utc)
+            age_hours = max(0.0, (now - published).total_seconds() / 3600)
+            recency = 0.5 ** (age_hours / HALF_LIFE_HOURS)
+        else:
+            recency = 0.5
+        return Estimate(
+            cost=self.prefilter_cost + score * analysis_cost,
+            seconds=seconds,
+            score=score,
+            priority=score * recency,
+        )
+
+
+class Budget:
+    """Cost and wall-clock limits for one run; None means no limit."""
+
+    def __init__(
+        self,
+        max_cost: float | None = None,
+        max_seconds: float | None = None,
+        limit: int | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_cost = max_cost
+        self.max_seconds = max_seconds
+        self.limit = limit
+        self.clock = clock
+        self.started_at = clock()
+
+    def elapsed(self) -> float:
+        return self.clock() - self.started_at
+
+    def plan(
+        self, posts: list[RssPost], model: CostModel, spent: float = 0.0
+    ) -> tuple[list[RssPost], dict[str, Estimate]]:
+        """Posts to process, oldest first, and every post's estimate.
+
+        Picks by priority while the estimates fit; a post that doesn't fit is
+        skipped in favour of cheaper ones after it.
+        """
+        now = datetime.now(timezone.utc)
+        estimates = {p.guid: model.estimate(p, now) for p in posts}
+        cost, seconds = spent, self.elapsed()
+        picked: list[RssPost] = []
+        for post in sorted(posts, key=lambda p: -estimates[p.guid].priority):
+            if self.limit is not None and len(picked) >= self.limit:
+                break
+            estimate = estimates[post.guid]
+            if self.max_cost is not None and cost + estimate.cost > self.max_cost:
+                continue
+            if (
+                self.max_seconds is not None
+                and seconds + estimate.seconds > self.max_seconds
+            ):
+                continue
+            picked.append(post)
+            cost += estimate.cost
+            seconds += estimate.seconds
+        order = {p.guid: i for i, p in enumerate(posts)}
+        picked.sort(key=lambda p: order[p.guid])
+        return picked, estimates
+
+    def stop_reason(self, estimate: Estimate, spent: float) -> str | None:
+        """Why the next post (with ``estimate``) shouldn't start, if it shouldn't."""
+        if self.max_cost is not None and spent + estimate.cost > self.max_cost:
+            return (
+                f"Cost budget: ${spent:.4f} spent of ${self.max_cost:.2f}, "
+                f"next post estimated at ${estimate.cost:.4f}"
+            )
+        elapsed = self.elapsed()
+        if (
+            self.max_seconds is not None
+            and elapsed + estimate.seconds > self.max_seconds
+        ):
+            return (
+                f"Time budget: {elapsed:.0f}s used of {self.max_seconds:g}s, "
+                f"next post estimated at {estimate.seconds:.0f}s"
+            )
+        return None
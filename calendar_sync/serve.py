@@ -0,0 +1,249 @@
+"""Long-running ``calsync serve`` loop with a local health/metrics endpoint.
+
+One-shot ``calsync process`` runs pay start-up on every invocation: opening
+and migrating the database, building the Google API client from its discovery
+document, creating the Anthropic client and fresh TLS connections. ``serve``
+does that once and then polls on an interval, so each pass costs only the
+conditional GETs (usually 304s) plus whatever new posts need.
+
+The loop itself is generic: it calls ``poll()`` every ``interval`` seconds
+and ``export()`` whenever a poll wrote to the calendar or ``export_every``
+seconds have passed. The CLI supplies both, which keeps this module free of
+any feed or calendar details.
+"""
+
+import json
+import signal
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import TYPE_CHECKING, Callable
+
+from . import latency, ratelimit
+
+if TYPE_CHECKING:
+    from .cli import ProcessStats
+
+
+class ServeMetrics:
+    """Counters exposed on ``/metrics``, updated by the serve loop."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.polls = 0
+        self.poll_errors = 0
+        self.last_poll_at: float | None = None
+        self.last_success_at: float | None = None
+        self.last_poll_seconds = 0.0
+        self.feeds_not_modified = 0
+        self.feed_errors = 0
+        self.posts_processed = 0
+        self.post_errors = 0
+        # Full analyses, and those the fast model escalated to the strong one
+        self.posts_analyzed = 0
+        self.posts_escalated = 0
+        self.calendar_writes = 0
+        self.calendar_writes_skipped = 0
+        self.cost_usd = 0.0
+        self.exports = 0
+        self.export_errors = 0
+        self.last_export_at: float | None = None
+        # Pushed posts (see ingest.py): time from receipt / publication to decision
+        self.pushed_posts_processed = 0
+        self.last_queue_latency_seconds: float | None = None
+        self.last_publish_latency_seconds: float | None = None
+        # Per-post latency over the last 500 posts
+        self.post_p50_seconds: float | None = None
+        self.post_p95_seconds: float | None = None
+        self.post_p99_seconds: float | None = None
+        self._post_seconds: deque[float] = deque(maxlen=500)
+        self._lock = threading.Lock()
+
+    def record_poll(self, stats: "ProcessStats | None", seconds: float) -> None:
+        """Fold one poll's ``ProcessStats`` (or None on failure) into the totals."""
+        with self._lock:
+            self.polls += 1
+            self.last_poll_at = time.time()
+            self.last_poll_seconds = seconds
+            if stats is None:
+                self.poll_errors += 1
+                return
+            self.last_success_at = self.last_poll_at
+            self.feeds_not_modified += stats.feeds_not_modified
+            self.feed_errors += stats.feed_errors
+            self.posts_processed += stats.posts_processed
+            self.post_errors += stats.post_errors
+            self.posts_analyzed += stats.posts_analyzed
+            self.posts_escalated += stats.posts_escalated
+            self.calendar_writes += stats.calendar_writes
+            self.calendar_writes_skipped += stats.calendar_writes_skipped
+            self.cost_usd += stats.cost_usd
+            for queued, published in stats.ingest_latencies:
+                self.pushed_posts_processed += 1
+                self.last_queue_latency_seconds = queued
+                if published is not None:
+                    self.last_publish_latency_seconds = published
+            self._post_seconds.extend(stats.post_seconds)
+            if self._post_seconds:
+                recent = list(self._post_seconds)
+                self.post_p50_seconds = latency.percentile(recent, 50)
+                self.post_p95_seconds = latency.percentile(recent, 95)
+                self.post_p99_seconds = latency.percentile(recent, 99)
+
+    def record_export(self, ok: bool) -> None:
+        with self._lock:
+            if ok:
+                self.exports += 1
+                self.last_export_at = time.time()
+            else:
+                self.export_errors += 1
+
+    def is_healthy(self, stale_after: float) -> bool:
+        """True if a poll succeeded within ``stale_after`` seconds (or we just started)."""
+        reference = self.last_success_at or self.started_at
+        return time.time() - reference < stale_after
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                key: value
+                for key, value in vars(self).items()
+                if not key.startswith("_")
+            }
+
+    def prometheus(self, extra: dict | None = None) -> str:
+        """Render counters (plus ``extra`` ones) in the Prometheus text format."""
+        lines = []
+        for key, value in {**self.snapshot(), **(extra or {})}.items():
+            if value is None:
+                continue
+            name = f"calsync_{key}"
+            gauge = key.endswith(("_at", "_seconds", "_open"))
+            kind = "gauge" if gauge else "counter"
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {float(value):g}")
+        return "\n".join(lines) + "\n"
+
+
+def make_server(
+    metrics: ServeMetrics,
+    host: str,
+    port: int,
+    stale_after: float,
+    receiver=None,
+) -> HTTPServer:
+    """HTTP server for ``/healthz`` (JSON, 503 when polling has stalled) and ``/metrics``.
+
+    With a ``receiver`` (see ingest.py) it also accepts pushed posts. Requests
+    are handled one at a time on the server thread, which keeps database
+    access from this server on a single connection.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        # Don't let a stalled client hold the (single) server thread
+        timeout = 10
+
+        def do_GET(self):
+            if receiver is not None and receiver.handles(self.path):
+                status, body = receiver.handle_get(self.path)
+                self._send(status, "text/plain", body)
+            elif self.path == "/healthz":
+                healthy = metrics.is_healthy(stale_after)
+                body = json.dumps(
+                    {"status": "ok" if healthy else "stale", **metrics.snapshot()}
+                ).encode()
+                self._send(200 if healthy else 503, "application/json", body)
+            elif self.path == "/metrics":
+                extra = {**ratelimit.counters(), **latency.counters()}
+                if receiver is not None:
+                    extra.update(receiver.counters())
+                body = metrics.prometheus(extra).encode()
+                self._send(200, "text/plain; version=0.0.4", body)
+            else:
+                self._send(404, "text/plain", b"not found\n")
+
+        def do_POST(self):
+            if receiver is None or not receiver.handles(self.path):
+                self._send(404, "text/plain", b"not found\n")
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > receiver.max_body_bytes:
+                self._send(413, "text/plain", b"body too large\n")
+                return
+            body = self.rfile.read(length)
+            status, response = receiver.handle_post(self.path, self.headers, body)
+            self._send(status, "application/json", response)
+
+        def _send(self, status: int, content_type: str, body: bytes) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return HTTPServer((host, port), Handler)
+
+
+def run_loop(
+    poll: Callable[[], "ProcessStats"],
+    export: Callable[[], None] | None,
+    metrics: ServeMetrics,
+    interval: float,
+    export_every: float,
+    stop: threading.Event,
+    log: Callable[[str], None] = print,
+    wake: threading.Event | None = None,
+) -> None:
+    """Poll until ``stop`` is set.
+
+    A failing poll or export is logged and counted, never fatal: the next
+    interval tries again. Setting ``wake`` starts the next poll early (the
+    receiver does this when posts are pushed).
+    """
+    last_export = float("-inf")
+    while not stop.is_set():
+        started = time.monotonic()
+        stats: ProcessStats | None
+        try:
+            stats = poll()
+        except Exception as e:
+            log(f"Poll failed: {e}")
+            stats = None
+        metrics.record_poll(stats, time.monotonic() - started)
+
+        wrote = False
+        if stats is not None:
+            wrote = stats.calendar_writes > 0
+        if export and (wrote or time.monotonic() - last_export >= export_every):
+            try:
+                export()
+                metrics.record_export(True)
+            except Exception as e:
+                log(f"Export failed: {e}")
+                metrics.record_export(False)
+            last_export = time.monotonic()
+
+        remaining = max(0.0, interval - (time.monotonic() - started))
+        if wake is None:
+            stop.wait(remaining)
+        else:
+            wake.wait(remaining)
+            wake.clear()
+
+
+def install_signal_handlers(
+    stop: threading.Event, wake: threading.Event | None = None
+) -> None:
+    """Finish the current poll and exit on SIGTERM/SIGINT."""
+
+    def handle(signum, frame):
+        stop.set()
+        if wake is not None:
+            wake.set()
+
+    signal.signal(signal.SIGTERM, handle)
+    signal.signal(signal.SIGINT, handle)
@@ -0,0 +1,120 @@
+"""Split ``calsync process`` across workers and fold their results together.
+
+``calsync process --shard i/N`` only handles posts whose guid hashes to
+shard ``i``, so N workers (a CI matrix, several machines) each take a
+disjoint slice of the backlog and never write a calendar event for the same
+post. With ``--segment PATH`` a worker writes its results as a segment (a
+changeset of its unpushed rows, see ``db.export_changes``), and
+``calsync merge`` applies any number of segments to one database. The merge
+is deterministic: the result doesn't depend on segment order, and merging a
+segment twice changes nothing.
+"""
+
+import hashlib
+import re
+from collections import defaultdict
+from pathlib import Path
+
+from . import db, dbsync
+
+
+def parse_shard(spec: str) -> tuple[int, int]:
+    """Parse ``"i/N"`` (0 <= i < N) into ``(i, N)``."""
+    match = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", spec)
+    if not match:
+        raise ValueError(f"Expected i/N (e.g. 0/4), got {spec!r}")
+    index, count = int(match.group(1)), int(match.group(2))
+    if count < 1 or index >= count:
+        raise ValueError(f"Shard index must be in 0..{count - 1}, got {spec!r}")
+    return index, count
+
+
+def shard_of(post_guid: str, count: int) -> int:
+    """Stable shard number for a post (the same on every machine and run)."""
+    digest = hashlib.sha256(post_guid.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count
+
+
+def _empty_changeset() -> dict:
+    return {
+        "format": db.CHANGESET_FORMAT,
+        "outbox": [],
+        "deleted": [],
+        "archived": [],
+        "contents": [],
+        "posts": [],
+        "decisions": [],
+        "feed_state": [],
+    }
+
+
+def write_segment(path: Path) -> int:
+    """Write this database's unpushed rows to ``path``; return the decision count."""
+    changeset = db.export_changes() or _empty_changeset()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_bytes(dbsync.encode_changeset(changeset))
+    tmp_path.replace(path)
+    return len(changeset["decisions"])
+
+
+class MergeResult:
+    """Result of merging segments."""
+
+    def __init__(self, segments: int, decisions: int, added: int, duplicates: list):
+        self.segments = segments
+        self.decisions = decisions
+        self.added = added
+        # (event_date, event_title, [post_guid, ...]) created by more than one post
+        self.duplicates = duplicates
+
+
+def combine(changesets: list[dict]) -> dict:
+    """Union changesets into one, ordered independently of the input order."""
+    combined = _empty_changeset()
+    for key in ("deleted", "archived", "contents", "posts", "decisions", "feed_state"):
+        rows = [row for changeset in changesets for row in changeset[key]]
+        # Sort on the full row so ties between copies are broken the same way
+        combined[key] = sorted(rows, key=lambda row: repr(row))
+    combined["deleted"] = sorted(set(combined["deleted"]))
+    combined["decisions"].sort(key=lambda d: (d["processed_at"], d["uid"]))
+    combined["outbox"] = sorted(
+        {tuple(e) for changeset in changesets for e in changeset["outbox"]}
+    )
+    return combined
+
+
+def find_duplicate_creates(changeset: dict) -> list[tuple[str, str, list[str]]]:
+    """Events created from more than one post, which separate shards can't see.
+
+    Matched on date and case/whitespace-normalized title.
+    """
+    by_event: dict[tuple[str, str], set[str]] = defaultdict(set)
+    titles: dict[tuple[str, str], str] = {}
+    for d in changeset["decisions"]:
+        if d["decision"] != "create" or not d["event_date"] or not d["event_title"]:
+            continue
+        key = (d["event_date"], " ".join(d["event_title"].lower().split()))
+        by_event[key].add(d["post_guid"])
+        titles.setdefault(key, d["event_title"])
+    return [
+        (key[0], titles[key], sorted(guids))
+        for key, guids in sorted(by_event.items())
+        if len(guids) > 1
+    ]
+
+
+def merge_segments(paths: list[Path]) -> MergeResult:
+    """Apply segments to the current database and queue them for the next push."""
+    changesets = [dbsync.decode_changeset(path.read_bytes()) for path in paths]
+    combined = combine(changesets)
+    with db.transaction():
+        added = db.apply_changes(combined)
+        # Segment rows haven't been pushed anywhere yet
+        db.requeue(combined["outbox"])
+    return MergeResult(
+        segments=len(paths),
+        decisions=len(combined["decisions"]),
+        added=added,
+        duplicates=find_duplicate_creates(combined),
+    )
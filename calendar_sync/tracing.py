@@ -0,0 +1,435 @@
+"""Span tracing for `process` runs (``process --trace``, ``calsync profile``).
+
+While a tracer is running, the pipeline records a span for each feed fetch
+and parse, pre-filter call, post, model turn, tool call and image download.
+Every public function of ``db``, ``calendar`` and ``batching`` is wrapped
+too, so SQLite and Calendar API time show up under whatever called them.
+When no tracer is running, ``span`` and ``traced`` do nothing and the
+modules are left unwrapped.
+
+A span's parent is the innermost span open on the same thread; work handed
+to another thread keeps its parent through ``carry``. Traces are written as
+Chrome trace events (chrome://tracing, Perfetto) or OTLP-JSON, and both
+load back for ``calsync profile``.
+"""
+
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+FORMATS = ("chrome", "otlp")
+
+# Public functions that don't do I/O or that return context managers, left
+# unwrapped to keep traces readable
+SKIP = {
+    "db": {
+        "close",
+        "compress_content",
+        "connect",
+        "content_hash",
+        "decompress_content",
+        "get_db_path",
+        "is_full_scan",
+        "transaction",
+    },
+    "calendar": {
+        "event_changes",
+        "event_id_for",
+        "get_calendar_id",
+        "get_credentials_path",
+        "new_http",
+        "on_own_connection",
+        "preview_event",
+        "write_request",
+    },
+    "batching": {"is_retryable"},
+}
+
+
+class Span:
+    """One timed operation; times are Unix nanoseconds."""
+
+    def __init__(
+        self,
+        name: str,
+        span_id: str,
+        parent_id: str | None,
+        thread: str,
+        start_ns: int,
+        attrs: dict,
+    ):
+        self.name = name
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.thread = thread
+        self.start_ns = start_ns
+        self.end_ns = start_ns
+        self.attrs = attrs
+
+    @property
+    def seconds(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e9
+
+
+class Tracer:
+    """Collects the finished spans of every thread."""
+
+    def __init__(self):
+        self.trace_id = uuid.uuid4().hex
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Wall-clock start, advanced by the monotonic clock
+        self._epoch_ns = time.time_ns()
+        self._perf_ns = time.perf_counter_ns()
+
+    def _now_ns(self) -> int:
+        return self._epoch_ns + time.perf_counter_ns() - self._perf_ns
+
+    def _stack(self) -> list[Span]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def current(self) -> Span | None:
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def span(self, name: str, attrs: dict) -> Iterator[Span]:
+        parent = self.current()
+        span = Span(
+            name,
+            uuid.uuid4().hex[:16],
+            parent.span_id if parent else None,
+            threading.current_thread().name,
+            self._now_ns(),
+            attrs,
+        )
+        stack = self._stack()
+        stack.append(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.attrs["error"] = type(e).__name__
+            raise
+        finally:
+            span.end_ns = self._now_ns()
+            stack.pop()
+            with self._lock:
+                self.spans.append(span)
+
+    @contextmanager
+    def adopt(self, parent: Span | None) -> Iterator[None]:
+        """Make ``parent`` (from another thread) the parent of this thread's spans."""
+        stack = self._stack()
+        if parent is not None:
+            stack.append(parent)
+        try:
+            yield
+        finally:
+            if parent is not None:
+                stack.pop()
+
+
+_tracer: Tracer | None = None
+_wrapped: list[tuple[object, str, Callable]] = []
+
+
+def start() -> Tracer:
+    """Start tracing, wrapping the ``db``, ``calendar`` and ``batching`` functions."""
+    global _tracer
+    from . import batching, calendar, db
+
+    stop()
+    _tracer = Tracer()
+    for module in (db, calendar, batching):
+        prefix = module.__name__.rsplit(".", 1)[-1]
+        for attr, fn in list(vars(module).items()):
+            if (
+                attr.startswith("_")
+                or attr in SKIP.get(prefix, ())
+                or not inspect.isfunction(fn)
+                or fn.__module__ != module.__name__
+            ):
+                continue
+            setattr(module, attr, traced(f"{prefix}.{attr}")(fn))
+            _wrapped.append((module, attr, fn))
+    return _tracer
+
+
+def stop() -> Tracer | None:
+    """Stop tracing and unwrap the functions; returns the finished tracer."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    while _wrapped:
+        module, attr, fn = _wrapped.pop()
+        setattr(module, attr, fn)
+    return tracer
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Span | None]:
+    """Time the block as a span (None, and no cost, when not tracing)."""
+    tracer = _tracer
+    if tracer is None:
+        yield None
+        return
+    with tracer.span(name, attrs) as s:
+        yield s
+
+
+def annotate(**attrs) -> None:
+    """Add attributes to this thread's innermost open span, if tracing."""
+    tracer = _tracer
+    current = tracer.current() if tracer else None
+    if current is not None:
+        current.attrs.update(attrs)
+
+
+def traced(name: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """Decorator: each call of the function is a span called ``name``."""
+
+    def decorate(fn: Callable[..., T]) -> Callable[..., T]:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs) -> T:
+            tracer = _tracer
+            if tracer is None:
+                return fn(*args, **kwargs)
+            with tracer.span(name, {}):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def carry(fn: Callable[..., T]) -> Callable[..., T]:
+    """``fn``, recording its spans under the caller's span when run on another thread."""
+    tracer = _tracer
+    if tracer is None:
+        return fn
+    parent = tracer.current()
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs) -> T:
+        with tracer.adopt(parent):
+            return fn(*args, **kwargs)
+
+    return run
+
+
+def get_traces_dir() -> Path:
+    """Get the traces directory path (``CALSYNC_TRACES_DIR`` overrides it)."""
+    if path := os.getenv("CALSYNC_TRACES_DIR"):
+        return Path(path)
+    return Path(__file__).parent.parent / "traces"
+
+
+def _attr_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_chrome(tracer: Tracer) -> dict:
+    """Trace Event Format: one complete ("X") event per span, times in µs."""
+    pid = os.getpid()
+    threads = {
+        name: i for i, name in enumerate(dict.fromkeys(s.thread for s in tracer.spans))
+    }
+    events: list[dict] = [
+        {
+            "name": "thread_name",
+            "ph": "M",
+            "pid": pid,
+            "tid": tid,
+            "args": {"name": name},
+        }
+        for name, tid in threads.items()
+    ]
+    for s in tracer.spans:
+        events.append(
+            {
+                "name": s.name,
+                "ph": "X",
+                "ts": s.start_ns / 1000,
+                "dur": (s.end_ns - s.start_ns) / 1000,
+                "pid": pid,
+                "tid": threads[s.thread],
+                "args": {"span_id": s.span_id, "parent_id": s.parent_id, **s.attrs},
+            }
+        )
+    return {"traceEvents": events, "otherData": {"trace_id": tracer.trace_id}}
+
+
+def to_otlp(tracer: Tracer) -> dict:
+    """OTLP-JSON (as sent to a collector's /v1/traces)."""
+    spans = []
+    for s in tracer.spans:
+        attrs = {"thread.name": s.thread, **s.attrs}
+        spans.append(
+            {
+                "traceId": tracer.trace_id,
+                "spanId": s.span_id,
+                **({"parentSpanId": s.parent_id} if s.parent_id else {}),
+                "name": s.name,
+                "kind": 1,
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns),
+                "attributes": [
+                    {"key": k, "value": _attr_value(v)} for k, v in attrs.items()
+                ],
+            }
+        )
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        {"key": "service.name", "value": {"stringValue": "calsync"}}
+                    ]
+                },
+                "scopeSpans": [{"scope": {"name": "calendar_sync"}, "spans": spans}],
+            }
+        ]
+    }
+
+
+def write(tracer: Tracer, fmt: str = "chrome", directory: Path | None = None) -> Path:
+    """Write the trace to ``<traces dir>/<UTC time>.<fmt>.json``; returns its path."""
+    directory = directory or get_traces_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+    path = directory / f"{stamp}.{fmt}.json"
+    data = to_chrome(tracer) if fmt == "chrome" else to_otlp(tracer)
+    path.write_text(json.dumps(data))
+    return path
+
+
+def _otlp_value(value: dict):
+    if "intValue" in value:
+        return int(value["intValue"])
+    return next(iter(value.values()), None)
+
+
+def load(path: Path) -> list[Span]:
+    """Read a trace written by ``write`` (either format)."""
+    data = json.loads(path.read_text())
+    spans = []
+    if "traceEvents" in data:
+        threads = {
+            e["tid"]: e["args"]["name"]
+            for e in data["traceEvents"]
+            if e.get("ph") == "M" and e.get("name") == "thread_name"
+        }
+        for e in data["traceEvents"]:
+            if e.get("ph") != "X":
+                continue
+            attrs = dict(e.get("args", {}))
+            span_id = attrs.pop("span_id", None) or uuid.uuid4().hex[:16]
+            parent_id = attrs.pop("parent_id", None)
+            start_ns = int(e["ts"] * 1000)
+            span = Span(
+                e["name"],
+                span_id,
+                parent_id,
+                threads.get(e["tid"], str(e["tid"])),
+                start_ns,
+                attrs,
+            )
+            span.end_ns = start_ns + int(e["dur"] * 1000)
+            spans.append(span)
+        return spans
+    for resource in data.get("resourceSpans", []):
+        for scope in resource.get("scopeSpans", []):
+            for s in scope.get("spans", []):
+                attrs = {
+                    a["key"]: _otlp_value(a["value"]) for a in s.get("attributes", [])
+                }
+                span = Span(
+                    s["name"],
+                    s["spanId"],
+                    s.get("parentSpanId") or None,
+                    str(attrs.pop("thread.name", "")),
+                    int(s["startTimeUnixNano"]),
+                    attrs,
+                )
+                span.end_ns = int(s["endTimeUnixNano"])
+                spans.append(span)
+    return spans
+
+
+def find_trace(run: str) -> Path:
+    """A trace file by path, by (a prefix of) its run time, or "latest"."""
+    path = Path(run)
+    if path.is_file():
+        return path
+    traces = sorted(get_traces_dir().glob("*.json"))
+    if run != "latest":
+        traces = [p for p in traces if p.name.startswith(run)]
+    if not traces:
+        raise FileNotFoundError(f"No trace matching {run!r} in {get_traces_dir()}")
+    return traces[-1]
+
+
+class Node:
+    """The spans with one name under one parent, added up (a flame graph row)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.seconds = 0.0
+        self.self_seconds = 0.0
+        self.children: dict[str, "Node"] = {}
+
+    def add(self, span: Span, children_of: dict[str, list[Span]]) -> None:
+        kids = children_of.get(span.span_id, [])
+        self.count += 1
+        self.seconds += span.seconds
+        self.self_seconds += max(0.0, span.seconds - sum(k.seconds for k in kids))
+        for kid in kids:
+            self.children.setdefault(kid.name, Node(kid.name)).add(kid, children_of)
+
+
+def children_by_parent(spans: list[Span]) -> dict[str, list[Span]]:
+    children: dict[str, list[Span]] = {}
+    for s in sorted(spans, key=lambda s: s.start_ns):
+        if s.parent_id:
+            children.setdefault(s.parent_id, []).append(s)
+    return children
+
+
+def stage_totals(spans: list[Span]) -> list[Node]:
+    """One row per span name over the whole run, by self time (largest first).
+
+    A span's total doesn't count spans of the same name inside it again.
+    """
+    by_id = {s.span_id: s for s in spans}
+    children_of = children_by_parent(spans)
+    totals: dict[str, Node] = {}
+    for s in spans:
+        node = totals.setdefault(s.name, Node(s.name))
+        node.count += 1
+        kids = children_of.get(s.span_id, [])
+        node.self_seconds += max(0.0, s.seconds - sum(k.seconds for k in kids))
+        parent = by_id.get(s.parent_id or "")
+        while parent is not None and parent.name != s.name:
+            parent = by_id.get(parent.parent_id or "")
+        if parent is None:
+            node.seconds += s.seconds
+    return sorted(totals.values(), key=lambda n: n.self_seconds, reverse=True)
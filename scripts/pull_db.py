@@ -1,39 +1,91 @@
 #!/usr/bin/env python3
-"""Pull database from S3-compatible storage (GCP bucket via interoperability API)."""
+"""Pull database from S3-compatible storage (GCP bucket via interoperability API).
 
+Downloads the base snapshot only when the local database isn't already a copy
+of it, then applies the changesets pushed since; see calendar_sync/dbsync.py.
+"""
+
+import argparse
+import os
 import sys
+import time
 from pathlib import Path
 
 from botocore.exceptions import ClientError
 
-from s3_config import BUCKET_NAME, DB_KEY, LOCAL_DB_PATH, get_s3_client
+from s3_config import (
+    ARCHIVE_PREFIX,
+    BUCKET_NAME,
+    DB_PREFIX,
+    LOCAL_ARCHIVE_DIR,
+    LOCAL_DB_PATH,
+    get_s3_client,
+)
+
+from calendar_sync import dbsync
+
+
+def pull_archives(store: dbsync.RemoteStore) -> None:
+    """Download archive files that aren't present locally (they never change)."""
+    archive_dir = Path(LOCAL_ARCHIVE_DIR)
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    local = {p.name for p in archive_dir.iterdir()}
+    missing = sorted(store.list(ARCHIVE_PREFIX) - local)
+    for name in missing:
+        print(f"Downloading archive {name}...")
+        data = store.get(ARCHIVE_PREFIX + name)
+        if data is None:
+            continue
+        tmp_path = archive_dir / f".{name}.tmp"
+        tmp_path.write_bytes(data)
+        tmp_path.replace(archive_dir / name)
+    print(f"✓ {len(missing)} archive file(s) downloaded, {len(local)} already local")
 
 
 def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--archives",
+        action="store_true",
+        help="Also download archive files missing locally (needed for `calsync details` on archived posts)",
+    )
+    args = parser.parse_args()
+
     local_path = Path(LOCAL_DB_PATH)
 
     # Ensure data directory exists
     local_path.parent.mkdir(parents=True, exist_ok=True)
+    os.environ.setdefault("CALSYNC_DB_PATH", str(local_path.resolve()))
 
     # Get S3 client
     s3 = get_s3_client()
+    store = dbsync.RemoteStore(s3, BUCKET_NAME, DB_PREFIX)
 
+    start = time.perf_counter()
     try:
-        print(f"Downloading s3://{BUCKET_NAME}/{DB_KEY} to {local_path}...")
-        s3.download_file(BUCKET_NAME, DB_KEY, str(local_path))
-        print(f"✓ Successfully downloaded database to {local_path}")
+        print(f"Pulling s3://{BUCKET_NAME}/{DB_PREFIX} to {local_path}...")
+        result = dbsync.pull(store)
+        print(f"✓ {result.detail}")
     except ClientError as e:
-        if e.response["Error"]["Code"] == "404":
-            print(
-                f"No existing database found at s3://{BUCKET_NAME}/{DB_KEY}, starting fresh"
-            )
-        else:
-            print(f"Error downloading database: {e}")
-            sys.exit(1)
+        print(f"Error downloading database: {e}")
+        sys.exit(1)
     except Exception as e:
         print(f"Unexpected error: {e}")
         sys.exit(1)
 
+    if args.archives:
+        try:
+            pull_archives(store)
+        except ClientError as e:
+            print(f"Error downloading archives: {e}")
+            sys.exit(1)
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"Transferred {store.bytes_down:,} bytes down, "
+        f"{store.bytes_up:,} bytes up in {elapsed:.2f}s"
+    )
+
 
 if __name__ == "__main__":
     main()
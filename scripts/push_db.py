@@ -1,30 +1,72 @@
 #!/usr/bin/env python3
-"""Push database to S3-compatible storage (GCP bucket via interoperability API)."""
+"""Push database changes to S3-compatible storage (GCP bucket via interoperability API).
 
+Only rows changed since the last push are uploaded, as a compressed changeset;
+see calendar_sync/dbsync.py.
+"""
+
+import argparse
+import os
 import sys
+import time
 from pathlib import Path
 
 from botocore.exceptions import ClientError
 
-from s3_config import BUCKET_NAME, DB_KEY, LOCAL_DB_PATH, get_s3_client
+from s3_config import (
+    ARCHIVE_PREFIX,
+    BUCKET_NAME,
+    DB_PREFIX,
+    LOCAL_ARCHIVE_DIR,
+    LOCAL_DB_PATH,
+    get_s3_client,
+)
+
+from calendar_sync import dbsync
+
+
+def push_archives(store: dbsync.RemoteStore) -> None:
+    """Upload archive files the bucket doesn't have yet (they never change)."""
+    uploaded = dbsync.push_archives(store, Path(LOCAL_ARCHIVE_DIR), ARCHIVE_PREFIX)
+    for name in uploaded:
+        print(f"Uploaded archive {name}")
+    if uploaded:
+        print(f"✓ {len(uploaded)} new archive file(s) uploaded")
 
 
 def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--snapshot",
+        action="store_true",
+        help="Upload a full base snapshot instead of a changeset",
+    )
+    args = parser.parse_args()
+
     local_path = Path(LOCAL_DB_PATH)
 
     # Check if database file exists
     if not local_path.exists():
         print(f"Error: Database file not found at {local_path}")
         sys.exit(1)
+    os.environ.setdefault("CALSYNC_DB_PATH", str(local_path.resolve()))
 
     # Get S3 client
     s3 = get_s3_client()
+    store = dbsync.RemoteStore(s3, BUCKET_NAME, DB_PREFIX)
 
     try:
-        print(f"Uploading {local_path} to s3://{BUCKET_NAME}/{DB_KEY}...")
-        with open(local_path, "rb") as f:
-            s3.put_object(Bucket=BUCKET_NAME, Key=DB_KEY, Body=f)
-        print(f"✓ Successfully uploaded database to s3://{BUCKET_NAME}/{DB_KEY}")
+        start = time.perf_counter()
+        # Archives first: the DB changes about to be uploaded may point at them
+        push_archives(store)
+        print(f"Pushing {local_path} to s3://{BUCKET_NAME}/{DB_PREFIX}...")
+        result = dbsync.push(store, snapshot=args.snapshot)
+        elapsed = time.perf_counter() - start
+        print(f"✓ {result.detail}")
+        print(
+            f"Transferred {store.bytes_up:,} bytes up, "
+            f"{store.bytes_down:,} bytes down in {elapsed:.2f}s"
+        )
     except ClientError as e:
         print(f"Error uploading database: {e}")
         sys.exit(1)
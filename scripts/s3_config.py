@@ -12,8 +12,13 @@ load_dotenv()
 
 # S3/GCS configuration
 BUCKET_NAME = "bikegroups-org"
-DB_KEY = "calendar_sync_db/calendar_sync.db"
+# Base snapshot, manifest and changesets (see calendar_sync/dbsync.py)
+DB_PREFIX = "calendar_sync_db/"
+DB_KEY = DB_PREFIX + "calendar_sync.db"
 LOCAL_DB_PATH = "data/calendar_sync.db"
+# Immutable archive files written by `calsync archive` (relative to DB_PREFIX)
+ARCHIVE_PREFIX = "archive/"
+LOCAL_ARCHIVE_DIR = "data/archive"
 
 
 def get_s3_client():
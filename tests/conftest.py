@@ -0,0 +1,14 @@
+"""Fixtures shared by the test modules."""
+
+import pytest
+
+from calendar_sync import db
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """Point the db module at a fresh database file for each test."""
+    monkeypatch.setenv("CALSYNC_DB_PATH", str(tmp_path / "calendar_sync.db"))
+    db.init_db()
+    yield
+    db.close()
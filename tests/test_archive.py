@@ -0,0 +1,93 @@
+"""Tests for archiving old processing history out of the live DB."""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from calendar_sync import archive, db
+from calendar_sync.models import Action
+
+
+pytestmark = pytest.mark.usefixtures("temp_db")
+
+
+def _age(post_guid: str, days: int) -> None:
+    """Backdate every decision for a post by ``days``."""
+    when = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+    with db.transaction() as conn:
+        conn.execute(
+            """
+            UPDATE decisions SET processed_at = ?
+            WHERE post_id = (SELECT id FROM posts WHERE post_guid = ?)
+            """,
+            (when, post_guid),
+        )
+
+
+def test_archives_old_posts_and_keeps_guids_hot() -> None:
+    db.record_processed("old", Action.IGNORE, post_content="<p>old</p>", cost_usd=0.5)
+    db.record_processed("new", Action.IGNORE, post_content="<p>new</p>", cost_usd=0.25)
+    _age("old", 200)
+
+    result = archive.archive_older_than(90)
+
+    assert result.posts == 1
+    assert len(result.files) == 1
+    assert (archive.get_archive_dir() / result.files[0]).exists()
+    assert db.get_stats()["posts"] == 1
+    assert db.is_processed("old")
+    assert db.get_processed_guids(["old", "new", "other"]) == {"old", "new"}
+    assert db.get_total_cost() == pytest.approx(0.75)
+
+
+def test_get_processed_falls_back_to_archive() -> None:
+    db.record_processed("old", Action.FLAG, post_content="<p>old</p>", reasoning="why")
+    _age("old", 200)
+    archive.archive_older_than(90)
+
+    rows = db.get_processed("old")
+    assert len(rows) == 1
+    assert rows[0]["reasoning"] == "why"
+    assert rows[0]["post_content"] == "<p>old</p>"
+
+
+def test_missing_archive_file_raises() -> None:
+    db.record_processed("old", Action.IGNORE)
+    _age("old", 200)
+    result = archive.archive_older_than(90)
+    (archive.get_archive_dir() / result.files[0]).unlink()
+
+    with pytest.raises(FileNotFoundError):
+        db.get_processed("old")
+
+
+def test_posts_with_calendar_events_stay_hot() -> None:
+    db.record_processed("event", Action.CREATE, calendar_event_id="evt-1")
+    _age("event", 400)
+
+    assert archive.archive_older_than(90).posts == 0
+    assert db.get_rows_by_calendar_event_ids(["evt-1"])
+
+
+def test_archive_files_are_never_rewritten() -> None:
+    db.record_processed("a", Action.IGNORE)
+    _age("a", 200)
+    first = archive.archive_older_than(90).files
+
+    db.record_processed("b", Action.IGNORE)
+    _age("b", 200)
+    second = archive.archive_older_than(90).files
+
+    assert first != second
+    assert db.get_processed("a") and db.get_processed("b")
+
+
+def test_dry_run_moves_nothing() -> None:
+    db.record_processed("old", Action.IGNORE)
+    _age("old", 200)
+
+    result = archive.archive_older_than(90, dry_run=True)
+
+    assert result.posts == 1
+    assert db.get_stats()["posts"] == 1
+    assert not archive.get_archive_dir().exists()
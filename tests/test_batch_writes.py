@@ -0,0 +1,182 @@
+"""Tests for queued calendar writes sent in batches by journal.flush()."""
+
+import json
+import os
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+os.environ.setdefault("CALENDAR_ID", "test-calendar-id")
+
+from calendar_sync import calendar, db, journal  # noqa: E402
+from calendar_sync.models import Action, EventDetails  # noqa: E402
+
+
+def _error(status: int, reason: str = "") -> HttpError:
+    content = json.dumps({"error": {"errors": [{"reason": reason}]}}).encode()
+    return HttpError(httplib2.Response({"status": status}), content)
+
+
+class FakeRequest:
+    def __init__(self, method: str, event_id: str, body: dict | None = None):
+        self.method = method
+        self.event_id = event_id
+        self.body = body or {}
+
+
+class FakeBatch:
+    def __init__(self, service: "FakeService", callback):
+        self.service = service
+        self.callback = callback
+        self.requests: list[tuple[str, FakeRequest]] = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self, http=None):
+        self.service.batches.append([r.method for _, r in self.requests])
+        for request_id, request in self.requests:
+            try:
+                self.callback(request_id, self.service.apply(request), None)
+            except HttpError as e:
+                self.callback(request_id, None, e)
+
+
+class FakeService:
+    """Just enough of the Calendar API for journal.flush()."""
+
+    def __init__(self):
+        self.events_by_id: dict[str, dict] = {}
+        self.batches: list[list[str]] = []
+        # Writes to refuse with 403 rateLimitExceeded before accepting any
+        self.throttle = 0
+
+    def events(self):
+        return self
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(self, callback)
+
+    def get(self, calendarId, eventId):
+        return FakeRequest("get", eventId)
+
+    def insert(self, calendarId, body):
+        return FakeRequest("insert", body["id"], body)
+
+    def patch(self, calendarId, eventId, body):
+        return FakeRequest("patch", eventId, body)
+
+    def update(self, calendarId, eventId, body):
+        return FakeRequest("update", eventId, body)
+
+    def delete(self, calendarId, eventId):
+        return FakeRequest("delete", eventId)
+
+    def apply(self, request: FakeRequest):
+        current = self.events_by_id.get(request.event_id)
+        if request.method == "get":
+            if current is None:
+                raise _error(404)
+            return current
+        if self.throttle:
+            self.throttle -= 1
+            raise _error(403, "rateLimitExceeded")
+        if request.method == "insert":
+            event = {"status": "confirmed", **request.body}
+            self.events_by_id[request.event_id] = event
+            return event
+        if current is None:
+            raise _error(404)
+        if request.method == "delete":
+            current["status"] = "cancelled"
+            return None
+        current.update(request.body)
+        return current
+
+
+@pytest.fixture
+def service(temp_db, monkeypatch):
+    fake = FakeService()
+    monkeypatch.setattr(calendar, "get_calendar_service", lambda: fake)
+    return fake
+
+
+EVENT = EventDetails(title="Unity Ride", date="2026-06-06", time="10:00")
+
+
+def _defer(guid: str, action: Action, event_id: str, event=None) -> str:
+    record = db.ProcessedRecord(
+        post_guid=guid, decision=action, post_content="<p>x</p>", event=event
+    )
+    return journal.defer(action, event_id, event, record)
+
+
+def _flush() -> journal.FlushResult:
+    return journal.flush(http_factory=lambda: None, sleep=lambda seconds: None)
+
+
+def test_writes_are_queued_then_sent_in_batches(service) -> None:
+    service.events_by_id["old"] = {
+        "id": "old",
+        "summary": "Unity Ride",
+        "start": {"dateTime": "2026-06-06T15:00:00Z", "timeZone": "America/Chicago"},
+        "end": {"dateTime": "2026-06-06T17:00:00Z", "timeZone": "America/Chicago"},
+    }
+    service.events_by_id["gone"] = {"id": "gone", "status": "confirmed"}
+
+    assert _defer("p1", Action.CREATE, "new", EVENT) == "new"
+    _defer("p2", Action.UPDATE, "old", EVENT)
+    _defer("p3", Action.CANCEL, "gone")
+    # Nothing is sent or recorded until the flush
+    assert service.batches == []
+    assert not db.is_processed("p1")
+
+    result = _flush()
+
+    assert (result.sent, result.unchanged, result.failed) == (2, 1, 0)
+    assert service.batches == [["get", "get", "get"], ["insert", "delete"]]
+    assert service.events_by_id["gone"]["status"] == "cancelled"
+    assert all(db.is_processed(guid) for guid in ("p1", "p2", "p3"))
+    assert db.get_pending_intents() == []
+
+
+def test_rate_limited_writes_are_retried(service) -> None:
+    service.throttle = 2
+    for i in range(3):
+        _defer(f"p{i}", Action.CREATE, f"evt{i}", EVENT)
+
+    result = _flush()
+
+    assert (result.sent, result.failed) == (3, 0)
+    assert service.batches[1:] == [["insert"] * 3, ["insert"] * 2]
+
+
+def test_writes_to_one_event_keep_their_order(service) -> None:
+    _defer("p1", Action.CREATE, "evt1", EVENT)
+    _defer("p2", Action.CANCEL, "evt1")
+
+    _flush()
+
+    assert service.events_by_id["evt1"]["status"] == "cancelled"
+    assert db.is_processed("p1") and db.is_processed("p2")
+
+
+def test_rejected_write_drops_its_decision(service) -> None:
+    _defer("p1", Action.UPDATE, "missing", EVENT)
+
+    result = _flush()
+
+    assert result.dropped_guids == {"p1"}
+    assert not db.is_processed("p1")
+    assert db.get_pending_intents() == []
+
+
+def test_searches_see_queued_writes(service) -> None:
+    listed = [calendar.preview_event("gone", EVENT)]
+    _defer("p1", Action.CREATE, "new", EVENT)
+    _defer("p2", Action.CANCEL, "gone")
+
+    events = journal.overlay_pending(listed, lambda e: True)
+
+    assert [e.id for e in events] == ["new"]
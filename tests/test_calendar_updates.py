@@ -0,0 +1,103 @@
+"""Tests for minimal (PATCH) calendar updates."""
+
+import os
+
+import pytest
+
+os.environ.setdefault("CALENDAR_ID", "test-calendar-id")
+
+from calendar_sync import calendar  # noqa: E402
+from calendar_sync.models import EventDetails  # noqa: E402
+
+EVENT = EventDetails(
+    title="Spring Fair",
+    date="2026-05-02",
+    time="10:00",
+    end_time="14:00",
+    location="Town Square",
+)
+
+
+class FakeService:
+    """Records the events() calls update_event makes."""
+
+    def __init__(self):
+        self.calls: list[tuple[str, dict]] = []
+
+    def events(self):
+        return self
+
+    def _call(self, method: str, body: dict):
+        self.calls.append((method, body))
+        return self
+
+    def patch(self, calendarId, eventId, body):
+        return self._call("patch", body)
+
+    def update(self, calendarId, eventId, body):
+        return self._call("update", body)
+
+    def execute(self):
+        return {"id": "evt1"}
+
+
+@pytest.fixture
+def service(monkeypatch) -> FakeService:
+    fake = FakeService()
+    monkeypatch.setattr(calendar, "get_calendar_service", lambda: fake)
+    return fake
+
+
+def _current(monkeypatch, resource: dict | None) -> None:
+    monkeypatch.setattr(calendar, "get_event", lambda event_id: resource)
+
+
+def _resource(**overrides) -> dict:
+    # As the API returns it: UTC offsets, plus fields we never set
+    resource = {
+        "id": "evt1",
+        "status": "confirmed",
+        "summary": "Spring Fair",
+        "location": "Town Square",
+        "start": {"dateTime": "2026-05-02T15:00:00Z", "timeZone": "America/Chicago"},
+        "end": {"dateTime": "2026-05-02T19:00:00Z", "timeZone": "America/Chicago"},
+        "colorId": "5",
+    }
+    resource.update(overrides)
+    return resource
+
+
+def test_unchanged_update_is_skipped(service, monkeypatch) -> None:
+    _current(monkeypatch, _resource(description=""))
+    before = calendar.write_stats.unchanged
+
+    assert calendar.update_event("evt1", EVENT) == "evt1"
+    assert service.calls == []
+    assert calendar.write_stats.unchanged == before + 1
+
+
+def test_changed_fields_are_patched(service, monkeypatch) -> None:
+    _current(monkeypatch, _resource(location="Old Mill", description="Bring a chair"))
+
+    calendar.update_event("evt1", EVENT)
+
+    assert service.calls == [("patch", {"location": "Town Square", "description": ""})]
+
+
+def test_switch_to_all_day_clears_time(service, monkeypatch) -> None:
+    _current(monkeypatch, _resource())
+
+    calendar.update_event("evt1", EVENT.model_copy(update={"time": None}))
+
+    [(method, body)] = service.calls
+    assert method == "patch"
+    assert body["start"] == {"date": "2026-05-02", "dateTime": None}
+    assert set(body) == {"start", "end"}
+
+
+def test_missing_event_falls_back_to_full_update(service, monkeypatch) -> None:
+    _current(monkeypatch, None)
+
+    calendar.update_event("evt1", EVENT)
+
+    assert [method for method, _ in service.calls] == ["update"]
@@ -0,0 +1,74 @@
+"""Tests for periodic checkpoints during a process run."""
+
+import os
+import shlex
+import sys
+from datetime import datetime, timedelta, timezone
+
+
+os.environ.setdefault("CALENDAR_ID", "test-calendar-id")
+
+from calendar_sync import checkpoint, cli, db, prefilter, rss  # noqa: E402
+from calendar_sync.models import RssPost  # noqa: E402
+
+# Records how many decisions the pushed database file holds
+COUNT_DECISIONS = """
+import os, sqlite3, sys
+conn = sqlite3.connect(os.environ["CALSYNC_DB_PATH"])
+count = conn.execute("SELECT COUNT(*) FROM decisions").fetchone()[0]
+with open(sys.argv[1], "a") as f:
+    f.write(f"{count}\\n")
+"""
+
+
+def test_checkpoints_push_whole_decisions(temp_db, tmp_path, monkeypatch) -> None:
+    now = datetime.now(timezone.utc)
+    posts = [
+        RssPost(
+            guid=f"p{i}",
+            title=f"post {i}",
+            link=f"https://example.com/{i}",
+            content="not an event",
+            published=now - timedelta(hours=5 - i),
+        )
+        for i in range(5)
+    ]
+    monkeypatch.setattr(
+        rss, "fetch_feeds", lambda *a, **kw: [rss.FeedResult(posts, url="https://f")]
+    )
+    monkeypatch.setattr(
+        prefilter,
+        "prefilter_post",
+        lambda post, **kwargs: prefilter.PrefilterResult(False, 10, 1),
+    )
+    script = tmp_path / "push.py"
+    script.write_text(COUNT_DECISIONS)
+    pushed = tmp_path / "pushed.txt"
+    command = shlex.join([sys.executable, str(script), str(pushed)])
+
+    stats = cli.run_process(
+        ["https://f"], checkpoint_command=command, checkpoint_every=2
+    )
+
+    # After posts 2 and 4; the last one is pushed by the job's final push
+    assert pushed.read_text().split() == ["2", "4"]
+    assert stats.checkpoints == 2
+    assert db.is_processed("p4")
+
+
+def test_failed_push_is_reported_and_retried_next_time() -> None:
+    now = [0.0]
+    checkpointer = checkpoint.Checkpointer(
+        shlex.join([sys.executable, "-c", "raise SystemExit(3)"]),
+        every_posts=None,
+        every_seconds=60,
+        clock=lambda: now[0],
+    )
+
+    assert not checkpointer.post_done()
+    now[0] = 61
+    assert checkpointer.post_done()
+    error = checkpointer.push()
+    assert error is not None and error.startswith("exit 3")
+    assert not checkpointer.post_done()
+    assert checkpointer.failures == 1
@@ -0,0 +1,243 @@
+"""Tests for the SQLite processed-posts store."""
+
+import sqlite3
+import threading
+
+import pytest
+
+from calendar_sync import db
+from calendar_sync.models import Action
+
+
+pytestmark = pytest.mark.usefixtures("temp_db")
+
+
+# ---------------------------------------------------------------------------
+# get_processed_guids
+# ---------------------------------------------------------------------------
+
+
+def test_get_processed_guids_returns_processed_subset() -> None:
+    db.record_processed("a", Action.IGNORE)
+    db.record_processed("c", Action.CREATE, calendar_event_id="evt-c")
+    assert db.get_processed_guids(["a", "b", "c"]) == {"a", "c"}
+
+
+def test_get_processed_guids_empty_input() -> None:
+    assert db.get_processed_guids([]) == set()
+
+
+def test_get_processed_guids_multiple_decisions_one_guid() -> None:
+    db.record_processed("a", Action.CREATE, calendar_event_id="evt-1")
+    db.record_processed("a", Action.CREATE, calendar_event_id="evt-2")
+    assert db.get_processed_guids(["a"]) == {"a"}
+
+
+def test_get_processed_guids_spans_chunks() -> None:
+    guids = [f"guid-{i}" for i in range(db.IN_CHUNK_SIZE * 2 + 7)]
+    for guid in guids[::3]:
+        db.record_processed(guid, Action.IGNORE)
+    assert db.get_processed_guids(guids) == set(guids[::3])
+
+
+def test_get_processed_guids_matches_is_processed() -> None:
+    db.record_processed("a", Action.IGNORE)
+    guids = ["a", "b"]
+    assert db.get_processed_guids(guids) == {g for g in guids if db.is_processed(g)}
+
+
+# ---------------------------------------------------------------------------
+# feed_state
+# ---------------------------------------------------------------------------
+
+
+def test_feed_state_round_trip() -> None:
+    url = "https://feed.example.com/rss"
+    assert db.get_feed_state(url) is None
+
+    db.set_feed_state(url, '"v1"', "Wed, 01 Jan 2026 00:00:00 GMT")
+    db.set_feed_state(url, '"v2"', None)
+
+    state = db.get_feed_state(url)
+    assert state is not None
+    assert state["etag"] == '"v2"'
+    assert state["last_modified"] is None
+
+
+# ---------------------------------------------------------------------------
+# Connection management
+# ---------------------------------------------------------------------------
+
+
+def test_connection_uses_wal() -> None:
+    mode = db.connect().execute("PRAGMA journal_mode").fetchone()[0]
+    assert mode == "wal"
+
+
+def test_connection_reused_within_thread() -> None:
+    assert db.connect() is db.connect()
+
+
+def test_transaction_batches_writes() -> None:
+    with db.transaction():
+        db.record_processed("a", Action.IGNORE)
+        db.record_processed("b", Action.IGNORE)
+        # Not yet visible to another connection
+        other = sqlite3.connect(db.get_db_path())
+        assert other.execute("SELECT COUNT(*) FROM decisions").fetchone()[0] == 0
+        other.close()
+    assert db.get_processed_guids(["a", "b"]) == {"a", "b"}
+
+
+def test_transaction_rolls_back_on_error() -> None:
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            db.record_processed("a", Action.IGNORE)
+            raise RuntimeError("boom")
+    assert not db.is_processed("a")
+
+
+def test_writes_from_worker_threads() -> None:
+    errors: list[Exception] = []
+
+    def worker(n: int) -> None:
+        try:
+            for i in range(20):
+                db.record_processed(f"t{n}-{i}", Action.IGNORE)
+        except Exception as e:  # pragma: no cover - surfaced by the assert
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    guids = [f"t{n}-{i}" for n in range(4) for i in range(20)]
+    assert db.get_processed_guids(guids) == set(guids)
+
+
+def test_close_checkpoints_wal() -> None:
+    db.record_processed("a", Action.IGNORE)
+    db.close()
+    wal = db.get_db_path().with_name(db.get_db_path().name + "-wal")
+    assert not wal.exists() or wal.stat().st_size == 0
+    assert db.is_processed("a")
+
+
+def test_clear_processed() -> None:
+    db.record_processed("a", Action.IGNORE)
+    db.clear_processed()
+    assert db.get_history() == []
+
+
+# ---------------------------------------------------------------------------
+# Migrations
+# ---------------------------------------------------------------------------
+
+
+def test_fresh_db_is_at_latest_version() -> None:
+    assert db.get_schema_version() == len(db.MIGRATIONS)
+
+
+def test_migrate_is_idempotent() -> None:
+    assert db.migrate() == []
+
+
+def test_migrates_legacy_database(tmp_path, monkeypatch) -> None:
+    path = tmp_path / "legacy.db"
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE processed_posts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            post_guid TEXT NOT NULL,
+            processed_at TEXT NOT NULL,
+            decision TEXT NOT NULL,
+            calendar_event_id TEXT,
+            post_content TEXT,
+            reasoning TEXT,
+            input_tokens INTEGER,
+            output_tokens INTEGER,
+            cost_usd REAL,
+            post_title TEXT,
+            post_author TEXT,
+            post_time TEXT,
+            post_link TEXT,
+            event_title TEXT,
+            event_date TEXT,
+            event_time TEXT,
+            event_location TEXT
+        )
+    """)
+    for decision in ("create", "create"):
+        conn.execute(
+            "INSERT INTO processed_posts (post_guid, processed_at, decision, post_content) "
+            "VALUES ('old', '2025-01-01T00:00:00+00:00', ?, '<p>Two rides</p>')",
+            (decision,),
+        )
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setenv("CALSYNC_DB_PATH", str(path))
+    db.init_db()
+
+    assert db.get_schema_version() == len(db.MIGRATIONS)
+    assert db.is_processed("old")
+    rows = db.get_processed("old")
+    assert [r["id"] for r in rows] == [1, 2]
+    assert [r["post_content"] for r in rows] == ["<p>Two rides</p>"] * 2
+    assert db.get_stats()["post_contents"] == 1
+    db.record_processed("new", Action.IGNORE, post_extra={"k": "v"})
+    assert db.get_processed("new")[0]["post_extra"] == '{"k": "v"}'
+
+
+def test_no_full_table_scans() -> None:
+    for name, plan in db.explain_queries().items():
+        scans = [detail for detail in plan if db.is_full_scan(detail)]
+        assert scans == [], f"{name}: {scans}"
+
+
+# ---------------------------------------------------------------------------
+# Normalized storage
+# ---------------------------------------------------------------------------
+
+
+def test_multi_decision_post_stores_content_once() -> None:
+    content = "<p>Two rides this weekend</p>" * 50
+    db.record_processed("a", Action.CREATE, "evt-1", post_content=content)
+    db.record_processed("a", Action.CREATE, "evt-2", post_content=content)
+
+    stats = db.get_stats()
+    assert stats["posts"] == 1
+    assert stats["decisions"] == 2
+    assert stats["post_contents"] == 1
+    assert stats["content_compressed_bytes"] < len(content)
+    assert [r["post_content"] for r in db.get_processed("a")] == [content, content]
+
+
+def test_identical_content_shared_across_posts() -> None:
+    db.record_processed("a", Action.IGNORE, post_content="same")
+    db.record_processed("b", Action.IGNORE, post_content="same")
+    assert db.get_stats()["post_contents"] == 1
+
+
+def test_view_exposes_original_columns() -> None:
+    db.record_processed("a", Action.IGNORE, post_title="Title", post_extra={"k": 1})
+    row = db.get_history()[0]
+    assert list(row) == db.PROCESSED_POSTS_COLUMNS
+    assert row["post_title"] == "Title"
+
+
+def test_delete_processed_removes_decisions_and_orphan_content() -> None:
+    db.record_processed("a", Action.CREATE, "evt-1", post_content="only a")
+    db.record_processed("a", Action.CREATE, "evt-2", post_content="only a")
+    db.record_processed("b", Action.IGNORE, post_content="only b")
+
+    assert db.delete_processed("a") is True
+    assert db.delete_processed("a") is False
+
+    stats = db.get_stats()
+    assert stats["decisions"] == 1
+    assert stats["post_contents"] == 1
+    assert db.get_rows_by_calendar_event_ids(["evt-1"]) == {}
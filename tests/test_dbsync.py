@@ -0,0 +1,362 @@
+"""Tests for delta sync of the database against a moto S3 stand-in."""
+
+import json
+import shutil
+
+import pytest
+
+from calendar_sync import archive, db, dbsync
+from calendar_sync.models import Action, RssPost
+
+boto3 = pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+
+BUCKET = "test-bucket"
+
+
+@pytest.fixture
+def store():
+    with moto.mock_aws():
+        s3 = boto3.client("s3", region_name="us-east-1")
+        s3.create_bucket(Bucket=BUCKET)
+        yield dbsync.RemoteStore(s3, BUCKET, "calendar_sync_db/")
+
+
+@pytest.fixture
+def use_db(tmp_path, monkeypatch):
+    """Switch the db module between named database files (one per "machine")."""
+
+    def switch(name: str) -> None:
+        monkeypatch.setenv("CALSYNC_DB_PATH", str(tmp_path / name / "calendar_sync.db"))
+        db.init_db()
+
+    yield switch
+    db.close()
+
+
+def _manifest(store: dbsync.RemoteStore) -> dict:
+    return json.loads(store.get(dbsync.MANIFEST_NAME) or b"{}")
+
+
+def _reset_counters(store: dbsync.RemoteStore) -> None:
+    store.bytes_up = store.bytes_down = 0
+
+
+def test_first_push_uploads_snapshot_then_skips_when_unchanged(store, use_db) -> None:
+    use_db("ci")
+    db.record_processed("a", Action.IGNORE, post_content="<p>a</p>")
+
+    assert dbsync.push(store).action == "snapshot"
+    manifest = _manifest(store)
+    sidecar = store.get(manifest["base"] + ".sha256") or b""
+    assert sidecar.split()[0].decode() == manifest["base_sha256"]
+    assert manifest["base_compressed_bytes"] < manifest["base_bytes"]
+
+    _reset_counters(store)
+    result = dbsync.push(store)
+    assert result.action == "skipped"
+    assert store.bytes_up == 0
+
+
+def test_changes_ship_as_changeset_and_pull_applies_them(store, use_db) -> None:
+    use_db("ci")
+    db.record_processed("a", Action.IGNORE, post_content="<p>a</p>")
+    dbsync.push(store)
+    db.record_processed(
+        "b", Action.CREATE, calendar_event_id="evt-b", post_content="<p>b</p>"
+    )
+    db.set_feed_state("https://feed.example.com", '"v1"', None)
+
+    _reset_counters(store)
+    result = dbsync.push(store)
+    assert result.action == "changeset"
+    base_bytes = _manifest(store)["base_compressed_bytes"]
+    assert 0 < store.bytes_up < base_bytes
+
+    use_db("laptop")
+    assert dbsync.pull(store).action == "snapshot"
+    assert db.get_processed_guids(["a", "b"]) == {"a", "b"}
+    assert db.get_processed("b")[0]["post_content"] == "<p>b</p>"
+    feed_state = db.get_feed_state("https://feed.example.com")
+    assert feed_state is not None and feed_state["etag"] == '"v1"'
+    # Applied rows aren't queued to be pushed back
+    assert db.count_pending_changes() == 0
+
+    # Up to date: only the manifest is fetched
+    _reset_counters(store)
+    assert dbsync.pull(store).action == "skipped"
+    assert store.bytes_down < base_bytes
+
+
+def test_pull_applies_only_new_changesets(store, use_db) -> None:
+    use_db("ci")
+    db.record_processed("a", Action.IGNORE)
+    dbsync.push(store)
+    use_db("laptop")
+    dbsync.pull(store)
+
+    use_db("ci")
+    db.record_processed("b", Action.IGNORE)
+    dbsync.push(store)
+
+    use_db("laptop")
+    result = dbsync.pull(store)
+    assert result.action == "changeset"
+    assert "1 new decision" in result.detail
+    assert db.is_processed("b")
+
+
+def test_deletions_and_archiving_propagate(store, use_db) -> None:
+    use_db("ci")
+    db.record_processed("gone", Action.IGNORE)
+    db.record_processed("old", Action.IGNORE, cost_usd=0.5)
+    dbsync.push(store)
+    use_db("laptop")
+    dbsync.pull(store)
+
+    use_db("ci")
+    db.delete_processed("gone")
+    db.mark_archived([("old", "2026-01.jsonl.gz", 1, 0.5)])
+    dbsync.push(store)
+
+    use_db("laptop")
+    dbsync.pull(store)
+    assert not db.is_processed("gone")
+    assert db.is_processed("old")
+    assert db.connect().execute("SELECT COUNT(*) FROM posts").fetchone()[0] == 0
+    assert db.get_total_cost() == pytest.approx(0.5)
+
+
+def test_changesets_fold_into_new_base(store, use_db, monkeypatch) -> None:
+    monkeypatch.setattr(dbsync, "MAX_CHANGESETS", 1)
+    use_db("ci")
+    db.record_processed("a", Action.IGNORE)
+    dbsync.push(store)
+    db.record_processed("b", Action.IGNORE)
+    assert dbsync.push(store).action == "changeset"
+    db.record_processed("c", Action.IGNORE)
+
+    assert dbsync.push(store).action == "snapshot"
+    assert store.list(dbsync.CHANGESET_PREFIX) == set()
+    base = _manifest(store)["base"]
+    assert {dbsync.BASE_PREFIX + n for n in store.list(dbsync.BASE_PREFIX)} == {
+        base,
+        base + ".sha256",
+    }
+
+    use_db("laptop")
+    dbsync.pull(store)
+    assert db.get_processed_guids(["a", "b", "c"]) == {"a", "b", "c"}
+
+
+def test_apply_changes_is_idempotent(use_db) -> None:
+    use_db("ci")
+    db.record_processed("a", Action.IGNORE, post_content="<p>a</p>")
+    changeset = db.export_changes()
+    assert changeset is not None
+
+    use_db("laptop")
+    assert db.apply_changes(changeset) == 1
+    assert db.apply_changes(changeset) == 0
+    assert len(db.get_processed("a")) == 1
+
+
+def test_pull_without_manifest_downloads_whole_file(store, use_db, tmp_path) -> None:
+    use_db("ci")
+    db.record_processed("a", Action.IGNORE)
+    db.close()
+    legacy = (tmp_path / "ci" / "calendar_sync.db").read_bytes()
+    store.put(dbsync.LEGACY_BASE_NAME, legacy)
+
+    use_db("laptop")
+    assert dbsync.pull(store).action == "snapshot"
+    db.init_db()
+    assert db.is_processed("a")
+
+
+def test_truncated_base_never_replaces_local_db(store, use_db, tmp_path) -> None:
+    use_db("ci")
+    db.record_processed("a", Action.IGNORE)
+    dbsync.push(store)
+    base = _manifest(store)["base"]
+    good = store.get(base) or b""
+    store.put(base, good[: len(good) // 2])
+
+    use_db("laptop")
+    db.record_processed("local", Action.IGNORE)
+    with pytest.raises(dbsync.StaleManifestError):
+        dbsync.pull(store)
+    db.init_db()
+    assert db.is_processed("local")
+    assert list((tmp_path / "laptop").glob(".*")) == []
+
+
+def test_legacy_download_checks_sidecar(store, use_db, tmp_path) -> None:
+    use_db("ci")
+    db.record_processed("a", Action.IGNORE)
+    db.close()
+    store.put(
+        dbsync.LEGACY_BASE_NAME, (tmp_path / "ci" / "calendar_sync.db").read_bytes()
+    )
+    store.put(dbsync.LEGACY_BASE_NAME + ".sha256", b"0" * 64 + b"  calendar_sync.db\n")
+
+    use_db("laptop")
+    with pytest.raises(dbsync.CorruptDownloadError):
+        dbsync.pull(store)
+    assert not db.is_processed("a")
+
+
+# ---------------------------------------------------------------------------
+# Overlapping runs
+# ---------------------------------------------------------------------------
+
+
+def _clone(store, use_db, *names: str) -> None:
+    """Start each named machine from the current remote state."""
+    for name in names:
+        use_db(name)
+        dbsync.pull(store)
+
+
+def test_stale_manifest_write_is_rejected(store, use_db) -> None:
+    use_db("seed")
+    db.record_processed("seed", Action.IGNORE)
+    dbsync.push(store)
+    _clone(store, use_db, "run1", "run2")
+
+    use_db("run2")
+    db.record_processed("b", Action.IGNORE)
+    manifest, version = dbsync._load_manifest(store)
+
+    use_db("run1")
+    db.record_processed("a", Action.IGNORE)
+    dbsync.push(store)
+
+    use_db("run2")
+    assert manifest is not None
+    with pytest.raises(dbsync.ConflictError):
+        dbsync._push_changeset(store, manifest, version)
+    # The losing attempt cleans up its changeset and keeps its rows queued
+    assert len(store.list(dbsync.CHANGESET_PREFIX)) == 1
+    assert db.count_pending_changes() == 1
+
+    assert dbsync.push(store).action == "changeset"
+    use_db("reader")
+    dbsync.pull(store)
+    assert db.get_processed_guids(["seed", "a", "b"]) == {"seed", "a", "b"}
+
+
+def test_push_after_concurrent_snapshot_merges(store, use_db) -> None:
+    use_db("seed")
+    db.record_processed("seed", Action.IGNORE)
+    dbsync.push(store)
+    _clone(store, use_db, "run1", "run2")
+
+    use_db("run1")
+    db.record_processed("a", Action.IGNORE)
+    dbsync.push(store, snapshot=True)
+
+    use_db("run2")
+    db.record_processed("b", Action.IGNORE)
+    result = dbsync.push(store)
+    assert result.action == "changeset"
+    assert "kept 1 unpushed local change" in result.detail
+
+    use_db("reader")
+    dbsync.pull(store)
+    assert db.get_processed_guids(["seed", "a", "b"]) == {"seed", "a", "b"}
+    assert len(db.get_processed("seed")) == 1
+
+
+def test_pull_keeps_unpushed_changes_across_new_base(store, use_db) -> None:
+    use_db("seed")
+    db.record_processed("seed", Action.IGNORE)
+    dbsync.push(store)
+    _clone(store, use_db, "laptop")
+    db.record_processed("local", Action.IGNORE)
+
+    use_db("seed")
+    db.record_processed("remote", Action.IGNORE)
+    dbsync.push(store, snapshot=True)
+
+    use_db("laptop")
+    dbsync.pull(store)
+    assert db.get_processed_guids(["seed", "local", "remote"]) == {
+        "seed",
+        "local",
+        "remote",
+    }
+    assert db.count_pending_changes() == 1
+
+
+def test_ingest_queue_stays_local(store, use_db) -> None:
+    use_db("seed")
+    db.enqueue_posts([RssPost(guid="q-seed", title="", link="", content="")])
+    dbsync.push(store)
+    _clone(store, use_db, "laptop")
+    assert db.count_queued_posts() == 0
+    db.enqueue_posts([RssPost(guid="q-laptop", title="", link="", content="")])
+
+    use_db("seed")
+    db.record_processed("remote", Action.IGNORE)
+    dbsync.push(store, snapshot=True)
+    use_db("laptop")
+    assert dbsync.pull(store).action == "snapshot"
+    assert [p.guid for p in db.get_queued_posts()] == ["q-laptop"]
+
+
+def test_never_synced_db_merges_instead_of_overwriting(store, use_db) -> None:
+    use_db("seed")
+    db.record_processed("seed", Action.IGNORE)
+    dbsync.push(store)
+
+    use_db("offline")
+    db.record_processed("offline", Action.IGNORE)
+    # Like a DB migrated from before change tracking: rows exist, none queued
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM sync_outbox")
+    assert dbsync.push(store).action == "changeset"
+
+    use_db("reader")
+    dbsync.pull(store)
+    assert db.get_processed_guids(["seed", "offline"]) == {"seed", "offline"}
+
+
+def _archive_aged(guid: str) -> list[str]:
+    db.record_processed(guid, Action.IGNORE, reasoning=guid)
+    db.connect().execute(
+        "UPDATE decisions SET processed_at = '2025-01-15T12:00:00+00:00'"
+    )
+    return archive.archive_older_than(90).files
+
+
+def test_archives_from_fresh_checkouts_never_collide(store, use_db) -> None:
+    use_db("ci")
+    archive_dir = archive.get_archive_dir()
+    first = _archive_aged("a")
+    assert dbsync.push_archives(store, archive_dir, "archive/") == first
+
+    # The next CI run starts without the files the last one uploaded
+    shutil.rmtree(archive_dir)
+    second = _archive_aged("b")
+    assert dbsync.push_archives(store, archive_dir, "archive/") == second
+    assert first != second
+
+    shutil.rmtree(archive_dir)
+    archive_dir.mkdir()
+    for name in store.list("archive/"):
+        (archive_dir / name).write_bytes(store.get("archive/" + name) or b"")
+    assert db.get_processed("a")[0]["reasoning"] == "a"
+    assert db.get_processed("b")[0]["reasoning"] == "b"
+
+
+def test_push_archives_refuses_a_name_taken_by_other_bytes(store, use_db) -> None:
+    use_db("ci")
+    archive_dir = archive.get_archive_dir()
+    [name] = _archive_aged("a")
+    dbsync.push_archives(store, archive_dir, "archive/")
+    assert dbsync.push_archives(store, archive_dir, "archive/") == []
+
+    store.put("archive/" + name, b"something else")
+    with pytest.raises(dbsync.ArchiveConflictError):
+        dbsync.push_archives(store, archive_dir, "archive/")
@@ -0,0 +1,151 @@
+"""Tests for replaying historical posts (calsync eval) and the response cache."""
+
+import os
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+os.environ.setdefault("CALENDAR_ID", "test-calendar-id")
+
+from calendar_sync import calendar, claude, db, evaluate, responsecache  # noqa: E402
+from calendar_sync.models import (  # noqa: E402
+    Action,
+    CalendarEvent,
+    EventDetails,
+    RssPost,
+)
+
+ANALYZED_AT = "2025-05-01T17:00:00+00:00"
+
+
+@pytest.fixture
+def temp_db(temp_db, tmp_path, monkeypatch):
+    """The shared temp_db, with session logs under tmp_path and no cache left on."""
+    monkeypatch.setattr(claude, "get_logs_dir", lambda: tmp_path / "logs")
+    yield
+    responsecache.use(None)
+
+
+def _message(model: str, content: list[dict], stop_reason: str):
+    from anthropic.types import Message
+
+    return Message.model_validate(
+        {
+            "id": "msg_1",
+            "type": "message",
+            "role": "assistant",
+            "model": model,
+            "content": content,
+            "stop_reason": stop_reason,
+            "usage": {"input_tokens": 1000, "output_tokens": 100},
+        }
+    )
+
+
+def fake_api(monkeypatch) -> list[dict]:
+    """An Anthropic client that says the ride post is a ride and the rest aren't."""
+    requests = []
+
+    def create(**kwargs):
+        requests.append(kwargs)
+        first = kwargs["messages"][0]["content"]
+        text = first if isinstance(first, str) else first[0]["text"]
+        if not kwargs.get("tools"):
+            answer = "YES" if "/ride" in text else "NO"
+            message = _message(
+                kwargs["model"], [{"type": "text", "text": answer}], "end_turn"
+            )
+        else:
+            decision = {
+                "is_event": True,
+                "confidence": 0.95,
+                "action": "create",
+                "reasoning": "A ride",
+                "event": {"title": "Ride", "date": "2025-05-03", "time": "09:00"},
+                "done": True,
+            }
+            block = {
+                "type": "tool_use",
+                "id": "t1",
+                "name": "submit_decision",
+                "input": decision,
+            }
+            message = _message(kwargs["model"], [block], "tool_use")
+        return SimpleNamespace(parse=lambda: message)
+
+    client = SimpleNamespace(
+        messages=SimpleNamespace(with_raw_response=SimpleNamespace(create=create))
+    )
+    monkeypatch.setattr(claude, "get_client", lambda: client)
+    monkeypatch.setattr(
+        calendar, "on_own_connection", lambda fn, *a, **kw: fn(*a, **kw)
+    )
+    return requests
+
+
+def test_replays_agree_and_repeats_come_from_the_cache(
+    temp_db, tmp_path, monkeypatch
+) -> None:
+    event = EventDetails(title="Ride", date="2025-05-03", time="09:00")
+    db.record_processed(
+        "ride",
+        Action.CREATE,
+        "evt-ride",
+        post_content="Saturday ride, 9am",
+        post_link="https://example.com/ride",
+        event=event,
+    )
+    db.record_processed(
+        "photo",
+        Action.IGNORE,
+        post_content="Nice sunset",
+        post_link="https://example.com/photo",
+        reasoning="Pre-filter: this is not an event announcement.",
+    )
+    db.connect().execute("UPDATE decisions SET processed_at = ?", (ANALYZED_AT,))
+    requests = fake_api(monkeypatch)
+    cache = responsecache.ResponseCache(tmp_path / "cache.db")
+    responsecache.use(cache)
+
+    cases = evaluate.sample_cases(10)
+    results = evaluate.run_eval(cases, [evaluate.CONFIGS["default"]], parallelism=2)
+
+    summary = evaluate.Summary(results["default"])
+    assert summary.action_agreement == 1.0
+    assert (summary.when_agreement, summary.dated) == (1.0, 1)
+    assert summary.errors == 0
+    # Two pre-filter calls and one analysis turn, each seeing the original time
+    assert len(requests) == 3
+    analyzed_at = claude.local_time_str(datetime.fromisoformat(ANALYZED_AT))
+    assert all(analyzed_at in r["system"] for r in requests)
+
+    again = evaluate.run_eval(cases, [evaluate.CONFIGS["default"]])
+
+    assert len(requests) == 3
+    assert cache.hits == 3
+    assert evaluate.Summary(again["default"]).cost_per_post == summary.cost_per_post
+
+
+def test_replay_searches_hide_the_events_the_post_created(temp_db, monkeypatch) -> None:
+    start = datetime(2025, 5, 3, 9, tzinfo=timezone.utc)
+    monkeypatch.setattr(
+        calendar,
+        "search_events_by_date",
+        lambda **kwargs: [
+            CalendarEvent(id="evt-ride", title="Ride", start=start),
+            CalendarEvent(id="evt-other", title="Polo", start=start),
+        ],
+    )
+    post = RssPost(
+        guid="ride", title="Ride", link="https://example.com/ride", content=""
+    )
+    ctx = claude.AnalysisContext(post, hidden_event_ids={"evt-ride"})
+
+    found = claude.execute_tool(
+        "search_events_by_date",
+        {"start_date": "2025-05-03", "end_date": "2025-05-03"},
+        ctx,
+    )
+
+    assert [e["id"] for e in found] == ["evt-other"]
@@ -0,0 +1,137 @@
+"""Tests for push-based ingestion through the receiver and the ingest queue."""
+
+import hashlib
+import hmac
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+os.environ.setdefault("CALENDAR_ID", "test-calendar-id")
+
+from calendar_sync import cli, db, ingest, prefilter, serve  # noqa: E402
+
+RSS = b"""<?xml version="1.0"?>
+<rss version="2.0"><channel><title>Club</title>
+<item>
+  <guid>https://example.com/p/1</guid>
+  <title>Saturday ride</title>
+  <link>https://example.com/p/1</link>
+  <pubDate>Sat, 06 Jun 2026 12:00:00 GMT</pubDate>
+  <description><![CDATA[Meet at 10 <img src="https://img.example.com/1.jpg">]]></description>
+</item>
+</channel></rss>"""
+
+
+@pytest.fixture
+def receiver_url(temp_db):
+    """A receiver on an ephemeral port; yields (url, receiver, wake event)."""
+    wake = threading.Event()
+    receiver = ingest.Receiver(secret="s3cret", on_enqueue=lambda n: wake.set())
+    server = serve.make_server(
+        serve.ServeMetrics(), "127.0.0.1", 0, stale_after=60, receiver=receiver
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}", receiver, wake
+    server.shutdown()
+    server.server_close()
+
+
+def _publish(url: str, body: bytes, headers: dict, secret: str = "s3cret"):
+    """Publisher stub: POST a signed notification the way a WebSub hub does."""
+    signature = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    request = urllib.request.Request(
+        url,
+        data=body,
+        method="POST",
+        headers={**headers, "X-Hub-Signature": f"sha256={signature}"},
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_websub_notification_is_parsed_like_a_polled_feed(receiver_url) -> None:
+    url, receiver, wake = receiver_url
+    headers = {
+        "Content-Type": "application/rss+xml",
+        "Link": '<https://example.com/feed.xml>; rel="self"',
+    }
+    assert _publish(f"{url}/websub", RSS, headers) == (202, {"queued": 1})
+    assert wake.is_set()
+    # Redelivery is harmless
+    assert _publish(f"{url}/websub", RSS, headers) == (202, {"queued": 0})
+
+    [post] = db.get_queued_posts()
+    assert post.title == "Saturday ride"
+    assert post.image_urls == ["https://img.example.com/1.jpg"]
+    assert post.published is not None
+    assert post.published.isoformat() == "2026-06-06T12:00:00+00:00"
+    assert post.extra["source_feed_url"] == "https://example.com/feed.xml"
+    assert receiver.counters()["push_posts_received"] == 2
+
+
+def test_json_webhook_and_rejections(receiver_url) -> None:
+    url, receiver, _ = receiver_url
+    body = json.dumps(
+        {
+            "feed_url": "https://example.com/feed.json",
+            "items": [
+                {
+                    "id": "j1",
+                    "url": "https://example.com/j1",
+                    "title": "Taco ride",
+                    "content_html": "<p>Thursday 6pm</p>",
+                    "date_published": "2026-06-04T18:00:00Z",
+                    "authors": [{"name": "club"}],
+                    "image": "https://img.example.com/j1.jpg",
+                }
+            ],
+        }
+    ).encode()
+    assert _publish(f"{url}/webhook", body, {})[0] == 202
+    [post] = db.get_queued_posts()
+    assert (post.guid, post.author) == ("j1", "club")
+    assert post.image_urls == ["https://img.example.com/j1.jpg"]
+
+    assert _publish(f"{url}/webhook", body, {}, secret="wrong")[0] == 403
+    assert _publish(f"{url}/webhook", b"[1]", {})[0] == 400
+    assert _publish(f"{url}/websub", RSS, {})[0] == 400  # no topic
+    assert receiver.rejected == 3
+
+
+def test_websub_verification(receiver_url) -> None:
+    url, _, _ = receiver_url
+    query = (
+        "hub.mode=subscribe&hub.topic=https://example.com/feed.xml&hub.challenge=abc"
+    )
+    with urllib.request.urlopen(f"{url}/websub?{query}", timeout=5) as response:
+        assert response.read() == b"abc"
+
+
+def test_process_drains_queue_and_reports_latency(temp_db, monkeypatch) -> None:
+    posts = ingest.parse_websub(RSS, "https://example.com/feed.xml")
+    assert db.enqueue_posts(posts) == 1
+    monkeypatch.setattr(
+        prefilter,
+        "prefilter_post",
+        lambda post, **kwargs: prefilter.PrefilterResult(False, 10, 1),
+    )
+
+    stats = cli.run_process([], dry_run=True)
+    assert db.count_queued_posts() == 1
+
+    stats = cli.run_process([])
+    assert db.is_processed("https://example.com/p/1")
+    assert db.count_queued_posts() == 0
+    [(queued, published)] = stats.ingest_latencies
+    assert 0 <= queued < 60
+    assert published > queued
+
+    # Already processed posts aren't queued again
+    assert db.enqueue_posts(posts) == 0
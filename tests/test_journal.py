@@ -0,0 +1,133 @@
+"""Tests for the calendar write journal."""
+
+import os
+
+import pytest
+
+os.environ.setdefault("CALENDAR_ID", "test-calendar-id")
+
+from calendar_sync import calendar, db, journal  # noqa: E402
+from calendar_sync.models import Action, EventDetails  # noqa: E402
+
+
+class FakeCalendar:
+    """In-memory stand-in for the calendar functions journal.py calls."""
+
+    def __init__(self, monkeypatch):
+        self.events: dict[str, dict] = {}
+        self.calls: list[str] = []
+        self.fail_after_write = False
+        monkeypatch.setattr(calendar, "create_event", self.create_event)
+        monkeypatch.setattr(calendar, "update_event", self.update_event)
+        monkeypatch.setattr(calendar, "delete_event", self.delete_event)
+        monkeypatch.setattr(calendar, "get_event", self.get_event)
+
+    def _written(self) -> None:
+        if self.fail_after_write:
+            raise TimeoutError("read timed out")
+
+    def create_event(self, event, event_id: str):
+        self.calls.append(f"create {event_id}")
+        self.events[event_id] = {"id": event_id, "status": "confirmed"}
+        self._written()
+        return event_id
+
+    def update_event(self, event_id, event):
+        self.calls.append(f"update {event_id}")
+        self._written()
+        return event_id
+
+    def delete_event(self, event_id):
+        self.calls.append(f"delete {event_id}")
+        self.events[event_id]["status"] = "cancelled"
+        self._written()
+
+    def get_event(self, event_id):
+        self.calls.append(f"get {event_id}")
+        return self.events.get(event_id)
+
+
+EVENT = EventDetails(title="Unity Ride", date="2026-06-06", time="10:00")
+
+
+def _record(guid: str, action: Action, event=None) -> db.ProcessedRecord:
+    return db.ProcessedRecord(
+        post_guid=guid, decision=action, post_content="<p>x</p>", event=event
+    )
+
+
+def _execute(action: Action, event=None) -> str:
+    return journal.execute(action, "evt1", event, _record("p1", action, event))
+
+
+def test_write_and_record_commit_together(temp_db, monkeypatch) -> None:
+    fake = FakeCalendar(monkeypatch)
+    assert _execute(Action.CREATE, EVENT) == "evt1"
+    assert db.get_processed("p1")[0]["calendar_event_id"] == "evt1"
+    assert db.get_pending_intents() == []
+    assert fake.calls == ["create evt1"]
+
+
+def test_crash_after_create_is_finished_not_redone(temp_db, monkeypatch) -> None:
+    fake = FakeCalendar(monkeypatch)
+    fake.fail_after_write = True
+    with pytest.raises(TimeoutError):
+        _execute(Action.CREATE, EVENT)
+    assert not db.is_processed("p1")
+    assert db.get_pending_intent_guids() == {"p1"}
+
+    fake.fail_after_write = False
+    fake.calls.clear()
+    result = journal.reconcile()
+    assert (result.already_applied, result.replayed, result.failed) == (1, 0, 0)
+    assert fake.calls == ["get evt1"]
+    [row] = db.get_processed("p1")
+    assert (row["decision"], row["calendar_event_id"]) == ("create", "evt1")
+    assert row["event_title"] == "Unity Ride"
+    assert db.get_pending_intents() == []
+
+
+def test_unsent_write_is_replayed(temp_db, monkeypatch) -> None:
+    fake = FakeCalendar(monkeypatch)
+    # Journaled, then the process died before the API call
+    db.add_intent(
+        journal.intent_key("p1", Action.CREATE, "evt1", EVENT),
+        "p1",
+        "create",
+        "evt1",
+        journal._dump_record(_record("p1", Action.CREATE, EVENT)),
+    )
+    result = journal.reconcile()
+    assert (result.already_applied, result.replayed) == (0, 1)
+    assert fake.calls == ["get evt1", "create evt1"]
+    assert db.is_processed("p1")
+
+
+def test_failed_reconcile_stays_pending(temp_db, monkeypatch) -> None:
+    fake = FakeCalendar(monkeypatch)
+    fake.events["evt1"] = {"id": "evt1", "status": "confirmed"}
+    fake.fail_after_write = True
+    with pytest.raises(TimeoutError):
+        _execute(Action.CANCEL)
+
+    monkeypatch.setattr(calendar, "get_event", lambda event_id: 1 / 0)
+    result = journal.reconcile()
+    assert result.failed == 1
+    [intent] = db.get_pending_intents()
+    assert intent["attempts"] == 2
+    assert "division by zero" in intent["last_error"]
+
+
+def test_rejected_write_is_not_retried(temp_db, monkeypatch) -> None:
+    class Rejected(Exception):
+        class resp:
+            status = 400
+
+    def reject(event_id, event):
+        raise Rejected("bad request")
+
+    FakeCalendar(monkeypatch)
+    monkeypatch.setattr(calendar, "update_event", reject)
+    with pytest.raises(Rejected):
+        _execute(Action.UPDATE, EVENT)
+    assert db.get_pending_intents() == []
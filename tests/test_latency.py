@@ -0,0 +1,123 @@
+"""Tests for per-post deadlines and hedged read-only calls."""
+
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+os.environ.setdefault("CALENDAR_ID", "test-calendar-id")
+
+from calendar_sync import claude, latency  # noqa: E402
+from calendar_sync.models import RssPost  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_deadline_caps_call_timeouts() -> None:
+    clock = FakeClock()
+    deadline = latency.Deadline(100, call_timeout=30, clock=clock)
+
+    assert deadline.timeout() == 30
+    clock.now = 90
+    assert deadline.timeout() == 10
+    deadline.check()
+    clock.now = 100
+    with pytest.raises(latency.DeadlineExceeded):
+        deadline.check()
+
+
+def test_slow_calls_are_hedged_and_the_first_answer_wins() -> None:
+    calls = []
+    lock = threading.Lock()
+
+    def search() -> str:
+        with lock:
+            calls.append(len(calls))
+            first = len(calls) == 1
+        if first:
+            time.sleep(1.0)
+            return "slow"
+        return "fast"
+
+    hedger = latency.Hedger("t", initial_delay=0.05)
+    started = time.monotonic()
+
+    assert hedger.call(search) == "fast"
+    assert time.monotonic() - started < 0.5
+    assert (hedger.calls, hedger.hedged, hedger.backup_wins) == (1, 1, 1)
+
+
+def test_hedge_delay_follows_recent_p95() -> None:
+    hedger = latency.Hedger("t", min_samples=10, initial_delay=5.0)
+    for _ in range(9):
+        hedger.call(lambda: None)
+    assert hedger.delay() == 5.0
+
+    hedger.samples.extend([0.1] * 95 + [2.0] * 5)
+
+    assert hedger.delay() == pytest.approx(0.1)
+    assert latency.percentile(list(hedger.samples), 99) == 2.0
+
+
+def test_analysis_stops_at_the_post_deadline(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(claude, "get_logs_dir", lambda: tmp_path)
+    clock = FakeClock()
+    timeouts = []
+
+    def create_message(**kwargs):
+        # A slow turn that asks for a tool; the deadline passes meanwhile
+        timeouts.append(kwargs["timeout"])
+        clock.now += 40
+        block = SimpleNamespace(type="tool_use", id="t1", name="noop", input={})
+        usage = SimpleNamespace(input_tokens=10, output_tokens=5)
+        return SimpleNamespace(stop_reason="tool_use", content=[block], usage=usage)
+
+    monkeypatch.setattr(claude, "create_message", create_message)
+    post = RssPost(guid="p1", title="Ride", link="https://x", content="Sat 10am")
+    deadline = latency.Deadline(30, call_timeout=60, clock=clock)
+
+    with pytest.raises(latency.DeadlineExceeded):
+        claude.analyze_post(post, dry_run=True, deadline=deadline)
+    # One turn, with its timeout capped at the 30s left
+    assert timeouts == [30]
+
+
+def test_hedged_prefilter_counts_the_losing_copy(monkeypatch) -> None:
+    from anthropic.types import TextBlock
+
+    from calendar_sync import prefilter
+
+    release = threading.Event()
+    calls = []
+
+    def create_message(**kwargs):
+        calls.append(kwargs)
+        if len(calls) == 1:
+            # The first copy is slow and loses, but still gets billed
+            release.wait(5)
+        usage = SimpleNamespace(input_tokens=300, output_tokens=1)
+        return SimpleNamespace(content=[TextBlock(type="text", text="NO")], usage=usage)
+
+    monkeypatch.setattr(prefilter, "create_message", create_message)
+    hedger = latency.Hedger("prefilter", initial_delay=0.05)
+    monkeypatch.setitem(latency._hedgers, "prefilter", hedger)
+    post = RssPost(guid="p1", title="Sunset", link="https://x", content="Nice")
+
+    result = prefilter.prefilter_post(post, hedge=True)
+    release.set()
+
+    assert hedger.backup_wins == 1
+    assert not result.is_likely_event
+    # Same input twice; the unfinished copy at up to max_tokens of output
+    assert (result.input_tokens, result.output_tokens) == (600, 1 + 8)
+    assert result.cost_usd == pytest.approx(
+        claude.PRICING[prefilter.PREFILTER_MODEL].cost(600, 9)
+    )
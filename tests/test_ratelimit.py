@@ -0,0 +1,233 @@
+"""Tests for the shared rate limiter, retries and circuit breaker."""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+os.environ.setdefault("CALENDAR_ID", "test-calendar-id")
+
+from calendar_sync import calendar, claude, ratelimit  # noqa: E402
+
+MESSAGE = {
+    "id": "msg_1",
+    "type": "message",
+    "role": "assistant",
+    "model": "claude-test",
+    "content": [{"type": "text", "text": "YES"}],
+    "stop_reason": "end_turn",
+    "stop_sequence": None,
+    "usage": {"input_tokens": 10, "output_tokens": 1},
+}
+
+
+class FaultyUpstream:
+    """Local HTTP stand-in that answers each request with the next scripted fault."""
+
+    def __init__(self, script: list[tuple[int, dict, dict]]):
+        self.script = list(script)
+        self.hits = 0
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                upstream.hits += 1
+                script = upstream.script
+                # The last entry repeats
+                status, headers, body = script.pop(0) if len(script) > 1 else script[0]
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _error(status: int, kind: str) -> tuple[int, dict, dict]:
+    return status, {}, {"type": "error", "error": {"type": kind, "message": kind}}
+
+
+@pytest.fixture
+def anthropic_at(monkeypatch):
+    """Point claude.create_message at a FaultyUpstream, with a fast limiter."""
+    from anthropic import Anthropic
+
+    servers = []
+
+    def start(script, **limits) -> tuple[FaultyUpstream, ratelimit.Upstream]:
+        fake = FaultyUpstream(script)
+        servers.append(fake)
+        client = Anthropic(api_key="test", base_url=fake.url, max_retries=0)
+        monkeypatch.setattr(claude, "_client", client)
+        upstream = ratelimit.Upstream(
+            "anthropic", rate=100, burst=10, base_delay=0.01, **limits
+        )
+        monkeypatch.setitem(ratelimit._upstreams, "anthropic", upstream)
+        return fake, upstream
+
+    yield start
+    for fake in servers:
+        fake.close()
+
+
+def test_throttles_are_retried_and_headers_set_the_pace(anthropic_at) -> None:
+    reset = (datetime.now(timezone.utc) + timedelta(seconds=10)).isoformat()
+    fake, upstream = anthropic_at(
+        [
+            (429, {"retry-after": "0"}, {"type": "error", "error": {}}),
+            _error(529, "overloaded_error"),
+            (
+                200,
+                {
+                    "anthropic-ratelimit-requests-remaining": "20",
+                    "anthropic-ratelimit-requests-reset": reset,
+                },
+                MESSAGE,
+            ),
+        ]
+    )
+
+    from anthropic.types import TextBlock
+
+    response = claude.create_message(model="m", max_tokens=8, messages=[])
+
+    block = response.content[0]
+    assert isinstance(block, TextBlock) and block.text == "YES"
+    assert (fake.hits, upstream.retries, upstream.throttled) == (3, 2, 2)
+    # 20 requests left in a 10s window
+    assert upstream.rate == pytest.approx(2.0, rel=0.2)
+
+
+def test_breaker_opens_and_fails_fast(anthropic_at) -> None:
+    fake, upstream = anthropic_at(
+        [_error(503, "api_error")], failure_threshold=3, reset_after=60
+    )
+
+    with pytest.raises(ratelimit.CircuitOpenError):
+        claude.create_message(model="m", max_tokens=8, messages=[])
+    assert fake.hits == 3
+
+    with pytest.raises(ratelimit.CircuitOpenError):
+        claude.create_message(model="m", max_tokens=8, messages=[])
+    assert fake.hits == 3
+    assert upstream.rejected == 1
+
+
+def test_client_errors_pass_straight_through(anthropic_at) -> None:
+    from anthropic import BadRequestError
+
+    fake, upstream = anthropic_at([_error(400, "invalid_request_error")])
+
+    with pytest.raises(BadRequestError):
+        claude.create_message(model="m", max_tokens=8, messages=[])
+    assert (fake.hits, upstream.retries, upstream.consecutive_failures) == (1, 0, 0)
+
+
+def test_calendar_calls_retry_rate_limits_but_not_404(monkeypatch) -> None:
+    from googleapiclient.discovery import build_from_document
+    from googleapiclient.discovery_cache import get_static_doc
+    from googleapiclient.http import HttpMockSequence
+
+    rate_limited = json.dumps(
+        {"error": {"code": 403, "errors": [{"reason": "rateLimitExceeded"}]}}
+    )
+    http = HttpMockSequence(
+        [
+            ({"status": "403"}, rate_limited),
+            ({"status": "200"}, json.dumps({"id": "evt1", "status": "confirmed"})),
+            ({"status": "404"}, "{}"),
+        ]
+    )
+    service = build_from_document(get_static_doc("calendar", "v3"), http=http)
+    monkeypatch.setattr(calendar, "get_calendar_service", lambda: service)
+    upstream = ratelimit.Upstream(
+        "google_calendar", rate=100, burst=10, base_delay=0.01
+    )
+    monkeypatch.setitem(ratelimit._upstreams, "google_calendar", upstream)
+
+    event = calendar.get_event("evt1")
+    assert event is not None and event["id"] == "evt1"
+    assert calendar.get_event("gone") is None
+    assert (upstream.calls, upstream.retries, upstream.throttled) == (3, 1, 1)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+def test_token_bucket_paces_calls() -> None:
+    clock = FakeClock()
+    upstream = ratelimit.Upstream(
+        "t", rate=2, burst=1, rate_step=0, clock=clock, sleep=clock.sleep
+    )
+
+    for _ in range(5):
+        upstream.call(lambda: None)
+
+    # The first call uses the burst; the other four wait half a second each
+    assert clock.now == pytest.approx(2.0)
+
+
+def test_rate_creeps_up_without_headers() -> None:
+    clock = FakeClock()
+    upstream = ratelimit.Upstream("t", rate=2, burst=1, clock=clock, sleep=clock.sleep)
+
+    for _ in range(5):
+        upstream.call(lambda: None)
+
+    # Each success adds a request/s: waits of 1/3, 1/4, 1/5 and 1/6s
+    assert upstream.rate == 7
+    assert clock.now == pytest.approx(1 / 3 + 1 / 4 + 1 / 5 + 1 / 6)
+
+
+def test_concurrency_backs_off_and_recovers() -> None:
+    upstream = ratelimit.Upstream("t", rate=1000, burst=1000, max_concurrency=8)
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def work():
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+
+    upstream.record_failure("throttle")
+    upstream.record_failure("throttle")
+    assert upstream.concurrency == 2
+
+    threads = [threading.Thread(target=upstream.call, args=(work,)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert peak[0] <= 3
+    assert upstream.concurrency > 2
@@ -0,0 +1,108 @@
+"""Tests for routing posts to the fast model first, with escalation."""
+
+import os
+from types import SimpleNamespace
+
+import pytest
+
+os.environ.setdefault("CALENDAR_ID", "test-calendar-id")
+
+from calendar_sync import claude, db  # noqa: E402
+from calendar_sync.models import Action, ClaudeDecision, RssPost  # noqa: E402
+
+POST = RssPost(
+    guid="p1",
+    title="Thoughts",
+    link="https://example.com/p1",
+    content="What a season it has been.",
+    image_urls=["https://img.example.com/1.jpg"],
+)
+
+
+@pytest.fixture
+def temp_db(temp_db, tmp_path, monkeypatch):
+    """The shared temp_db, with session logs kept under tmp_path."""
+    monkeypatch.setattr(claude, "get_logs_dir", lambda: tmp_path / "logs")
+
+
+def _decision(confidence: float, action: str = "ignore") -> dict:
+    return {
+        "is_event": False,
+        "confidence": confidence,
+        "action": action,
+        "reasoning": f"{action} at {confidence}",
+        "done": True,
+    }
+
+
+def fake_models(monkeypatch, replies: dict[str, list[tuple[str, dict]]]) -> list[str]:
+    """Answer each model's turns with its scripted (tool, input) calls."""
+    calls = []
+
+    def create_message(model, **kwargs):
+        calls.append(model)
+        name, tool_input = replies[model].pop(0)
+        block = SimpleNamespace(type="tool_use", id="t1", name=name, input=tool_input)
+        usage = SimpleNamespace(input_tokens=1_000_000, output_tokens=0)
+        return SimpleNamespace(
+            stop_reason="tool_use", content=[block], usage=usage, model=model
+        )
+
+    monkeypatch.setattr(claude, "create_message", create_message)
+    return calls
+
+
+def test_confident_fast_decision_stands(temp_db, monkeypatch) -> None:
+    calls = fake_models(
+        monkeypatch, {claude.FAST_MODEL: [("submit_decision", _decision(0.95))]}
+    )
+
+    ctx = claude.analyze_post(POST, dry_run=True, route=True)
+
+    assert calls == [claude.FAST_MODEL]
+    assert ctx.escalation is None
+    [row] = db.get_processed("p1")
+    assert row["cost_usd"] == pytest.approx(
+        claude.PRICING[claude.FAST_MODEL].input_per_m
+    )
+
+
+def test_unsure_fast_decision_is_escalated(temp_db, monkeypatch) -> None:
+    calls = fake_models(
+        monkeypatch,
+        {
+            claude.FAST_MODEL: [("submit_decision", _decision(0.5))],
+            claude.STRONG_MODEL: [("submit_decision", _decision(0.9))],
+        },
+    )
+
+    ctx = claude.analyze_post(POST, dry_run=True, route=True)
+
+    assert calls == [claude.FAST_MODEL, claude.STRONG_MODEL]
+    assert ctx.escalation == "confidence 50%"
+    # Only the strong model's decision is recorded, with both models' cost
+    [row] = db.get_processed("p1")
+    assert row["reasoning"] == "ignore at 0.9"
+    assert row["cost_usd"] == pytest.approx(1.00 + 3.00)
+
+
+def test_image_requests_and_cancellations_escalate(temp_db, monkeypatch) -> None:
+    fetched = []
+    monkeypatch.setattr(claude, "fetch_image_as_base64", lambda *a: fetched.append(a))
+    fake_models(
+        monkeypatch,
+        {
+            claude.FAST_MODEL: [("get_images", {})],
+            claude.STRONG_MODEL: [("submit_decision", _decision(0.9))],
+        },
+    )
+
+    ctx = claude.analyze_post(POST, dry_run=True, route=True)
+
+    assert ctx.escalation == "the post's images are needed"
+    assert fetched == []
+
+    cancel = ClaudeDecision(
+        is_event=True, confidence=0.99, action=Action.CANCEL, reasoning="Rained out"
+    )
+    assert claude.escalation_reason([cancel]) == "cancel changes an existing event"
@@ -0,0 +1,222 @@
+"""Tests for RSS conditional fetching and incremental parsing."""
+
+import feedparser
+import httpx
+import pytest
+
+from calendar_sync import rss
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+
+def _feed_xml(guids: list[str]) -> str:
+    """Build a minimal RSS document with one item per guid (newest first)."""
+    items = "".join(
+        f"""
+        <item>
+          <guid>{guid}</guid>
+          <title>Post {guid}</title>
+          <link>https://example.com/{guid}</link>
+          <description><![CDATA[Ride on <img src="https://img.example.com/{guid}.jpg">]]></description>
+        </item>"""
+        for guid in guids
+    )
+    return f"""<?xml version="1.0"?>
+<rss version="2.0"><channel><title>Test</title>{items}</channel></rss>"""
+
+
+def _entries(guids: list[str]) -> list:
+    return feedparser.parse(_feed_xml(guids)).entries
+
+
+# ---------------------------------------------------------------------------
+# parse_entries
+# ---------------------------------------------------------------------------
+
+
+def test_parse_entries_converts_all_without_known_filter() -> None:
+    posts, skipped, stopped = rss.parse_entries(_entries(["a", "b", "c"]))
+    assert [p.guid for p in posts] == ["a", "b", "c"]
+    assert skipped == 0
+    assert stopped is False
+
+
+def test_parse_entries_extracts_images() -> None:
+    posts, _, _ = rss.parse_entries(_entries(["a"]))
+    assert posts[0].image_urls == ["https://img.example.com/a.jpg"]
+
+
+def test_parse_entries_skips_known_guids() -> None:
+    known = {"b"}
+    posts, skipped, stopped = rss.parse_entries(
+        _entries(["a", "b", "c"]), known.__contains__
+    )
+    assert [p.guid for p in posts] == ["a", "c"]
+    assert skipped == 1
+    assert stopped is False
+
+
+def test_parse_entries_stops_after_run_of_known() -> None:
+    guids = ["new1", "old1", "old2", "old3", "new2"]
+    known = {"old1", "old2", "old3"}
+    posts, skipped, stopped = rss.parse_entries(
+        _entries(guids), known.__contains__, known_run_cutoff=3
+    )
+    assert [p.guid for p in posts] == ["new1"]
+    assert skipped == 3
+    assert stopped is True
+
+
+def test_parse_entries_known_run_resets_on_new_entry() -> None:
+    guids = ["old1", "old2", "new1", "old3", "old4"]
+    known = {"old1", "old2", "old3", "old4"}
+    posts, _, stopped = rss.parse_entries(
+        _entries(guids), known.__contains__, known_run_cutoff=3
+    )
+    assert [p.guid for p in posts] == ["new1"]
+    assert stopped is False
+
+
+# ---------------------------------------------------------------------------
+# fetch_feed_conditional
+# ---------------------------------------------------------------------------
+
+
+@pytest.fixture
+def fake_get(monkeypatch):
+    """Replace httpx.get with a stub that records request headers."""
+    calls: list[dict] = []
+
+    def install(status: int, body: str = "", headers: dict | None = None):
+        def _get(url, headers=None, **kwargs):
+            calls.append(dict(headers or {}))
+            return httpx.Response(
+                status,
+                content=body.encode(),
+                headers=response_headers,
+                request=httpx.Request("GET", url),
+            )
+
+        response_headers = headers or {}
+        monkeypatch.setattr(rss.httpx, "get", _get)
+        return calls
+
+    return install
+
+
+def test_fetch_sends_validators(fake_get) -> None:
+    calls = fake_get(304)
+    rss.fetch_feed_conditional(
+        "https://feed.example.com/rss",
+        etag='"abc"',
+        modified="Wed, 01 Jan 2026 00:00:00 GMT",
+    )
+    assert calls[0]["If-None-Match"] == '"abc"'
+    assert calls[0]["If-Modified-Since"] == "Wed, 01 Jan 2026 00:00:00 GMT"
+
+
+def test_fetch_not_modified_returns_no_posts(fake_get) -> None:
+    fake_get(304)
+    result = rss.fetch_feed_conditional("https://feed.example.com/rss", etag='"abc"')
+    assert result.not_modified is True
+    assert result.posts == []
+    assert result.etag == '"abc"'
+
+
+def test_fetch_returns_new_validators_and_size(fake_get) -> None:
+    # Guids are resolved against the feed URL, so use absolute ones here
+    a, b = "https://example.com/p/a", "https://example.com/p/b"
+    body = _feed_xml([a, b])
+    fake_get(
+        200,
+        body,
+        {"ETag": '"v2"', "Last-Modified": "Thu, 02 Jan 2026 00:00:00 GMT"},
+    )
+    result = rss.fetch_feed_conditional(
+        "https://feed.example.com/rss", known_guids=lambda guids: {b} & set(guids)
+    )
+    assert result.not_modified is False
+    assert result.etag == '"v2"'
+    assert result.modified == "Thu, 02 Jan 2026 00:00:00 GMT"
+    assert result.bytes_fetched == len(body.encode())
+    assert result.entry_count == 2
+    assert [p.guid for p in result.posts] == [a]
+    assert result.known_skipped == 1
+
+
+# ---------------------------------------------------------------------------
+# fetch_feeds / merge_feed_results
+# ---------------------------------------------------------------------------
+
+
+def _result(url: str, guids: list[str]) -> rss.FeedResult:
+    posts, _, _ = rss.parse_entries(_entries(guids))
+    for post in posts:
+        post.extra["source_feed_url"] = url
+    return rss.FeedResult(posts=posts, url=url)
+
+
+def test_fetch_feeds_isolates_failures(monkeypatch) -> None:
+    def _fetch(url, **kwargs):
+        if "broken" in url:
+            raise httpx.ConnectError("connection refused")
+        return _result(url, ["a"])
+
+    monkeypatch.setattr(rss, "fetch_feed_conditional", _fetch)
+    results = rss.fetch_feeds(["https://ok.example.com", "https://broken.example.com"])
+
+    assert [r.url for r in results] == [
+        "https://ok.example.com",
+        "https://broken.example.com",
+    ]
+    assert results[0].error is None
+    assert [p.guid for p in results[0].posts] == ["a"]
+    assert "connection refused" in (results[1].error or "")
+
+
+def test_fetch_feeds_times_out_slow_feed(monkeypatch) -> None:
+    import threading
+
+    release = threading.Event()
+
+    def _fetch(url, **kwargs):
+        if "slow" in url:
+            release.wait(5)
+        return _result(url, ["a"])
+
+    monkeypatch.setattr(rss, "fetch_feed_conditional", _fetch)
+    try:
+        results = rss.fetch_feeds(
+            ["https://fast.example.com", "https://slow.example.com"], timeout=0.2
+        )
+    finally:
+        release.set()
+
+    assert results[0].error is None
+    assert "timed out" in (results[1].error or "")
+
+
+def test_merge_dedupes_by_guid_first_feed_wins() -> None:
+    first = _result("https://one.example.com", ["a", "b"])
+    second = _result("https://two.example.com", ["b", "c"])
+
+    posts, feeds_by_guid = rss.merge_feed_results([first, second])
+
+    assert [p.guid for p in posts] == ["a", "b", "c"]
+    by_guid = {p.guid: p for p in posts}
+    assert by_guid["b"].extra["source_feed_url"] == "https://one.example.com"
+    assert feeds_by_guid["b"] == ["https://one.example.com", "https://two.example.com"]
+
+
+def test_read_feeds_file(tmp_path) -> None:
+    path = tmp_path / "feeds.txt"
+    path.write_text(
+        "# cycling feeds\nhttps://one.example.com/rss\n\n"
+        "https://two.example.com/rss  # club\n"
+    )
+    assert rss.read_feeds_file(str(path)) == [
+        "https://one.example.com/rss",
+        "https://two.example.com/rss",
+    ]
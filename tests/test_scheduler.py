@@ -0,0 +1,103 @@
+"""Tests for the cost- and time-budgeted post scheduler."""
+
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+os.environ.setdefault("CALENDAR_ID", "test-calendar-id")
+
+from calendar_sync import cli, db, prefilter, rss, scheduler  # noqa: E402
+from calendar_sync.models import Action, RssPost  # noqa: E402
+
+NOW = datetime.now(timezone.utc)
+
+
+def _post(guid: str, content: str, hours_old: float, author: str = "club") -> RssPost:
+    return RssPost(
+        guid=guid,
+        title=guid,
+        link=f"https://example.com/{guid}",
+        content=content,
+        published=NOW - timedelta(hours=hours_old),
+        author=author,
+        image_urls=rss.extract_image_urls(content),
+    )
+
+
+def test_history_prices_content_and_images(temp_db) -> None:
+    db.record_processed(
+        "old-1",
+        Action.IGNORE,
+        post_content="nope",
+        reasoning="Pre-filter: this is not an event announcement.",
+        cost_usd=0.001,
+        post_author="shop",
+    )
+    content = "x" * 4000 + '<img src="https://img.example.com/a.jpg">'
+    db.record_processed(
+        "old-2", Action.CREATE, post_content=content, cost_usd=0.1, post_author="club"
+    )
+
+    model = scheduler.CostModel.from_history(db.get_cost_history())
+
+    assert model.prefilter_cost == pytest.approx(0.001)
+    assert model.cost_per_token == pytest.approx(0.1 / scheduler.post_tokens(content))
+    # One event out of one post for the club; none for the shop
+    assert model.event_score(_post("a", "hello", 0)) > model.event_score(
+        _post("b", "hello", 0, author="shop")
+    )
+    with_images = _post("c", "ride " + '<img src="https://i/1.jpg">' * 3, 0)
+    assert model.estimate(with_images).cost > model.estimate(_post("d", "ride", 0)).cost
+
+
+def test_plan_prefers_fresh_likely_events_and_keeps_them_in_order() -> None:
+    posts = [
+        _post("stale-ride", "Saturday ride at 10am", hours_old=24 * 30),
+        _post("fresh-ride", "Join us Sunday, 9am ride", hours_old=2),
+        _post("fresh-chat", "new jerseys in stock", hours_old=1),
+        _post("newer-ride", "Tuesday race at 6pm", hours_old=1),
+    ]
+    model = scheduler.CostModel()
+    one_post = model.estimate(posts[1]).cost
+    budget = scheduler.Budget(max_cost=2.5 * one_post)
+
+    picked, _ = budget.plan(posts, model)
+
+    # The fresh rides come first, the cheap non-event fills what's left and
+    # the month-old ride waits; picked posts keep their original order
+    assert [p.guid for p in picked] == ["fresh-ride", "fresh-chat", "newer-ride"]
+
+
+def test_stop_reason_checks_the_clock() -> None:
+    now = [0.0]
+    budget = scheduler.Budget(max_seconds=60, clock=lambda: now[0])
+    estimate = scheduler.Estimate(cost=0.01, seconds=20, score=0.5, priority=0.5)
+
+    assert budget.stop_reason(estimate, spent=0) is None
+    now[0] = 45
+    reason = budget.stop_reason(estimate, spent=0)
+    assert reason is not None and reason.startswith("Time budget")
+
+
+def test_process_stops_before_the_cost_budget(temp_db, monkeypatch) -> None:
+    posts = [_post(f"p{i}", "meet", hours_old=i) for i in range(5)]
+    monkeypatch.setattr(
+        rss, "fetch_feeds", lambda *a, **kw: [rss.FeedResult(posts, url="https://f")]
+    )
+    calls = []
+
+    def fake_prefilter(post, **kwargs):
+        calls.append(post.guid)
+        # Each post costs far more than estimated
+        return prefilter.PrefilterResult(False, 10_000, 1)
+
+    monkeypatch.setattr(prefilter, "prefilter_post", fake_prefilter)
+
+    stats = cli.run_process(["https://f"], max_cost=0.05)
+
+    # Three newest posts fit the estimates and run oldest-first; the third
+    # no longer fits once the first two cost more than expected
+    assert calls == ["p2", "p1"]
+    assert stats.posts_processed == 2
+    assert stats.posts_deferred == 3
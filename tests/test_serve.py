@@ -0,0 +1,91 @@
+"""Tests for the serve loop and its health/metrics endpoint."""
+
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from calendar_sync import serve
+
+
+class FakeStats:
+    def __init__(self, calendar_writes: int = 0):
+        self.feeds_not_modified = 1
+        self.feed_errors = 0
+        self.posts_processed = calendar_writes
+        self.post_errors = 0
+        self.posts_analyzed = calendar_writes
+        self.posts_escalated = 0
+        self.calendar_writes = calendar_writes
+        self.calendar_writes_skipped = 0
+        self.cost_usd = 0.01
+        self.ingest_latencies = []
+        self.post_seconds = [1.0] * calendar_writes
+
+
+@pytest.fixture
+def server():
+    metrics = serve.ServeMetrics()
+    srv = serve.make_server(metrics, "127.0.0.1", 0, stale_after=60)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield metrics, f"http://127.0.0.1:{srv.server_port}"
+    srv.shutdown()
+    srv.server_close()
+
+
+def _get(url: str) -> tuple[int, str]:
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status, response.read().decode()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read().decode()
+
+
+def test_health_and_metrics(server) -> None:
+    metrics, base = server
+    metrics.record_poll(FakeStats(calendar_writes=2), 0.5)
+    metrics.record_poll(None, 0.1)
+
+    status, body = _get(f"{base}/healthz")
+    assert status == 200
+    assert json.loads(body)["polls"] == 2
+
+    status, body = _get(f"{base}/metrics")
+    assert status == 200
+    assert "calsync_poll_errors 1\n" in body
+    assert "calsync_calendar_writes 2\n" in body
+    assert "# TYPE calsync_post_p95_seconds gauge\ncalsync_post_p95_seconds 1\n" in body
+
+    metrics.last_success_at -= 120
+    assert _get(f"{base}/healthz")[0] == 503
+    assert _get(f"{base}/nope")[0] == 404
+
+
+def test_loop_exports_after_writes_and_survives_failures() -> None:
+    results = [FakeStats(), RuntimeError("feed down"), FakeStats(calendar_writes=1)]
+    exports = []
+    stop = threading.Event()
+
+    def poll():
+        result = results.pop(0)
+        if not results:
+            stop.set()
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    metrics = serve.ServeMetrics()
+    serve.run_loop(
+        poll,
+        lambda: exports.append(1),
+        metrics,
+        interval=0,
+        export_every=3600,
+        stop=stop,
+        log=lambda msg: None,
+    )
+    assert (metrics.polls, metrics.poll_errors) == (3, 1)
+    # Once at start-up, once after the poll that wrote to the calendar
+    assert metrics.exports == len(exports) == 2
@@ -0,0 +1,117 @@
+"""Tests for sharded processing and segment merging."""
+
+import os
+import re
+
+import pytest
+
+os.environ.setdefault("CALENDAR_ID", "test-calendar-id")
+
+from calendar_sync import calendar, db, shards  # noqa: E402
+from calendar_sync.models import Action, EventDetails  # noqa: E402
+
+
+@pytest.fixture
+def use_db(tmp_path, monkeypatch):
+    """Switch the db module between named database files (one per worker)."""
+
+    def switch(name: str) -> None:
+        monkeypatch.setenv("CALSYNC_DB_PATH", str(tmp_path / name / "calendar_sync.db"))
+        db.init_db()
+
+    yield switch
+    db.close()
+
+
+def _event(title: str, date: str = "2026-06-06") -> EventDetails:
+    return EventDetails(title=title, date=date, time="10:00")
+
+
+def test_parse_shard() -> None:
+    assert shards.parse_shard("0/4") == (0, 4)
+    assert shards.parse_shard(" 3 / 4 ") == (3, 4)
+    for bad in ("4/4", "1/0", "a/b", "1"):
+        with pytest.raises(ValueError):
+            shards.parse_shard(bad)
+
+
+def test_shards_partition_posts() -> None:
+    guids = [f"https://www.instagram.com/p/{i:06x}/" for i in range(400)]
+    assigned = [shards.shard_of(g, 4) for g in guids]
+    assert set(assigned) == {0, 1, 2, 3}
+    assert assigned == [shards.shard_of(g, 4) for g in guids]
+
+
+def _run_worker(use_db, tmp_path, name: str, guids: list[str]):
+    use_db(name)
+    for guid in guids:
+        db.record_processed(
+            guid,
+            Action.CREATE,
+            calendar_event_id=f"evt-{guid}",
+            post_content=f"<p>{guid}</p>",
+            event=_event(f"Ride {guid}"),
+        )
+    path = tmp_path / "segments" / f"{name}.json.gz"
+    assert shards.write_segment(path) == len(guids)
+    return path
+
+
+def _decisions() -> list[tuple]:
+    rows = db.connect().execute(
+        "SELECT post_guid, decision, calendar_event_id, processed_at "
+        "FROM processed_posts ORDER BY id"
+    )
+    return [tuple(row) for row in rows]
+
+
+def test_merge_is_deterministic_and_idempotent(use_db, tmp_path) -> None:
+    seg_a = _run_worker(use_db, tmp_path, "shard0", ["a1", "a2"])
+    seg_b = _run_worker(use_db, tmp_path, "shard1", ["b1"])
+
+    use_db("merge1")
+    result = shards.merge_segments([seg_a, seg_b])
+    assert (result.segments, result.decisions, result.added) == (2, 3, 3)
+    first = _decisions()
+
+    use_db("merge2")
+    shards.merge_segments([seg_b, seg_a])
+    assert _decisions() == first
+
+    assert shards.merge_segments([seg_a]).added == 0
+    assert _decisions() == first
+    # Merged rows are queued for the next push
+    assert db.count_pending_changes() == 3
+
+
+def test_merge_flags_same_event_created_by_two_shards(use_db, tmp_path) -> None:
+    use_db("shard0")
+    db.record_processed("p1", Action.CREATE, event=_event("Unity Ride"))
+    seg_a = tmp_path / "a.json.gz"
+    shards.write_segment(seg_a)
+    use_db("shard1")
+    db.record_processed("p2", Action.CREATE, event=_event("unity  ride"))
+    seg_b = tmp_path / "b.json.gz"
+    shards.write_segment(seg_b)
+
+    use_db("merged")
+    result = shards.merge_segments([seg_a, seg_b])
+    assert result.duplicates == [("2026-06-06", "Unity Ride", ["p1", "p2"])]
+
+
+def test_empty_segment(use_db, tmp_path) -> None:
+    use_db("idle")
+    path = tmp_path / "idle.json.gz"
+    assert shards.write_segment(path) == 0
+    assert shards.merge_segments([path]).decisions == 0
+
+
+def test_event_id_for_is_valid_and_stable() -> None:
+    event_id = calendar.event_id_for("https://www.instagram.com/p/abc/", _event("Ride"))
+    assert re.fullmatch(r"[0-9a-v]{5,1024}", event_id)
+    assert event_id == calendar.event_id_for(
+        "https://www.instagram.com/p/abc/", _event("Renamed")
+    )
+    assert event_id != calendar.event_id_for(
+        "https://www.instagram.com/p/abc/", _event("Ride", date="2026-06-13")
+    )
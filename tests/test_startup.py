@@ -0,0 +1,33 @@
+"""Tests that commands only import what they use."""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_history_needs_no_calendar_config_or_sdks(tmp_path) -> None:
+    env = {k: v for k, v in os.environ.items() if k != "CALENDAR_ID"}
+    env["CALSYNC_DB_PATH"] = str(tmp_path / "calendar_sync.db")
+    env["PYTHON_DOTENV_DISABLED"] = "1"
+    code = (
+        "import sys\n"
+        "from calendar_sync import cli\n"
+        "try:\n"
+        "    cli.app(['history'])\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "print(sorted(m for m in ('anthropic', 'googleapiclient') if m in sys.modules))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert "No history yet" in result.stdout
+    assert result.stdout.strip().endswith("[]")
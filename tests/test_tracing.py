@@ -0,0 +1,82 @@
+"""Tests for span tracing of process runs and the profile breakdown."""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+os.environ.setdefault("CALENDAR_ID", "test-calendar-id")
+
+from calendar_sync import db, tracing  # noqa: E402
+
+
+@pytest.fixture
+def temp_db(temp_db):
+    """The shared temp_db, stopping any tracer a test left running."""
+    yield
+    tracing.stop()
+
+
+def test_spans_nest_across_threads_and_wrap_db_only_while_tracing(temp_db) -> None:
+    original = db.get_total_cost
+    tracer = tracing.start()
+    assert db.get_total_cost is not original
+
+    with tracing.span("post", guid="ride"):
+        db.get_total_cost()
+        with ThreadPoolExecutor(1) as pool:
+            pool.submit(tracing.carry(tracing.traced("fetch_image")(lambda: None)))
+            pool.submit(tracing.traced("orphan")(lambda: None))
+        tracing.annotate(tokens=10)
+
+    assert tracing.stop() is tracer
+    assert db.get_total_cost is original
+    by_name = {s.name: s for s in tracer.spans}
+    post = by_name["post"]
+    assert post.attrs == {"guid": "ride", "tokens": 10}
+    assert by_name["db.get_total_cost"].parent_id == post.span_id
+    assert by_name["fetch_image"].parent_id == post.span_id
+    assert by_name["fetch_image"].thread != post.thread
+    assert by_name["orphan"].parent_id is None
+
+    # Not tracing: nothing is recorded
+    with tracing.span("post") as span:
+        assert span is None
+    assert len(tracer.spans) == 4
+
+
+@pytest.mark.parametrize("fmt", tracing.FORMATS)
+def test_traces_load_back_into_a_per_stage_breakdown(
+    tmp_path, monkeypatch, fmt
+) -> None:
+    monkeypatch.setenv("CALSYNC_TRACES_DIR", str(tmp_path))
+    tracer = tracing.Tracer()
+    post = tracing.Span("post", "p", None, "MainThread", 0, {"guid": "ride"})
+    post.end_ns = 10_000_000_000
+    turns = []
+    for i, start in enumerate((0, 4)):
+        turn = tracing.Span("model_turn", f"t{i}", "p", "MainThread", 0, {"turn": i})
+        turn.start_ns, turn.end_ns = start * 10**9, (start + 3) * 10**9
+        turns.append(turn)
+    search = tracing.Span("execute_tool.search", "s", "p", "hedge-search_0", 0, {})
+    search.start_ns, search.end_ns = 8 * 10**9, 9 * 10**9
+    tracer.spans = [*turns, search, post]
+
+    path = tracing.write(tracer, fmt)
+    assert tracing.find_trace("latest") == path
+    spans = tracing.load(path)
+
+    assert {s.name for s in spans} == {"post", "model_turn", "execute_tool.search"}
+    loaded = next(s for s in spans if s.name == "post")
+    assert loaded.attrs == {"guid": "ride"}
+    assert {s.thread for s in spans} == {"MainThread", "hedge-search_0"}
+
+    root = tracing.Node("post")
+    root.add(loaded, tracing.children_by_parent(spans))
+    assert root.seconds == pytest.approx(10)
+    assert root.self_seconds == pytest.approx(3)
+    assert root.children["model_turn"].count == 2
+    assert root.children["model_turn"].seconds == pytest.approx(6)
+
+    stages = tracing.stage_totals(spans)
+    assert [n.name for n in stages] == ["model_turn", "post", "execute_tool.search"]